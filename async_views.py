@@ -0,0 +1,39 @@
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from rest_framework.views import APIView
+
+
+class AsyncAPIView(APIView):
+    """
+    Base of the async ledger views, for ASGI deployments.
+
+    DRF's APIView runs its handlers synchronously, which holds a worker thread for
+    the whole request. This view dispatches like APIView.dispatch around async
+    handlers, which query through the async ORM. APIView.initial, running the
+    authentication, permission checks, throttles, versioning and content negotiation,
+    may query the database or the cache, so it runs in a thread with sync_to_async.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            if iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+from asgiref.sync import ThreadSensitiveContext, async_to_sync, iscoroutinefunction, sync_to_async
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from flowback.user.models import User
+from flowback_addon.ledger.urls import ledger_patterns
+
+# (scenario name, sync endpoint, async endpoint, query params) pairs of equivalent views
+CONCURRENCY_SCENARIOS = [
+    ('accounts_list', 'accounts_list', 'accounts_list_async', dict(limit=20)),
+    ('accounts_balance', 'accounts_balance', 'accounts_balance_async', {}),
+    ('transactions_list', 'transactions_list', 'transactions_list_async', dict(order_by='date_desc', limit=20)),
+]
+
+
+async def _request(view, request, kwargs: dict, state: dict) -> int:
+    # Django's ASGIHandler gives every request its own thread for sync code, sync views
+    # hold it for the whole request while async views only use it for their queries
+    async with ThreadSensitiveContext():
+        state['in_flight'] += 1
+        state['peak'] = max(state['peak'], state['in_flight'])
+        try:
+            if iscoroutinefunction(view):
+                response = await view(request, **kwargs)
+            else:
+                response = await sync_to_async(view)(request, **kwargs)
+            response.render()
+            return response.status_code
+        finally:
+            state['in_flight'] -= 1
+            await sync_to_async(connection.close)()
+
+
+async def _run_level(view, user, path: str, kwargs: dict, params: dict, concurrency: int, requests: int) -> dict:
+    factory = APIRequestFactory()
+    semaphore = asyncio.Semaphore(concurrency)
+    state = dict(in_flight=0, peak=0)
+
+    async def limited():
+        request = factory.get(path, params)
+        force_authenticate(request, user=user)
+        async with semaphore:
+            return await _request(view, request, kwargs, state)
+
+    start = time.perf_counter()
+    statuses = await asyncio.gather(*(limited() for _ in range(requests)))
+    seconds = time.perf_counter() - start
+
+    return dict(status=max(statuses),
+                seconds=seconds,
+                requests_per_second=requests / max(seconds, 1e-9),
+                peak_in_flight=state['peak'])
+
+
+def run_concurrency_benchmark(*, user_id: int, account_id: int, concurrency_levels: tuple[int] = (1, 8, 32),
+                              requests: int = 200) -> dict:
+    """
+    Sends `requests` GETs to the sync and async variant of each list and balance view
+    from an event loop, at most `concurrency` at a time, with caching off so every
+    request reads the database like the uncached async views. Returns
+    {scenario: {concurrency: {'sync': result, 'async': result}}}, each result with
+    'status', 'seconds', 'requests_per_second' and 'peak_in_flight'.
+    Every request opens its own connection, so the database must allow several.
+    """
+    views = {pattern.name: pattern.callback for pattern in ledger_patterns}
+    user = User.objects.get(id=user_id)
+
+    results = {}
+    with override_settings(LEDGER_CACHE_TIMEOUT=0):
+        for name, sync_endpoint, async_endpoint, params in CONCURRENCY_SCENARIOS:
+            kwargs = {} if name == 'accounts_list' else dict(account_id=account_id)
+            results[name] = {}
+            for concurrency in concurrency_levels:
+                results[name][concurrency] = {
+                    variant: async_to_sync(_run_level)(views[endpoint], user, f'/ledger/{endpoint}',
+                                                       kwargs, params, concurrency, requests)
+                    for variant, endpoint in (('sync', sync_endpoint), ('async', async_endpoint))}
+    return results
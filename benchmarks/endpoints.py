@@ -0,0 +1,302 @@
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+from itertools import count
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from flowback.user.models import User
+from flowback_addon.ledger.cache import ledger_cache
+from flowback_addon.ledger.jobs import ledger_job_run
+from flowback_addon.ledger.models import Account, LedgerJob, Transaction
+from flowback_addon.ledger.services import account_create, account_delete, transaction_create
+from flowback_addon.ledger.urls import ledger_patterns
+from flowback_addon.ledger.views import TransactionListAPI
+
+# The account numbers and verification numbers of what the writing scenarios create
+BENCH_PREFIX = 'BENCH'
+
+# Most queries a request of each scenario may run. They do not grow with the page size
+# or the ledger size, so a serializer or loop querying per row breaks the budget.
+QUERY_BUDGETS = {
+    'accounts_list': 2,
+    'accounts_list_deep_offset': 2,
+    'accounts_list_sparse_fields': 2,
+    'accounts_list_async': 2,
+    'accounts_trial_balance': 1,
+    'accounts_trial_balance_as_of': 1,
+    'accounts_create': 2,
+    'accounts_update': 4,
+    'accounts_delete': 7,
+    'accounts_close_period': 12,
+    'accounts_balance': 2,
+    'accounts_balance_as_of': 4,
+    'accounts_balance_async': 2,
+    'accounts_balance_async_as_of': 4,
+    'accounts_series': 3,
+    'transactions_list': 3,
+    'transactions_list_deep_offset': 3,
+    'transactions_list_cursor': 2,
+    'transactions_list_deep_cursor': 2,
+    'transactions_list_running_balance': 6,
+    'transactions_list_filtered': 4,
+    'transactions_list_async': 3,
+    'transactions_list_async_cursor': 2,
+    'transactions_list_async_running_balance': 6,
+    'transactions_export': 2,
+    'transactions_create': 14,
+    'transactions_import': 17,
+    'transactions_update': 16,
+    'transactions_delete': 15,
+    'transactions_bulk_update': 4,
+    'transactions_bulk_delete': 15,
+    'journal_entries_create': 26,
+    'jobs_create': 1,
+    'jobs_detail': 1,
+    'jobs_result': 1,
+    'cache_stats': 0,
+    'metrics': 0,
+}
+
+
+def ledger_endpoint_scenarios(*, user_id: int, account_id: int, bench_account_id: int) -> list[dict]:
+    """
+    The scenarios run against the endpoints of urls.py. Each is a dict with the url
+    `endpoint` name, `method`, url `kwargs`, query `params` or request `data`, and an
+    optional untimed `prepare` callable returning (kwargs, data) for one run, for
+    scenarios consuming what they act on. The scenarios reading the ledger read
+    account_id, those writing only write bench_account_id and accounts they create,
+    all numbered with BENCH_PREFIX.
+    """
+    transactions = Transaction.objects.filter(account_id=account_id)
+    total = transactions.count()
+    middle = transactions.order_by('-date', '-id').values('date', 'id')[total // 2]
+    accounts = Account.objects.filter(user_id=user_id).count()
+    numbers = count()
+
+    paginator = TransactionListAPI.CursorPagination()
+    paginator.ordering = '-date'
+    cursor = paginator.encode_cursor((middle['date'], middle['id']), reverse=False)
+
+    def new_transaction(**kwargs):
+        return transaction_create(user_id=user_id, account_id=bench_account_id, credit_amount=Decimal(1),
+                                  description='Benchmark', verification_number=f'{BENCH_PREFIX}{next(numbers)}',
+                                  **kwargs)
+
+    def new_account():
+        return account_create(user_id=user_id, account_number=f'{BENCH_PREFIX}{next(numbers)}',
+                              account_name='Benchmark')
+
+    def prepare_account_delete():
+        return dict(account_id=new_account().id), None
+
+    def prepare_close_period():
+        account = new_account()
+        for days in (60, 45, 30):
+            transaction_create(user_id=user_id, account_id=account.id, credit_amount=Decimal(1),
+                               description='Benchmark', verification_number=BENCH_PREFIX,
+                               date=timezone.now() - timedelta(days=days))
+        return {}, dict(cutoff=(timezone.now() - timedelta(days=40)).isoformat(), account_ids=[account.id])
+
+    def prepare_transaction(**kwargs):
+        return dict(account_id=bench_account_id, transaction_id=new_transaction().id, **kwargs)
+
+    def prepare_bulk_delete():
+        return dict(account_id=bench_account_id), dict(ids=[new_transaction().id for _ in range(20)])
+
+    def prepare_import():
+        rows = ''.join(f'{i},,Imported,{BENCH_PREFIX}IMPORT,{timezone.now().isoformat()}\n' for i in range(1, 101))
+        return (dict(account_id=bench_account_id),
+                'credit_amount,debit_amount,description,verification_number,date\n' + rows)
+
+    def prepare_job(run: bool):
+        job = LedgerJob.objects.create(user_id=user_id, kind=LedgerJob.Kind.TRIAL_BALANCE)
+        if run:
+            ledger_job_run(job.id)
+        return dict(job_id=job.id), None
+
+    account = dict(account_id=account_id)
+    bench_account = dict(account_id=bench_account_id)
+    return [
+        dict(name='accounts_list', endpoint='accounts_list', params=dict(limit=20)),
+        dict(name='accounts_list_deep_offset', endpoint='accounts_list',
+             params=dict(limit=20, offset=max(accounts - 20, 0))),
+        dict(name='accounts_list_sparse_fields', endpoint='accounts_list', params=dict(fields='id,account_name')),
+        dict(name='accounts_list_async', endpoint='accounts_list_async', params=dict(limit=20)),
+        dict(name='accounts_trial_balance', endpoint='accounts_trial_balance'),
+        dict(name='accounts_trial_balance_as_of', endpoint='accounts_trial_balance',
+             params=dict(as_of=middle['date'].isoformat())),
+        dict(name='accounts_create', endpoint='accounts_create', method='post',
+             data=dict(account_number=BENCH_PREFIX, account_name='Benchmark')),
+        dict(name='accounts_update', endpoint='accounts_update', method='post', kwargs=bench_account,
+             data=dict(account_number=f'{BENCH_PREFIX}1930', account_name='Benchmark')),
+        dict(name='accounts_delete', endpoint='accounts_delete', method='post', prepare=prepare_account_delete),
+        dict(name='accounts_close_period', endpoint='accounts_close_period', method='post',
+             prepare=prepare_close_period),
+        dict(name='accounts_balance', endpoint='accounts_balance', kwargs=account),
+        dict(name='accounts_balance_as_of', endpoint='accounts_balance', kwargs=account,
+             params=dict(date=middle['date'].isoformat())),
+        dict(name='accounts_balance_async', endpoint='accounts_balance_async', kwargs=account),
+        dict(name='accounts_balance_async_as_of', endpoint='accounts_balance_async', kwargs=account,
+             params=dict(date=middle['date'].isoformat())),
+        dict(name='accounts_series', endpoint='accounts_series', kwargs=account, params=dict(granularity='month')),
+        dict(name='transactions_list', endpoint='transactions_list', kwargs=account,
+             params=dict(order_by='date_desc', limit=20)),
+        dict(name='transactions_list_deep_offset', endpoint='transactions_list', kwargs=account,
+             params=dict(order_by='date_desc', limit=20, offset=total // 2)),
+        dict(name='transactions_list_cursor', endpoint='transactions_list', kwargs=account,
+             params=dict(pagination='cursor', order_by='date_desc', count='false', limit=20)),
+        dict(name='transactions_list_deep_cursor', endpoint='transactions_list', kwargs=account,
+             params=dict(pagination='cursor', order_by='date_desc', count='false', limit=20, cursor=cursor)),
+        dict(name='transactions_list_running_balance', endpoint='transactions_list', kwargs=account,
+             params=dict(order_by='date_desc', limit=20, offset=total // 2, running_balance='true')),
+        dict(name='transactions_list_filtered', endpoint='transactions_list', kwargs=account,
+             params=dict(order_by='date_desc', verification_number__startswith='V00001',
+                         date__gte=middle['date'].isoformat())),
+        dict(name='transactions_list_async', endpoint='transactions_list_async', kwargs=account,
+             params=dict(order_by='date_desc', limit=20)),
+        dict(name='transactions_list_async_cursor', endpoint='transactions_list_async', kwargs=account,
+             params=dict(pagination='cursor', order_by='date_desc', count='false', limit=20, cursor=cursor)),
+        dict(name='transactions_list_async_running_balance', endpoint='transactions_list_async', kwargs=account,
+             params=dict(order_by='date_desc', limit=20, offset=total // 2, running_balance='true')),
+        dict(name='transactions_export', endpoint='transactions_export', kwargs=account,
+             params=dict(output_format='csv')),
+        dict(name='transactions_create', endpoint='transactions_create', method='post', kwargs=bench_account,
+             data=dict(credit_amount='10.00', description='Benchmark', verification_number=BENCH_PREFIX,
+                       date=timezone.now().isoformat())),
+        dict(name='transactions_import', endpoint='transactions_import', method='post', prepare=prepare_import,
+             content_type='text/csv'),
+        dict(name='transactions_update', endpoint='transactions_update', method='post',
+             prepare=lambda: (prepare_transaction(), dict(debit_amount='2.00', description='Benchmark',
+                                                          verification_number=BENCH_PREFIX,
+                                                          date=timezone.now().isoformat()))),
+        dict(name='transactions_delete', endpoint='transactions_delete', method='post',
+             prepare=lambda: (prepare_transaction(), None)),
+        dict(name='transactions_bulk_update', endpoint='transactions_bulk_update', method='post',
+             kwargs=bench_account,
+             data=dict(verification_number__startswith=BENCH_PREFIX, data=dict(description='Benchmark bulk'))),
+        dict(name='transactions_bulk_delete', endpoint='transactions_bulk_delete', method='post',
+             prepare=prepare_bulk_delete),
+        dict(name='journal_entries_create', endpoint='journal_entries_create', method='post',
+             data=dict(verification_number=BENCH_PREFIX, description='Benchmark',
+                       legs=[dict(account_id=bench_account_id, debit_amount='5.00'),
+                             dict(account_id=bench_account_id, credit_amount='5.00')])),
+        dict(name='jobs_create', endpoint='jobs_create', method='post',
+             data=dict(kind='trial_balance', params=dict(date__gte=middle['date'].isoformat()))),
+        dict(name='jobs_detail', endpoint='jobs_detail', prepare=lambda: prepare_job(run=False)),
+        dict(name='jobs_result', endpoint='jobs_result', prepare=lambda: prepare_job(run=True)),
+        dict(name='cache_stats', endpoint='cache_stats', staff=True),
+        dict(name='metrics', endpoint='metrics', staff=True),
+    ]
+
+
+def _run(view, user, scenario: dict) -> tuple[int, float, int]:
+    kwargs, data = scenario.get('kwargs', {}), scenario.get('data')
+    if scenario.get('prepare'):
+        kwargs, data = scenario['prepare']()
+
+    factory = APIRequestFactory()
+    path = f'/ledger/{scenario["endpoint"]}'
+    if scenario.get('method', 'get') == 'post':
+        if 'content_type' in scenario:
+            request = factory.post(path, data, content_type=scenario['content_type'])
+        else:
+            request = factory.post(path, data, format='json')
+    else:
+        request = factory.get(path, scenario.get('params', {}))
+    force_authenticate(request, user=user)
+
+    # Every run measures the database work, not a cached page of an earlier run
+    ledger_cache().clear()
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        response = async_to_sync(view)(request, **kwargs) if iscoroutinefunction(view) else view(request, **kwargs)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+            response.close()
+        else:
+            response.render()
+        elapsed = (time.perf_counter() - start) * 1000
+
+    return response.status_code, elapsed, len(queries)
+
+
+def _benchmark_accounts_delete(*, user_id: int, since):
+    """Deletes the accounts the scenarios created, with their transactions."""
+    accounts = Account.objects.filter(user_id=user_id, account_number__startswith=BENCH_PREFIX, created_at__gte=since)
+    for account_id in accounts.values_list('id', flat=True):
+        account_delete(user_id=user_id, account_id=account_id)
+
+
+def _benchmark_jobs_delete(*, user_id: int, since):
+    """Deletes the jobs the scenarios created, with the result files of the jobs they ran."""
+    for job in LedgerJob.objects.filter(user_id=user_id, created_at__gte=since).only('id', 'result_file'):
+        if job.result_file:
+            job.result_file.delete(save=False)
+        job.delete()
+
+
+def run_endpoint_benchmark(*, user_id: int, account_id: int, repeat: int = 5) -> dict:
+    """
+    Times every scenario and counts its queries, returning {scenario name: {'endpoint',
+    'status', 'succeeded', 'median_ms', 'p95_ms', 'min_ms', 'queries', 'budget', 'within_budget'}}.
+    A scenario only succeeded when every run answered 2xx, as an error response usually
+    runs fewer queries. The writing scenarios only write an account created for the run,
+    so account_id and the rest of the user's ledger stay as they were. The accounts and
+    jobs the scenarios create are deleted afterwards, the jobs never reaching the worker
+    threads. Raises ValueError when an endpoint of urls.py has no scenario or budget.
+    """
+    views = {pattern.name: pattern.callback for pattern in ledger_patterns}
+    user = User.objects.get(id=user_id)
+    staff = User.objects.get(id=user_id)
+    staff.is_staff = True
+
+    results = {}
+    started = timezone.now()
+    # The jobs the scenarios create stay pending rather than run against the ledger in the background
+    with override_settings(LEDGER_JOB_WORKERS=0):
+        try:
+            bench_account = account_create(user_id=user_id, account_number=BENCH_PREFIX, account_name='Benchmark')
+            scenarios = ledger_endpoint_scenarios(user_id=user_id, account_id=account_id,
+                                                  bench_account_id=bench_account.id)
+
+            missing = set(views) - {scenario['endpoint'] for scenario in scenarios}
+            missing |= {scenario['name'] for scenario in scenarios} - set(QUERY_BUDGETS)
+            if missing:
+                raise ValueError(f'No benchmark scenario or query budget for: {", ".join(sorted(missing))}')
+
+            for scenario in scenarios:
+                results[scenario['name']] = _run_scenario(views[scenario['endpoint']],
+                                                          staff if scenario.get('staff') else user,
+                                                          scenario, repeat)
+        finally:
+            _benchmark_jobs_delete(user_id=user_id, since=started)
+            _benchmark_accounts_delete(user_id=user_id, since=started)
+    return results
+
+
+def _run_scenario(view, user, scenario: dict, repeat: int) -> dict:
+    statuses, timings, queries = set(), [], 0
+    for _ in range(repeat):
+        status, elapsed, query_count = _run(view, user, scenario)
+        statuses.add(status)
+        timings.append(elapsed)
+        queries = max(queries, query_count)
+
+    timings.sort()
+    budget = QUERY_BUDGETS[scenario['name']]
+    return dict(endpoint=scenario['endpoint'],
+                status=max(statuses),
+                succeeded=all(200 <= status < 300 for status in statuses),
+                median_ms=statistics.median(timings),
+                p95_ms=timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+                min_ms=timings[0],
+                queries=queries,
+                budget=budget,
+                within_budget=queries <= budget)
@@ -0,0 +1,92 @@
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import Sum
+
+from flowback_addon.ledger.models import Account, Transaction
+from flowback_addon.ledger.selectors import account_list, transaction_list
+
+
+def ledger_index_scenarios(*, user_id: int, account_id: int) -> dict:
+    """The hot queries of the ledger, keyed by name, as unevaluated querysets."""
+    transactions = Transaction.objects.filter(account_id=account_id)
+    middle = transactions.order_by('date').values_list('date', flat=True)[transactions.count() // 2]
+
+    return {
+        'account_list': account_list(user_id=user_id, filters=dict(order_by='created_at_desc'))[:20],
+        'transaction_list_date': transaction_list(account_id=account_id,
+                                                  filters=dict(order_by='date_desc'))[:20],
+        'transaction_list_created_at': transaction_list(account_id=account_id,
+                                                        filters=dict(order_by='created_at_desc'))[:20],
+        'transaction_list_deep_offset': transaction_list(account_id=account_id,
+                                                         filters=dict(order_by='date_desc'))[5000:5020],
+        'transaction_list_keyset': transactions.filter(date__lt=middle).order_by('-date', '-id')[:20],
+        'transaction_filter_date_range': transaction_list(account_id=account_id, filters=dict(
+            date__gte=middle, date__lte=middle + timedelta(days=7), order_by='date_desc'))[:20],
+        'transaction_filter_amount_range': transaction_list(account_id=account_id, filters=dict(
+            credit_amount__gte=Decimal(9990), credit_amount__lte=Decimal(10000)))[:20],
+        'transaction_filter_side': transaction_list(account_id=account_id,
+                                                    filters=dict(side='debit', debit_amount__gte=Decimal(9990)))[:20],
+        'transaction_filter_verification_prefix': transaction_list(account_id=account_id, filters=dict(
+            verification_number__startswith='V00001'))[:20],
+        'transaction_filter_description': transaction_list(account_id=account_id, filters=dict(
+            description__icontains='transaction 4242'))[:20],
+        'balance_aggregate': (transactions.values('account_id')
+                              .annotate(debit_total=Sum('debit_amount'), credit_total=Sum('credit_amount'))
+                              .order_by()),
+    }
+
+
+def ledger_indexes() -> list[tuple]:
+    return ([(Account, index) for index in Account._meta.indexes]
+            + [(Transaction, index) for index in Transaction._meta.indexes])
+
+
+def _analyze():
+    if connection.vendor in ('postgresql', 'sqlite'):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+
+def _measure(scenarios: dict, repeat: int) -> dict:
+    results = {}
+    for name, queryset in scenarios.items():
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            list(queryset.all())
+            timings.append((time.perf_counter() - start) * 1000)
+
+        results[name] = dict(plan=queryset.explain(),
+                             median_ms=statistics.median(timings),
+                             min_ms=min(timings))
+    return results
+
+
+def run_index_benchmark(*, user_id: int, account_id: int, repeat: int = 5) -> dict:
+    """
+    Measures the ledger scenarios with the composite indexes dropped and then
+    recreated, returning {'before': {...}, 'after': {...}}.
+    """
+    scenarios = ledger_index_scenarios(user_id=user_id, account_id=account_id)
+    indexes = ledger_indexes()
+
+    with connection.schema_editor() as schema_editor:
+        for model, index in indexes:
+            schema_editor.remove_index(model, index)
+
+    try:
+        _analyze()
+        before = _measure(scenarios, repeat)
+    finally:
+        with connection.schema_editor() as schema_editor:
+            for model, index in indexes:
+                schema_editor.add_index(model, index)
+
+    _analyze()
+    after = _measure(scenarios, repeat)
+
+    return dict(before=before, after=after)
@@ -0,0 +1,61 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.db import connection
+
+from flowback_addon.ledger.models import Account
+from flowback_addon.ledger.selectors import account_balance_discrepancies
+from flowback_addon.ledger.services import journal_entry_create, transaction_create
+
+
+def _post(*, user_id: int, account_id: int, other_account_id: int, writer: int, posts: int):
+    """Posts alternating credits to the hot account and transfers between both accounts."""
+    try:
+        for n in range(posts):
+            if n % 2:
+                # Legs in reversed order on every other writer, the services lock in id order anyway
+                legs = [dict(account_id=account_id, debit_amount=Decimal(1)),
+                        dict(account_id=other_account_id, credit_amount=Decimal(1))]
+                journal_entry_create(user_id=user_id, verification_number=f'B{writer}-{n}',
+                                     description='Benchmark transfer', legs=legs[::-1] if writer % 2 else legs)
+            else:
+                transaction_create(user_id=user_id, account_id=account_id, credit_amount=Decimal(2),
+                                   description='Benchmark credit', verification_number=f'B{writer}-{n}')
+    finally:
+        connection.close()
+
+
+def run_posting_benchmark(*, user_id: int, account_id: int, other_account_id: int,
+                          writer_counts: tuple[int] = (1, 2, 4, 8), posts_per_writer: int = 100) -> dict:
+    """
+    Posts to one hot account from a thread pool for every writer count and checks the
+    cached totals of both accounts match their transactions afterwards. Returns
+    {writers: {'posts', 'seconds', 'posts_per_second', 'expected_balance', 'balance', 'consistent'}}.
+    """
+    results = {}
+    for writers in writer_counts:
+        balance_before = Account.objects.get(id=account_id).cached_balance
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=writers) as pool:
+            futures = [pool.submit(_post, user_id=user_id, account_id=account_id,
+                                   other_account_id=other_account_id, writer=writer, posts=posts_per_writer)
+                       for writer in range(writers)]
+            for future in futures:
+                future.result()
+        seconds = time.perf_counter() - start
+
+        # Every credit adds 2 and every transfer takes 1 from the hot account
+        credits, transfers = (posts_per_writer + 1) // 2, posts_per_writer // 2
+        expected_balance = balance_before + writers * (2 * credits - transfers)
+        balance = Account.objects.get(id=account_id).cached_balance
+
+        results[writers] = dict(posts=writers * posts_per_writer,
+                                seconds=seconds,
+                                posts_per_second=writers * posts_per_writer / max(seconds, 1e-9),
+                                expected_balance=expected_balance,
+                                balance=balance,
+                                consistent=balance == expected_balance and not account_balance_discrepancies(
+                                    account_ids=[account_id, other_account_id]).exists())
+    return results
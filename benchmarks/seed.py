@@ -0,0 +1,131 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from typing import Iterator
+
+from django.core.management.base import CommandError
+from django.utils import timezone
+
+from flowback.user.models import User
+from flowback_addon.ledger.models import Account, Transaction
+from flowback_addon.ledger.services import account_balance_rebuild
+
+
+def seed_ledger(*,
+                users: int = 1,
+                accounts_per_user: int = 10,
+                transactions_per_account: int = 1000,
+                days: int = 365 * 3,
+                batch_size: int = 5000,
+                prefix: str = 'ledger-bench',
+                seed: int = None) -> list[int]:
+    """
+    Creates users, accounts and transactions with bulk inserts and returns the
+    seeded user ids. Transaction dates are spread over the last `days` days.
+    """
+    if users < 1 or accounts_per_user < 1:
+        raise ValueError('Seeding needs at least one user and one account per user')
+    if transactions_per_account < 0:
+        raise ValueError('Seeding needs a transaction count of zero or more')
+
+    rng = random.Random(seed)
+    now = timezone.now()
+
+    user_ids = []
+    for i in range(users):
+        user = User.objects.create_user(email=f'{prefix}-{i}-{rng.random()}@example.com',
+                                        username=f'{prefix}-{i}-{rng.randrange(10 ** 9)}',
+                                        password=None)
+        user_ids.append(user.id)
+
+    accounts = Account.objects.bulk_create(
+        [Account(account_number=f'{i:04d}-{j:04d}', account_name=f'Account {j}', user_id=user_id)
+         for i, user_id in enumerate(user_ids)
+         for j in range(accounts_per_user)],
+        batch_size=batch_size)
+    account_ids = [account.id for account in accounts]
+    if account_ids[0] is None:
+        account_ids = list(Account.objects.filter(user_id__in=user_ids).values_list('id', flat=True))
+
+    batch = []
+    for account_id in account_ids:
+        for n in range(transactions_per_account):
+            amount = Decimal(rng.randrange(100, 1000000)) / 100
+            is_debit = rng.random() < 0.5
+            batch.append(Transaction(account_id=account_id,
+                                     debit_amount=amount if is_debit else None,
+                                     credit_amount=None if is_debit else amount,
+                                     description=f'Transaction {n}',
+                                     verification_number=f'V{n:07d}',
+                                     date=now - timedelta(seconds=rng.randrange(days * 86400))))
+            if len(batch) >= batch_size:
+                Transaction.objects.bulk_create(batch)
+                batch = []
+
+    if batch:
+        Transaction.objects.bulk_create(batch)
+
+    account_balance_rebuild(account_ids=account_ids, batch_size=batch_size)
+    return user_ids
+
+
+def seed_ledger_delete(*, user_ids: list[int], prefix: str = 'ledger-bench') -> list[int]:
+    """
+    Deletes the ledgers and users seed_ledger created with `prefix` among user_ids,
+    leaving any other user alone. Returns the deleted user ids.
+    """
+    user_ids = list(User.objects
+                    .filter(id__in=user_ids, username__startswith=f'{prefix}-', email__startswith=f'{prefix}-')
+                    .values_list('id', flat=True))
+
+    Transaction.objects.filter(account__user_id__in=user_ids).delete()
+    Account.objects.filter(user_id__in=user_ids).delete()
+    User.objects.filter(id__in=user_ids).delete()
+    return user_ids
+
+
+def add_benchmark_ledger_arguments(parser, *, users: int = 1, accounts_per_user: int = 10,
+                                   transactions_per_account: int = 1000):
+    """Adds the options of the benchmark commands choosing the ledger benchmark_ledger yields."""
+    parser.add_argument('--users', type=int, default=users)
+    parser.add_argument('--accounts-per-user', type=int, default=accounts_per_user)
+    parser.add_argument('--transactions-per-account', type=int, default=transactions_per_account)
+    parser.add_argument('--user-id', type=int,
+                        help='Benchmark against an existing user instead of seeding a new ledger')
+    parser.add_argument('--keep', action='store_true', help='Keep the seeded ledger afterwards')
+    parser.add_argument('--seed', type=int, default=None)
+
+
+@contextmanager
+def benchmark_ledger(options: dict, *, accounts: int = 1) -> Iterator[tuple[int, list[int]]]:
+    """
+    Yields the user a benchmark command runs against and the ids of its first `accounts`
+    accounts: the --user-id user, or the first user of a ledger seeded from the options
+    of add_benchmark_ledger_arguments and deleted afterwards unless --keep. Raises
+    CommandError when the first account has no transactions.
+    """
+    seeded_user_ids = []
+    user_id = options['user_id']
+
+    if user_id is None:
+        try:
+            seeded_user_ids = seed_ledger(users=options['users'],
+                                          accounts_per_user=options['accounts_per_user'],
+                                          transactions_per_account=options['transactions_per_account'],
+                                          seed=options['seed'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        user_id = seeded_user_ids[0]
+
+    try:
+        account_ids = list(Account.objects.filter(user_id=user_id).order_by('id').values_list('id', flat=True)[:accounts])
+        if len(account_ids) < accounts:
+            raise CommandError(f'User {user_id} needs at least {accounts} account(s)')
+        if not Transaction.objects.filter(account_id=account_ids[0]).exists():
+            raise CommandError(f'User {user_id} has no account with transactions')
+
+        yield user_id, account_ids
+    finally:
+        if seeded_user_ids and not options['keep']:
+            seed_ledger_delete(user_ids=seeded_user_ids)
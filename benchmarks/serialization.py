@@ -0,0 +1,49 @@
+import statistics
+import time
+
+from rest_framework.renderers import JSONRenderer
+
+from flowback_addon.ledger.selectors import account_list, transaction_list
+from flowback_addon.ledger.serialization import values_fields, values_serialize
+from flowback_addon.ledger.views import AccountListAPI, TransactionListAPI
+
+
+def _serializer_page(serializer_class, queryset) -> bytes:
+    return JSONRenderer().render(serializer_class(list(queryset), many=True).data)
+
+
+def _values_page(serializer_class, queryset) -> bytes:
+    fields = [field for field in values_fields(serializer_class) if field != 'running_balance']
+    return JSONRenderer().render(values_serialize(serializer_class, list(queryset.values(*fields))))
+
+
+def _time(render, serializer_class, queryset, repeat: int) -> tuple[list[float], bytes]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        content = render(serializer_class, queryset.all())
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings, content
+
+
+def run_serialization_benchmark(*, user_id: int, account_id: int, limit: int = 100, repeat: int = 20) -> dict:
+    """
+    Times a page of the account and transaction lists rendered through the output
+    serializers and through the values() fast path, and checks the JSON is identical.
+    """
+    scenarios = {
+        'account_list': (AccountListAPI.OutputSerializer,
+                         account_list(user_id=user_id, filters=dict(order_by='created_at_desc'))[:limit]),
+        'transaction_list': (TransactionListAPI.OutputSerializer,
+                             transaction_list(account_id=account_id, filters=dict(order_by='date_desc'))[:limit]),
+    }
+
+    results = {}
+    for name, (serializer_class, queryset) in scenarios.items():
+        serializer_timings, expected = _time(_serializer_page, serializer_class, queryset, repeat)
+        values_timings, content = _time(_values_page, serializer_class, queryset, repeat)
+
+        results[name] = dict(serializer_ms=statistics.median(serializer_timings),
+                             values_ms=statistics.median(values_timings),
+                             identical=content == expected)
+    return results
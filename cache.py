@@ -0,0 +1,152 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction as db_transaction
+
+_local_cache = None
+_stats = dict(hits=0, misses=0)
+_stats_lock = threading.Lock()
+_missing = object()
+
+
+def ledger_cache():
+    """
+    The cache alias named by settings.LEDGER_CACHE, or a process local LocMemCache.
+    Deployments with several processes need a shared backend for writes in one
+    process to invalidate reads in the others, and only a shared backend caches data.
+    """
+    global _local_cache
+
+    alias = getattr(settings, 'LEDGER_CACHE', None)
+    if alias:
+        return caches[alias]
+
+    if _local_cache is None:
+        _local_cache = LocMemCache('flowback-ledger', dict(OPTIONS=dict(MAX_ENTRIES=10000)))
+    return _local_cache
+
+
+def ledger_cache_shared() -> bool:
+    """Whether settings.LEDGER_CACHE names a backend the processes share."""
+    alias = getattr(settings, 'LEDGER_CACHE', None)
+    return bool(alias) and not isinstance(caches[alias], (LocMemCache, DummyCache))
+
+
+def _version_keys(*, user_id: int = None, account_id: int = None) -> list[str]:
+    keys = ['ledger:version:global']
+    if user_id is not None:
+        keys.append(f'ledger:version:user:{user_id}')
+    if account_id is not None:
+        keys.append(f'ledger:version:account:{account_id}')
+    return keys
+
+
+def _modified_key(version_key: str) -> str:
+    return version_key.replace(':version:', ':modified:', 1)
+
+
+def ledger_versions(*, user_id: int = None, account_id: int = None) -> list[int]:
+    cache = ledger_cache()
+    keys = _version_keys(user_id=user_id, account_id=account_id)
+    versions = cache.get_many(keys)
+
+    for key in keys:
+        if key not in versions:
+            # A fresh counter starts from the clock so it never repeats an evicted one,
+            # and nothing is known about earlier changes so they count as happening now
+            cache.add(key, time.time_ns(), None)
+            cache.add(_modified_key(key), time.time(), None)
+            versions[key] = cache.get(key)
+
+    return [versions[key] for key in keys]
+
+
+def ledger_last_modified(*, user_id: int = None, account_id: int = None):
+    """
+    When the user or account last changed, or None without a shared cache. The change
+    counters never expire, so a process that misses another's writes would otherwise
+    answer 304 for its stale rows indefinitely.
+    """
+    if not ledger_cache_shared():
+        return None
+
+    keys = [_modified_key(key) for key in _version_keys(user_id=user_id, account_id=account_id)]
+    modified = ledger_cache().get_many(keys)
+    if len(modified) < len(keys):
+        return None
+
+    # HTTP dates drop the fraction, rounding up keeps a change later in the same second visible
+    return datetime.fromtimestamp(math.ceil(max(modified.values())), tz=timezone.utc)
+
+
+def ledger_etag(key: str, *, user_id: int = None, account_id: int = None) -> Optional[str]:
+    """The ETag of key at the user and account versions, or None without a shared cache, see ledger_last_modified."""
+    if not ledger_cache_shared():
+        return None
+
+    versions = ledger_versions(user_id=user_id, account_id=account_id)
+    return '"{}"'.format(hashlib.md5(f'{key}:{user_id}:{account_id}:{versions}'.encode()).hexdigest())
+
+
+def _bump(keys: list[str]):
+    cache = ledger_cache()
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+        cache.set(_modified_key(key), time.time(), None)
+
+
+def ledger_cache_invalidate(*, user_id: int = None, account_id: int = None):
+    """
+    Bumps the change counters of the user and account. Bumped again on commit, as a
+    read between the first bump and the commit may have cached the old rows.
+    """
+    keys = _version_keys(user_id=user_id, account_id=account_id)[1:]
+    _bump(keys)
+    db_transaction.on_commit(lambda: _bump(keys))
+
+
+def ledger_cache_invalidate_all():
+    keys = _version_keys()
+    _bump(keys)
+    db_transaction.on_commit(lambda: _bump(keys))
+
+
+def ledger_cached(key: str, compute, *, user_id: int = None, account_id: int = None):
+    """
+    Returns the cached value of compute() for key at the current user and account
+    versions. Without a shared cache compute() runs every time, as the other processes
+    would keep serving the value a write in this one invalidated, see ledger_last_modified.
+    """
+    if not ledger_cache_shared():
+        return compute()
+
+    cache = ledger_cache()
+    versions = ledger_versions(user_id=user_id, account_id=account_id)
+    digest = hashlib.md5(f'{key}:{user_id}:{account_id}:{versions}'.encode()).hexdigest()
+    cache_key = f'ledger:data:{digest}'
+
+    value = cache.get(cache_key, _missing)
+    with _stats_lock:
+        _stats['hits' if value is not _missing else 'misses'] += 1
+
+    if value is _missing:
+        value = compute()
+        cache.set(cache_key, value, getattr(settings, 'LEDGER_CACHE_TIMEOUT', 300))
+
+    return value
+
+
+def ledger_cache_stats() -> dict:
+    with _stats_lock:
+        return dict(_stats)
@@ -0,0 +1,33 @@
+import csv
+import json
+from decimal import Decimal
+from typing import Iterable, Iterator
+
+EXPORT_FIELDS = ['id', 'date', 'verification_number', 'description', 'debit_amount', 'credit_amount']
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def _export_value(value):
+    if value is None:
+        return None
+    if isinstance(value, Decimal):
+        return str(value)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def csv_lines(header: list[str], rows: Iterable[tuple]) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(['' if value is None else _export_value(value) for value in row])
+
+
+def ndjson_lines(header: list[str], rows: Iterable[tuple]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(dict(zip(header, map(_export_value, row))), separators=(',', ':')) + '\n'
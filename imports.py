@@ -0,0 +1,44 @@
+import csv
+import json
+from decimal import Decimal
+from typing import Iterator
+
+IMPORT_FIELDS = ['debit_amount', 'credit_amount', 'description', 'verification_number', 'date']
+
+
+def _iter_lines(stream) -> Iterator[str]:
+    if stream is None:
+        return
+
+    for line in iter(stream.readline, b''):
+        yield line.decode('utf-8-sig')
+
+
+def csv_rows(stream) -> Iterator[tuple[int, dict, str]]:
+    """Yields (row number, row, error) for every data row of a CSV stream with a header row."""
+    reader = csv.DictReader(_iter_lines(stream))
+    for row_number, row in enumerate(reader, start=1):
+        if None in row:
+            yield row_number, {}, 'Row has more columns than the header'
+            continue
+
+        yield row_number, {key: value for key, value in row.items() if key in IMPORT_FIELDS}, None
+
+
+def ndjson_rows(stream) -> Iterator[tuple[int, dict, str]]:
+    """Yields (row number, row, error) for every non-empty line of a newline delimited JSON stream."""
+    for row_number, line in enumerate(_iter_lines(stream), start=1):
+        if not line.strip():
+            continue
+
+        try:
+            row = json.loads(line, parse_float=Decimal)
+        except ValueError:
+            yield row_number, {}, 'Invalid JSON'
+            continue
+
+        if not isinstance(row, dict):
+            yield row_number, {}, 'Row must be a JSON object'
+            continue
+
+        yield row_number, {key: value for key, value in row.items() if key in IMPORT_FIELDS}, None
@@ -0,0 +1,269 @@
+import json
+import logging
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import timedelta
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import APIException
+
+from flowback_addon.ledger.exports import csv_lines, ndjson_lines
+from flowback_addon.ledger.models import LedgerJob
+from flowback_addon.ledger.selectors import transaction_export, transaction_list, trial_balance
+from flowback_addon.ledger.services import account_balances_rebuild, ledger_jobs_cleanup
+
+logger = logging.getLogger('flowback_addon.ledger.jobs')
+
+# Rows an export writes, and accounts a rebuild locks in one transaction, between progress reports
+JOB_EXPORT_CHUNK_SIZE = 2000
+JOB_REBUILD_CHUNK_SIZE = 100
+
+_executor = None
+_executor_lock = threading.Lock()
+_poller = None
+# The jobs submitted to the worker threads of this process and not finished yet
+_queued = set()
+
+
+def _job_workers() -> int:
+    return getattr(settings, 'LEDGER_JOB_WORKERS', 2)
+
+
+def _job_poll_seconds() -> float:
+    return getattr(settings, 'LEDGER_JOB_POLL_SECONDS', 30)
+
+
+def _job_stale_minutes() -> int:
+    return getattr(settings, 'LEDGER_JOB_STALE_MINUTES', 30)
+
+
+def _job_retention_days() -> Optional[int]:
+    return getattr(settings, 'LEDGER_JOB_RETENTION_DAYS', 7)
+
+
+def _job_executor() -> ThreadPoolExecutor:
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_job_workers(), thread_name_prefix='ledger-job')
+        return _executor
+
+
+def _job_dates(params: dict, *names: str) -> list:
+    return [parse_datetime(params[name]) if params.get(name) else None for name in names]
+
+
+def _transaction_export_job(job: LedgerJob, output, progress: Callable) -> tuple[str, str]:
+    params = job.params
+    date__gte, date__lte = _job_dates(params, 'date__gte', 'date__lte')
+    filters = {name: value for name, value in (('date__gte', date__gte), ('date__lte', date__lte)) if value}
+    output_format = params.get('output_format', 'csv')
+
+    total = transaction_list(account_id=params['account_id'], filters=filters).count()
+    progress(0, total)
+
+    header, rows = transaction_export(user_id=job.user_id,
+                                      account_id=params['account_id'],
+                                      filters=filters,
+                                      running_balance=params.get('running_balance', False),
+                                      chunk_size=JOB_EXPORT_CHUNK_SIZE)
+
+    def counted(rows):
+        done = 0
+        for done, row in enumerate(rows, 1):
+            yield row
+            if done % JOB_EXPORT_CHUNK_SIZE == 0:
+                progress(done, total)
+        progress(done, done)
+
+    lines = ndjson_lines if output_format == 'ndjson' else csv_lines
+    for line in lines(header, counted(rows)):
+        output.write(line.encode())
+
+    content_type = 'application/x-ndjson' if output_format == 'ndjson' else 'text/csv'
+    return f'account-{params["account_id"]}-transactions.{output_format}', content_type
+
+
+def _trial_balance_job(job: LedgerJob, output, progress: Callable) -> tuple[str, str]:
+    as_of, date__gte, date__lte = _job_dates(job.params, 'as_of', 'date__gte', 'date__lte')
+    date_range = (date__gte, date__lte) if date__gte or date__lte else None
+
+    progress(0, 1)
+    balance = trial_balance(user_id=job.user_id, as_of=as_of, date_range=date_range)
+    output.write(json.dumps(balance, cls=DjangoJSONEncoder).encode())
+    progress(1, 1)
+
+    return 'trial-balance.json', 'application/json'
+
+
+def _balance_rebuild_job(job: LedgerJob, output, progress: Callable) -> tuple[str, str]:
+    rebuilt = account_balances_rebuild(account_ids=job.params.get('account_ids') or None,
+                                       user_id=job.user_id,
+                                       chunk_size=JOB_REBUILD_CHUNK_SIZE,
+                                       progress=progress)
+
+    output.write(json.dumps(dict(accounts=rebuilt)).encode())
+    return 'balance-rebuild.json', 'application/json'
+
+
+# Each handler writes the job result to a binary file, reports progress(done, total) at
+# least once per chunk and returns the result file name and content type
+JOB_HANDLERS = {
+    LedgerJob.Kind.TRANSACTION_EXPORT: _transaction_export_job,
+    LedgerJob.Kind.TRIAL_BALANCE: _trial_balance_job,
+    LedgerJob.Kind.BALANCE_REBUILD: _balance_rebuild_job,
+}
+
+
+def _job_error(exc: Exception) -> str:
+    if isinstance(exc, ValidationError):
+        messages = exc.messages
+    elif isinstance(exc, APIException):
+        messages = exc.detail if isinstance(exc.detail, list) else [exc.detail]
+    else:
+        messages = [str(exc) or type(exc).__name__]
+    return '; '.join(str(message) for message in messages)
+
+
+def ledger_job_run(job_id: int) -> Optional[LedgerJob]:
+    """
+    Runs a pending job in the calling thread and stores its result file, or its error
+    when it fails. Returns None for a job another worker claimed first.
+    """
+    claimed = (LedgerJob.objects
+               .filter(id=job_id, status=LedgerJob.Status.PENDING)
+               .update(status=LedgerJob.Status.RUNNING, started_at=timezone.now(), updated_at=timezone.now()))
+    if not claimed:
+        return None
+    job = LedgerJob.objects.get(id=job_id)
+    # Only this run while the job is not queued again as stale and claimed by another
+    this_run = LedgerJob.objects.filter(id=job_id, status=LedgerJob.Status.RUNNING, started_at=job.started_at)
+
+    def progress(done: int, total: Optional[int]):
+        # Also refreshes updated_at, which ledger_jobs_requeue_stale reads as a heartbeat
+        this_run.update(progress_done=done, progress_total=total, updated_at=timezone.now())
+
+    try:
+        with tempfile.TemporaryFile() as output:
+            filename, content_type = JOB_HANDLERS[job.kind](job, output, progress)
+            output.seek(0)
+            job.result_file.save(f'job-{job.id}-{filename}', File(output), save=False)
+        job.result_content_type = content_type
+        job.status = LedgerJob.Status.SUCCEEDED
+    except Exception as exc:
+        logger.exception('Ledger job %s (%s) failed', job.id, job.kind)
+        job.error = _job_error(exc)
+        job.status = LedgerJob.Status.FAILED
+
+    job.finished_at = timezone.now()
+    finished = this_run.update(status=job.status, result_file=job.result_file.name or '',
+                               result_content_type=job.result_content_type, error=job.error,
+                               finished_at=job.finished_at, updated_at=job.finished_at)
+    if not finished:
+        logger.warning('Ledger job %s (%s) was queued again while running, dropping this run', job.id, job.kind)
+        if job.result_file:
+            job.result_file.delete(save=False)
+        return None
+    return job
+
+
+def _job_thread_run(job_id: int):
+    try:
+        ledger_job_run(job_id)
+    finally:
+        with _executor_lock:
+            _queued.discard(job_id)
+        connection.close()
+
+
+def _job_submit(job_id: int) -> Optional[Future]:
+    with _executor_lock:
+        if job_id in _queued:
+            return None
+        _queued.add(job_id)
+    return _job_executor().submit(_job_thread_run, job_id)
+
+
+def ledger_jobs_poll() -> int:
+    """
+    Queues the stale jobs again, deletes the jobs older than LEDGER_JOB_RETENTION_DAYS
+    and submits the pending jobs to the worker threads. Returns how many it submitted.
+    """
+    ledger_jobs_requeue_stale(minutes=_job_stale_minutes())
+    if _job_retention_days() is not None:
+        ledger_jobs_cleanup(days=_job_retention_days())
+
+    job_ids = LedgerJob.objects.filter(status=LedgerJob.Status.PENDING).order_by('created_at', 'id')
+    return sum(_job_submit(job_id) is not None for job_id in job_ids.values_list('id', flat=True))
+
+
+def _job_poll_loop():
+    while True:
+        time.sleep(_job_poll_seconds())
+        if _job_workers() <= 0:
+            continue
+
+        try:
+            ledger_jobs_poll()
+        except Exception:
+            logger.exception('Polling the ledger jobs failed')
+        finally:
+            connection.close()
+
+
+def ledger_job_workers_start():
+    """
+    Starts the worker threads of this process along with a thread polling every
+    LEDGER_JOB_POLL_SECONDS for the jobs no worker runs: created before a restart, by
+    a process without workers, or queued again as stale. Web processes start them with
+    their first job request. With LEDGER_JOB_WORKERS = 0 the ledger_run_jobs command
+    has to run instead.
+    """
+    global _poller
+
+    if _job_workers() <= 0:
+        return
+
+    with _executor_lock:
+        if _poller is None:
+            _poller = threading.Thread(target=_job_poll_loop, name='ledger-job-poller', daemon=True)
+            _poller.start()
+
+
+def ledger_job_enqueue(job_id: int) -> Optional[Future]:
+    """
+    Runs the job on the worker threads of this process, LEDGER_JOB_WORKERS of them.
+    With LEDGER_JOB_WORKERS = 0 the job waits for the ledger_run_jobs command instead.
+    """
+    if _job_workers() <= 0:
+        return None
+
+    ledger_job_workers_start()
+    return _job_submit(job_id)
+
+
+def ledger_jobs_run_pending(*, limit: int = None) -> int:
+    """Runs the pending jobs in the calling thread, oldest first. Returns how many ran."""
+    job_ids = LedgerJob.objects.filter(status=LedgerJob.Status.PENDING).order_by('created_at', 'id')
+    ran = 0
+    for job_id in job_ids.values_list('id', flat=True)[:limit]:
+        if ledger_job_run(job_id) is not None:
+            ran += 1
+    return ran
+
+
+def ledger_jobs_requeue_stale(*, minutes: int) -> int:
+    """Puts back the running jobs without progress for `minutes`, left behind by a stopped worker."""
+    return (LedgerJob.objects
+            .filter(status=LedgerJob.Status.RUNNING, updated_at__lt=timezone.now() - timedelta(minutes=minutes))
+            .update(status=LedgerJob.Status.PENDING, started_at=None, updated_at=timezone.now()))
@@ -0,0 +1,38 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from flowback_addon.ledger.benchmarks.endpoints import run_endpoint_benchmark
+from flowback_addon.ledger.benchmarks.seed import add_benchmark_ledger_arguments, benchmark_ledger
+
+
+class Command(BaseCommand):
+    help = ('Time every ledger endpoint against a seeded ledger, write the results as JSON and fail '
+            'when a scenario fails or runs more queries than its budget. Do not run against a production database.')
+
+    def add_arguments(self, parser):
+        add_benchmark_ledger_arguments(parser, accounts_per_user=100)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--output', help='Write the JSON results to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        with benchmark_ledger(options) as (user_id, (account_id,)):
+            results = run_endpoint_benchmark(user_id=user_id, account_id=account_id, repeat=options['repeat'])
+
+        output = json.dumps(dict(user_id=user_id, account_id=account_id, repeat=options['repeat'],
+                                 results=results), indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+        failed = {name: result for name, result in results.items()
+                  if not result['succeeded'] or not result['within_budget']}
+        for name, result in failed.items():
+            if not result['succeeded']:
+                self.stderr.write(f'{name}: status {result["status"]}')
+            else:
+                self.stderr.write(f'{name}: {result["queries"]} queries, budget {result["budget"]}')
+        if failed:
+            raise CommandError(f'{len(failed)} scenario(s) failed or went over their query budget')
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from flowback_addon.ledger.benchmarks.concurrency import run_concurrency_benchmark
+from flowback_addon.ledger.benchmarks.seed import add_benchmark_ledger_arguments, benchmark_ledger
+
+
+class Command(BaseCommand):
+    help = ('Send concurrent requests to the sync and async list and balance views the way an ASGI '
+            'server runs them and print requests/sec by concurrency. Needs a database that allows '
+            'several connections, such as PostgreSQL.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+        parser.add_argument('--requests', type=int, default=200)
+        add_benchmark_ledger_arguments(parser, accounts_per_user=100)
+
+    def handle(self, *args, **options):
+        if not connection.features.test_db_allows_multiple_connections:
+            raise CommandError(f'The {connection.vendor} database does not allow several connections')
+
+        with benchmark_ledger(options) as (user_id, (account_id,)):
+            results = run_concurrency_benchmark(user_id=user_id, account_id=account_id,
+                                                concurrency_levels=options['concurrency'],
+                                                requests=options['requests'])
+
+        self.stdout.write(f'{"scenario":<20}{"concurrency":>12}{"sync req/s":>12}{"async req/s":>13}{"speedup":>10}')
+        for name, levels in results.items():
+            for concurrency, result in levels.items():
+                sync_rps, async_rps = result['sync']['requests_per_second'], result['async']['requests_per_second']
+                self.stdout.write(f'{name:<20}{concurrency:>12}{sync_rps:>12.1f}{async_rps:>13.1f}'
+                                  f'{async_rps / max(sync_rps, 1e-9):>9.1f}x')
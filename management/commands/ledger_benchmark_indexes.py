@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from flowback_addon.ledger.benchmarks.indexes import run_index_benchmark
+from flowback_addon.ledger.benchmarks.seed import add_benchmark_ledger_arguments, benchmark_ledger
+
+
+class Command(BaseCommand):
+    help = ('Seed a large ledger and print query plans and timings of the hot ledger queries '
+            'with and without the composite indexes. Do not run against a production database.')
+
+    def add_arguments(self, parser):
+        add_benchmark_ledger_arguments(parser, users=10, accounts_per_user=10, transactions_per_account=10000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        if options['user_id'] is None:
+            self.stdout.write('Seeding {} transactions...'.format(
+                options['users'] * options['accounts_per_user'] * options['transactions_per_account']))
+
+        with benchmark_ledger(options) as (user_id, (account_id,)):
+            results = run_index_benchmark(user_id=user_id, account_id=account_id, repeat=options['repeat'])
+
+        for name in results['before']:
+            before, after = results['before'][name], results['after'][name]
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(f'  before: {before["median_ms"]:.2f} ms (min {before["min_ms"]:.2f} ms)')
+            self.stdout.write('    ' + before['plan'].replace('\n', '\n    '))
+            self.stdout.write(f'  after:  {after["median_ms"]:.2f} ms (min {after["min_ms"]:.2f} ms)')
+            self.stdout.write('    ' + after['plan'].replace('\n', '\n    '))
+
+        self.stdout.write('')
+        self.stdout.write(f'{"scenario":<40}{"before ms":>12}{"after ms":>12}{"speedup":>10}')
+        for name in results['before']:
+            before, after = results['before'][name]['median_ms'], results['after'][name]['median_ms']
+            self.stdout.write(f'{name:<40}{before:>12.2f}{after:>12.2f}{before / max(after, 1e-6):>9.1f}x')
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from flowback_addon.ledger.benchmarks.posting import run_posting_benchmark
+from flowback_addon.ledger.benchmarks.seed import add_benchmark_ledger_arguments, benchmark_ledger
+
+
+class Command(BaseCommand):
+    help = ('Post to one account from a growing number of threads, check the cached balances stay '
+            'consistent and print posts/sec by writer count. Needs a database that allows concurrent '
+            'writers, such as PostgreSQL. Do not run against a production database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, nargs='+', default=[1, 2, 4, 8])
+        parser.add_argument('--posts-per-writer', type=int, default=100)
+        add_benchmark_ledger_arguments(parser, accounts_per_user=2)
+
+    def handle(self, *args, **options):
+        if not connection.features.has_select_for_update:
+            self.stderr.write(self.style.WARNING(f'{connection.vendor} has no row locks, '
+                                                 f'concurrent writers may fail with lock errors'))
+
+        # Posts to the first two accounts of the user
+        with benchmark_ledger(options, accounts=2) as (user_id, (account_id, other_account_id)):
+            results = run_posting_benchmark(user_id=user_id,
+                                            account_id=account_id,
+                                            other_account_id=other_account_id,
+                                            writer_counts=options['writers'],
+                                            posts_per_writer=options['posts_per_writer'])
+
+        self.stdout.write(f'{"writers":>8}{"posts":>8}{"seconds":>10}{"posts/sec":>12}{"consistent":>12}')
+        for writers, result in results.items():
+            self.stdout.write(f'{writers:>8}{result["posts"]:>8}{result["seconds"]:>10.2f}'
+                              f'{result["posts_per_second"]:>12.1f}{str(result["consistent"]):>12}')
+
+        inconsistent = [writers for writers, result in results.items() if not result['consistent']]
+        if inconsistent:
+            raise CommandError(f'Cached balances out of date after the runs with {inconsistent} writer(s)')
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from flowback_addon.ledger.benchmarks.seed import add_benchmark_ledger_arguments, benchmark_ledger
+from flowback_addon.ledger.benchmarks.serialization import run_serialization_benchmark
+
+
+class Command(BaseCommand):
+    help = ('Time list pages rendered through the DRF output serializers against the values() '
+            'fast path enabled by LEDGER_FAST_SERIALIZATION.')
+
+    def add_arguments(self, parser):
+        add_benchmark_ledger_arguments(parser, accounts_per_user=100, transactions_per_account=200)
+        parser.add_argument('--limit', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with benchmark_ledger(options) as (user_id, (account_id,)):
+            results = run_serialization_benchmark(user_id=user_id, account_id=account_id,
+                                                  limit=options['limit'], repeat=options['repeat'])
+
+        self.stdout.write(f'{"scenario":<24}{"serializer ms":>16}{"values ms":>12}{"speedup":>10}{"identical":>11}')
+        for name, result in results.items():
+            self.stdout.write(f'{name:<24}{result["serializer_ms"]:>16.2f}{result["values_ms"]:>12.2f}'
+                              f'{result["serializer_ms"] / max(result["values_ms"], 1e-6):>9.1f}x'
+                              f'{str(result["identical"]):>11}')
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from flowback_addon.ledger.services import account_checkpoints_build
+
+
+class Command(BaseCommand):
+    help = 'Add monthly balance checkpoints for every closed month since the latest checkpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--account', type=int, action='append', dest='account_ids',
+                            help='Restrict to the given account id, can be repeated')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Delete the existing checkpoints and build them from scratch')
+
+    def handle(self, *args, account_ids=None, rebuild=False, **options):
+        count = account_checkpoints_build(account_ids=account_ids, rebuild=rebuild)
+        self.stdout.write(self.style.SUCCESS(f'Created {count} balance checkpoint(s)'))
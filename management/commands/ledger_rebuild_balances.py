@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from flowback_addon.ledger.selectors import account_balance_discrepancies
+from flowback_addon.ledger.services import account_balances_rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or verify the cached account balances from the transaction history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--account', type=int, action='append', dest='account_ids',
+                            help='Restrict to the given account id, can be repeated')
+        parser.add_argument('--verify', action='store_true',
+                            help='Only report accounts whose cached balance is out of date')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--chunk-size', type=int, default=100,
+                            help='Accounts locked and rebuilt in one transaction')
+
+    def handle(self, *args, account_ids=None, verify=False, batch_size=1000, chunk_size=100, **options):
+        if verify:
+            discrepancies = list(account_balance_discrepancies(account_ids=account_ids))
+            for row in discrepancies:
+                self.stderr.write(f"Account {row['id']}: "
+                                  f"cached debit {row['cached_debit_total']} credit {row['cached_credit_total']} "
+                                  f"balance {row['cached_balance']}, "
+                                  f"expected debit {row['debit_total']} credit {row['credit_total']} "
+                                  f"balance {row['balance_total']}")
+
+            if discrepancies:
+                raise CommandError(f"{len(discrepancies)} account(s) have an out of date cached balance")
+
+            self.stdout.write(self.style.SUCCESS('All cached balances are up to date'))
+            return
+
+        count = account_balances_rebuild(account_ids=account_ids, chunk_size=chunk_size, batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt cached balance for {count} account(s)'))
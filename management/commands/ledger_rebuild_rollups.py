@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from flowback_addon.ledger.services import account_rollups_rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily and monthly account rollups from the transaction history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--account', type=int, action='append', dest='account_ids',
+                            help='Restrict to the given account id, can be repeated')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, account_ids=None, batch_size=1000, **options):
+        count = account_rollups_rebuild(account_ids=account_ids, batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(f'Created {count} rollup(s)'))
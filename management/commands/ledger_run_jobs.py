@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from flowback_addon.ledger.jobs import ledger_jobs_requeue_stale, ledger_jobs_run_pending
+from flowback_addon.ledger.services import ledger_jobs_cleanup
+
+
+class Command(BaseCommand):
+    help = ('Run the pending ledger jobs, as a worker process next to or instead of the worker threads '
+            'of the web processes (LEDGER_JOB_WORKERS = 0). Jobs left running by a stopped worker are '
+            'queued again once they report no progress for --stale-minutes. Finished jobs are deleted '
+            'with their result files after --retention-days.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling for new jobs instead of exiting once the queue is empty')
+        parser.add_argument('--poll-seconds', type=float, default=2)
+        parser.add_argument('--stale-minutes', type=int, default=30)
+        parser.add_argument('--limit', type=int, default=None)
+        parser.add_argument('--retention-days', type=int, default=None,
+                            help='Delete the jobs finished more than this many days ago')
+
+    def handle(self, *args, **options):
+        while True:
+            requeued = ledger_jobs_requeue_stale(minutes=options['stale_minutes'])
+            if requeued:
+                self.stdout.write(f'Queued {requeued} stale job(s) again')
+
+            if options['retention_days'] is not None:
+                deleted = ledger_jobs_cleanup(days=options['retention_days'])
+                if deleted:
+                    self.stdout.write(f'Deleted {deleted} finished job(s)')
+
+            ran = ledger_jobs_run_pending(limit=options['limit'])
+            if ran:
+                self.stdout.write(f'Ran {ran} job(s)')
+
+            if not options['loop']:
+                return
+            if not ran:
+                time.sleep(options['poll_seconds'])
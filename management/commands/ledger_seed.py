@@ -0,0 +1,42 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from flowback_addon.ledger.benchmarks.seed import seed_ledger, seed_ledger_delete
+
+
+class Command(BaseCommand):
+    help = ('Seed users, accounts and transactions for benchmarking and print the seeded user ids as JSON, '
+            'or delete an earlier seeded ledger. Do not run against a production database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1)
+        parser.add_argument('--accounts-per-user', type=int, default=10)
+        parser.add_argument('--transactions-per-account', type=int, default=1000)
+        parser.add_argument('--days', type=int, default=365 * 3,
+                            help='Spread the transaction dates over this many days back from now')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--delete', type=int, nargs='+', metavar='USER_ID',
+                            help='Delete the ledgers of the given seeded users instead, other users are refused')
+
+    def handle(self, *args, **options):
+        if options['delete']:
+            deleted = seed_ledger_delete(user_ids=options['delete'])
+            self.stdout.write(self.style.SUCCESS(f'Deleted {len(deleted)} seeded user(s)'))
+
+            refused = sorted(set(options['delete']) - set(deleted))
+            if refused:
+                raise CommandError(f'Not seeded by ledger_seed, left alone: {", ".join(map(str, refused))}')
+            return
+
+        try:
+            user_ids = seed_ledger(users=options['users'],
+                                   accounts_per_user=options['accounts_per_user'],
+                                   transactions_per_account=options['transactions_per_account'],
+                                   days=options['days'],
+                                   batch_size=options['batch_size'],
+                                   seed=options['seed'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(json.dumps(dict(user_ids=user_ids)))
@@ -0,0 +1,227 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+from functools import partial, wraps
+
+from django.conf import settings
+from django.db import connections
+from django.http import FileResponse
+
+from flowback_addon.ledger.cache import ledger_cache_stats
+
+logger = logging.getLogger('flowback_addon.ledger.slow')
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+
+METRICS = {
+    'ledger_view_seconds': ('Time spent in a ledger view', SECONDS_BUCKETS),
+    'ledger_view_sql_queries': ('SQL queries run by a ledger view', COUNT_BUCKETS),
+    'ledger_view_sql_seconds': ('Time spent in the SQL queries of a ledger view', SECONDS_BUCKETS),
+    'ledger_view_rows': ('Rows serialized by a ledger view', COUNT_BUCKETS),
+    'ledger_span_seconds': ('Time spent in a phase of a ledger view', SECONDS_BUCKETS),
+    'ledger_function_seconds': ('Time spent in a ledger service or selector', SECONDS_BUCKETS),
+}
+
+_registry = {}
+_registry_lock = threading.Lock()
+_request = threading.local()
+
+
+def metrics_enabled() -> bool:
+    return getattr(settings, 'LEDGER_METRICS', False)
+
+
+def _slow_request_ms():
+    return getattr(settings, 'LEDGER_SLOW_REQUEST_MS', None)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+def observe(metric: str, value, **labels):
+    key = (metric, tuple(sorted(labels.items())))
+    with _registry_lock:
+        histogram = _registry.get(key)
+        if histogram is None:
+            histogram = _registry[key] = Histogram(METRICS[metric][1])
+        histogram.observe(value)
+
+
+def metrics_reset():
+    with _registry_lock:
+        _registry.clear()
+
+
+def _labels(labels: tuple, **extra) -> str:
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in pairs) + '}'
+
+
+def prometheus_text() -> str:
+    """The registry and the ledger cache counters in the Prometheus text exposition format."""
+    with _registry_lock:
+        histograms = {key: (list(h.counts), h.sum, h.count) for key, h in _registry.items()}
+
+    lines = []
+    for metric, (help_text, buckets) in METRICS.items():
+        series = sorted((labels, values) for (name, labels), values in histograms.items() if name == metric)
+        if not series:
+            continue
+
+        lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} histogram']
+        for labels, (counts, total, count) in series:
+            cumulative = 0
+            for bucket, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{metric}_bucket{_labels(labels, le=bucket)} {cumulative}')
+            lines.append(f'{metric}_bucket{_labels(labels, le="+Inf")} {count}')
+            lines.append(f'{metric}_sum{_labels(labels)} {total}')
+            lines.append(f'{metric}_count{_labels(labels)} {count}')
+
+    for name, value in ledger_cache_stats().items():
+        lines += [f'# TYPE ledger_cache_{name}_total counter', f'ledger_cache_{name}_total {value}']
+
+    return '\n'.join(lines) + '\n'
+
+
+def instrumented(func):
+    """Records the duration of every call of a service or selector when LEDGER_METRICS is on."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not metrics_enabled():
+            return func(*args, **kwargs)
+
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            observe('ledger_function_seconds', time.perf_counter() - start, function=func.__name__)
+
+    return wrapper
+
+
+@contextmanager
+def ledger_span(name: str):
+    """Times a phase of the current ledger view, like the count or the serialization of a page."""
+    view = getattr(_request, 'view', None)
+    if view is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe('ledger_span_seconds', time.perf_counter() - start, view=view, span=name)
+
+
+class _QueryRecorder:
+    def __init__(self, keep_sql: bool):
+        self.keep_sql = keep_sql
+        self.count = 0
+        self.seconds = 0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.seconds += elapsed
+            if self.keep_sql:
+                self.queries.append((elapsed, sql, params))
+
+
+def _rows(response) -> int:
+    data = getattr(response, 'data', None)
+    if isinstance(data, dict) and isinstance(data.get('results'), list):
+        return len(data['results'])
+    if isinstance(data, list):
+        return len(data)
+    return 0
+
+
+def _queries_recorded(stack: ExitStack, recorder: _QueryRecorder):
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(recorder))
+
+
+class ViewMetricsMixin:
+    """
+    APIView mixin recording the duration, SQL queries and serialized rows of every
+    request when LEDGER_METRICS is on, and logging the requests slower than
+    LEDGER_SLOW_REQUEST_MS milliseconds with their SQL. A streamed response, like an
+    export, is recorded once the server consumed it, with the SQL its iterator ran.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        enabled, slow_ms = metrics_enabled(), _slow_request_ms()
+        if not enabled and slow_ms is None:
+            return super().dispatch(request, *args, **kwargs)
+
+        view = type(self).__name__
+        recorder = _QueryRecorder(keep_sql=slow_ms is not None)
+        _request.view = view if enabled else None
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                _queries_recorded(stack, recorder)
+                response = super().dispatch(request, *args, **kwargs)
+        finally:
+            _request.view = None
+
+        record = partial(self._metrics_record, request, response, recorder, start, enabled, slow_ms)
+        # A FileResponse runs no SQL and keeps its file for the server's wsgi.file_wrapper
+        if response.streaming and not getattr(response, 'is_async', False) and not isinstance(response, FileResponse):
+            response.streaming_content = self._metrics_stream(response.streaming_content, recorder, record)
+        else:
+            record()
+        return response
+
+    @staticmethod
+    def _metrics_stream(content, recorder: _QueryRecorder, record):
+        with ExitStack() as stack:
+            _queries_recorded(stack, recorder)
+            try:
+                yield from content
+            finally:
+                record()
+
+    def _metrics_record(self, request, response, recorder: _QueryRecorder, start: float, enabled: bool, slow_ms):
+        view, method = type(self).__name__, request.method
+        elapsed = time.perf_counter() - start
+
+        if enabled:
+            observe('ledger_view_seconds', elapsed, view=view, method=method)
+            observe('ledger_view_sql_queries', recorder.count, view=view, method=method)
+            observe('ledger_view_sql_seconds', recorder.seconds, view=view, method=method)
+            observe('ledger_view_rows', _rows(response), view=view, method=method)
+
+        if slow_ms is not None and elapsed * 1000 >= slow_ms:
+            logger.warning('%s %s took %.1f ms with %d queries (%.1f ms):\n%s',
+                           method, request.get_full_path(), elapsed * 1000, recorder.count, recorder.seconds * 1000,
+                           '\n'.join(f'  {seconds * 1000:.1f} ms: {sql} {params}'
+                                     for seconds, sql, params in recorder.queries))
@@ -0,0 +1,48 @@
+# Generated by Django 4.0.8 on 2026-10-16 09:12
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def populate_cached_balance(apps, schema_editor):
+    Account = apps.get_model('ledger', 'Account')
+    Transaction = apps.get_model('ledger', 'Transaction')
+
+    totals = (Transaction.objects.using(schema_editor.connection.alias)
+              .values('account_id')
+              .annotate(debit_total=Sum('debit_amount'), credit_total=Sum('credit_amount'))
+              .order_by())
+
+    for row in totals.iterator():
+        debit_total = row['debit_total'] or 0
+        credit_total = row['credit_total'] or 0
+        Account.objects.using(schema_editor.connection.alias).filter(id=row['account_id']).update(
+            cached_debit_total=debit_total,
+            cached_credit_total=credit_total,
+            cached_balance=credit_total - debit_total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='cached_balance',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=20),
+        ),
+        migrations.AddField(
+            model_name='account',
+            name='cached_credit_total',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=20),
+        ),
+        migrations.AddField(
+            model_name='account',
+            name='cached_debit_total',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=20),
+        ),
+        migrations.RunPython(populate_cached_balance, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.0.8 on 2026-10-16 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0002_account_cached_balance'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='account',
+            index=models.Index(fields=['user', 'created_at'], name='ledger_account_user_created'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['account', 'date', 'id'], name='ledger_tx_account_date'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['account', 'created_at', 'id'], name='ledger_tx_account_created'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['account', 'debit_amount', 'credit_amount'], name='ledger_tx_account_amounts'),
+        ),
+    ]
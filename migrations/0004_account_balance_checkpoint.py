@@ -0,0 +1,29 @@
+# Generated by Django 4.0.8 on 2026-10-16 11:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0003_ledger_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountBalanceCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_end', models.DateTimeField()),
+                ('debit_total', models.DecimalField(decimal_places=5, default=0, max_digits=20)),
+                ('credit_total', models.DecimalField(decimal_places=5, default=0, max_digits=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_checkpoints', to='ledger.account')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='accountbalancecheckpoint',
+            constraint=models.UniqueConstraint(fields=('account', 'period_end'), name='ledger_checkpoint_account_period'),
+        ),
+    ]
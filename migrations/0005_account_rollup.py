@@ -0,0 +1,30 @@
+# Generated by Django 4.0.8 on 2026-10-16 12:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0004_account_balance_checkpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('day', 'Day'), ('month', 'Month')], max_length=5)),
+                ('period_start', models.DateTimeField()),
+                ('debit_total', models.DecimalField(decimal_places=5, default=0, max_digits=20)),
+                ('credit_total', models.DecimalField(decimal_places=5, default=0, max_digits=20)),
+                ('transaction_count', models.IntegerField(default=0)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='ledger.account')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='accountrollup',
+            constraint=models.UniqueConstraint(fields=('account', 'granularity', 'period_start'), name='ledger_rollup_account_period'),
+        ),
+    ]
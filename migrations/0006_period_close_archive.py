@@ -0,0 +1,71 @@
+# Generated by Django 4.0.8 on 2026-10-16 21:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+HISTORY_COLUMNS = ('id, account_id, debit_amount, credit_amount, description, verification_number, '
+                   '"date", created_at, updated_at')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0005_account_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='closed_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='is_opening_balance',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='ArchivedTransaction',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('debit_amount', models.DecimalField(blank=True, decimal_places=5, max_digits=15, null=True)),
+                ('credit_amount', models.DecimalField(blank=True, decimal_places=5, max_digits=15, null=True)),
+                ('description', models.CharField(max_length=100)),
+                ('verification_number', models.CharField(max_length=20)),
+                ('date', models.DateTimeField()),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_transactions', to='ledger.account')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedtransaction',
+            index=models.Index(fields=['account', 'date', 'id'], name='ledger_archive_account_date'),
+        ),
+        migrations.CreateModel(
+            name='TransactionHistory',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('debit_amount', models.DecimalField(blank=True, decimal_places=5, max_digits=15, null=True)),
+                ('credit_amount', models.DecimalField(blank=True, decimal_places=5, max_digits=15, null=True)),
+                ('description', models.CharField(max_length=100)),
+                ('verification_number', models.CharField(max_length=20)),
+                ('date', models.DateTimeField()),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('account', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='history', to='ledger.account')),
+            ],
+            options={
+                'db_table': 'ledger_transaction_history',
+                'managed': False,
+            },
+        ),
+        migrations.RunSQL(
+            sql=(f'CREATE VIEW ledger_transaction_history AS '
+                 f'SELECT {HISTORY_COLUMNS} FROM ledger_transaction WHERE NOT is_opening_balance '
+                 f'UNION ALL '
+                 f'SELECT {HISTORY_COLUMNS} FROM ledger_archivedtransaction'),
+            reverse_sql='DROP VIEW ledger_transaction_history',
+        ),
+    ]
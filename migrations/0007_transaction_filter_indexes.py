@@ -0,0 +1,41 @@
+# Generated by Django 4.0.8 on 2026-10-16 21:40
+
+from django.db import migrations, models
+
+
+def create_description_trigram_index(apps, schema_editor):
+    # icontains compiles to UPPER("description"::text) LIKE UPPER(%s) on PostgreSQL,
+    # other backends scan the rows of the account through the account indexes
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute('CREATE INDEX IF NOT EXISTS ledger_tx_description_trgm ON ledger_transaction '
+                          'USING gin ((UPPER(description::text)) gin_trgm_ops)')
+
+
+def drop_description_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute('DROP INDEX IF EXISTS ledger_tx_description_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0006_period_close_archive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['account', 'credit_amount'], name='ledger_tx_account_credit'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['account', 'verification_number'], name='ledger_tx_account_verification',
+                               opclasses=['int8_ops', 'varchar_pattern_ops']),
+        ),
+        migrations.RunPython(create_description_trigram_index, drop_description_trigram_index),
+    ]
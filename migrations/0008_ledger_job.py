@@ -0,0 +1,43 @@
+# Generated by Django 4.0.8 on 2026-10-16 22:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('ledger', '0007_transaction_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('kind', models.CharField(choices=[('transaction_export', 'Transaction Export'), ('trial_balance', 'Trial Balance'), ('balance_rebuild', 'Balance Rebuild')], max_length=20)),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('progress_done', models.BigIntegerField(default=0)),
+                ('progress_total', models.BigIntegerField(blank=True, null=True)),
+                ('result_file', models.FileField(blank=True, null=True, upload_to='ledger/jobs/')),
+                ('result_content_type', models.CharField(blank=True, max_length=50)),
+                ('error', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='ledgerjob',
+            index=models.Index(fields=['user', 'created_at'], name='ledger_job_user_created'),
+        ),
+        migrations.AddIndex(
+            model_name='ledgerjob',
+            index=models.Index(fields=['status', 'created_at'], name='ledger_job_status_created'),
+        ),
+    ]
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
@@ -9,10 +10,21 @@ class Account(BaseModel):
     account_name = models.CharField(max_length=100)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
 
+    # Running totals maintained by the transaction services, see services.py
+    cached_debit_total = models.DecimalField(max_digits=20, decimal_places=5, default=0)
+    cached_credit_total = models.DecimalField(max_digits=20, decimal_places=5, default=0)
+    cached_balance = models.DecimalField(max_digits=20, decimal_places=5, default=0)
+
+    # Transactions dated before closed_until live in ArchivedTransaction, see period_close
+    closed_until = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='ledger_account_user_created'),
+        ]
+
     def balance(self):
-        debit_total = self.transactions.filter(debit_amount__isnull=False).aggregate(models.Sum('debit_amount')).get('debit_amount__sum', 0)
-        credit_total = self.transactions.filter(credit_amount__isnull=False).aggregate(models.Sum('credit_amount')).get('credit_amount__sum', 0)
-        return credit_total - debit_total
+        return self.cached_balance
 
     def __str__(self):
         return self.account_name
@@ -24,6 +36,149 @@ class Transaction(BaseModel):
     description = models.CharField(max_length=100)
     verification_number = models.CharField(max_length=20)
     date = models.DateTimeField(default=timezone.now)
+    # Stands in for the archived transactions of the account, carrying their totals
+    is_opening_balance = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['account', 'date', 'id'], name='ledger_tx_account_date'),
+            models.Index(fields=['account', 'created_at', 'id'], name='ledger_tx_account_created'),
+            models.Index(fields=['account', 'debit_amount', 'credit_amount'], name='ledger_tx_account_amounts'),
+            models.Index(fields=['account', 'credit_amount'], name='ledger_tx_account_credit'),
+            # The pattern operator class lets PostgreSQL serve verification_number__startswith from the
+            # index, other backends ignore it. PostgreSQL also gets a trigram index on the description,
+            # see migration 0007
+            models.Index(fields=['account', 'verification_number'], name='ledger_tx_account_verification',
+                         opclasses=['int8_ops', 'varchar_pattern_ops']),
+        ]
+
+    def __str__(self):
+        return self.description
+
+class ArchivedTransaction(models.Model):
+    """A transaction of a closed period, keeping the id it had in Transaction."""
+    id = models.BigIntegerField(primary_key=True)
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='archived_transactions')
+    debit_amount = models.DecimalField(max_digits=15, decimal_places=5, null=True, blank=True)
+    credit_amount = models.DecimalField(max_digits=15, decimal_places=5, null=True, blank=True)
+    description = models.CharField(max_length=100)
+    verification_number = models.CharField(max_length=20)
+    date = models.DateTimeField()
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['account', 'date', 'id'], name='ledger_archive_account_date'),
+        ]
+
+    def __str__(self):
+        return self.description
+
+
+class TransactionHistory(models.Model):
+    """
+    Read only view over the whole history of every account: the archived transactions
+    and the transactions without the opening balances standing in for them.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    account = models.ForeignKey(Account, on_delete=models.DO_NOTHING, db_constraint=False, related_name='history')
+    debit_amount = models.DecimalField(max_digits=15, decimal_places=5, null=True, blank=True)
+    credit_amount = models.DecimalField(max_digits=15, decimal_places=5, null=True, blank=True)
+    description = models.CharField(max_length=100)
+    verification_number = models.CharField(max_length=20)
+    date = models.DateTimeField()
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        managed = False
+        db_table = 'ledger_transaction_history'
+
+    def __str__(self):
+        return self.description
+
+
+class AccountBalanceCheckpoint(models.Model):
+    """Cumulative totals of every transaction of the account dated before period_end."""
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='balance_checkpoints')
+    period_end = models.DateTimeField()
+    debit_total = models.DecimalField(max_digits=20, decimal_places=5, default=0)
+    credit_total = models.DecimalField(max_digits=20, decimal_places=5, default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'period_end'], name='ledger_checkpoint_account_period'),
+        ]
+
+    @property
+    def balance(self):
+        return self.credit_total - self.debit_total
+
+
+class AccountRollup(models.Model):
+    """Debit and credit totals of an account's transactions per day or month."""
+    class Granularity(models.TextChoices):
+        DAY = 'day'
+        MONTH = 'month'
+
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='rollups')
+    granularity = models.CharField(max_length=5, choices=Granularity.choices)
+    period_start = models.DateTimeField()
+    debit_total = models.DecimalField(max_digits=20, decimal_places=5, default=0)
+    credit_total = models.DecimalField(max_digits=20, decimal_places=5, default=0)
+    transaction_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'granularity', 'period_start'],
+                                    name='ledger_rollup_account_period'),
+        ]
+
+    @classmethod
+    def truncate(cls, date, granularity: str):
+        """Start of the period containing date, in the current timezone like TruncDay/TruncMonth."""
+        if settings.USE_TZ:
+            date = timezone.localtime(timezone.make_aware(date) if timezone.is_naive(date) else date)
+
+        date = date.replace(hour=0, minute=0, second=0, microsecond=0)
+        if granularity == cls.Granularity.MONTH:
+            date = date.replace(day=1)
+        return date
+
+
+class LedgerJob(BaseModel):
+    """A long running export, report or rebuild run by a worker outside the request, see jobs.py."""
+    class Kind(models.TextChoices):
+        TRANSACTION_EXPORT = 'transaction_export'
+        TRIAL_BALANCE = 'trial_balance'
+        BALANCE_REBUILD = 'balance_rebuild'
+
+    class Status(models.TextChoices):
+        PENDING = 'pending'
+        RUNNING = 'running'
+        SUCCEEDED = 'succeeded'
+        FAILED = 'failed'
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ledger_jobs')
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    # Rows or accounts processed so far, out of progress_total once the job knows it
+    progress_done = models.BigIntegerField(default=0)
+    progress_total = models.BigIntegerField(null=True, blank=True)
+    result_file = models.FileField(upload_to='ledger/jobs/', null=True, blank=True)
+    result_content_type = models.CharField(max_length=50, blank=True)
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='ledger_job_user_created'),
+            models.Index(fields=['status', 'created_at'], name='ledger_job_status_created'),
+        ]
 
     def __str__(self):
-        return self.description
\ No newline at end of file
+        return f'{self.kind} {self.status}'
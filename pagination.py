@@ -0,0 +1,165 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on (ordering field, id).
+
+    Pages are fetched with a `WHERE (field, id) > (last field, last id)` style
+    predicate instead of an OFFSET, so any page costs the same as the first one.
+    `ordering_fields` maps the `order_by` query values to a model field, prefixed
+    with '-' for descending order.
+    """
+    default_limit = 20
+    max_limit = 100
+    limit_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    ordering_query_param = 'order_by'
+    ordering_fields = {}
+    default_ordering = None
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_setup(request)
+        self.count = queryset.count() if self.get_with_count(request) else None
+
+        return self.page_results(list(self.page_slice(queryset)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset for async views, querying through the async ORM."""
+        self.page_setup(request)
+        self.count = await queryset.acount() if self.get_with_count(request) else None
+
+        return self.page_results([row async for row in self.page_slice(queryset).aiterator()])
+
+    def page_setup(self, request):
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.ordering = self.get_ordering(request)
+        self.position, self.reverse = self.decode_cursor(request)
+
+    def page_slice(self, queryset):
+        field = self.ordering.lstrip('-')
+        descending = self.ordering.startswith('-')
+        if self.reverse:
+            descending = not descending
+
+        prefix = '-' if descending else ''
+        queryset = queryset.order_by(f'{prefix}{field}', f'{prefix}id')
+
+        if self.position is not None:
+            lookup = 'lt' if descending else 'gt'
+            value, pk = self.position
+            queryset = queryset.filter(Q(**{f'{field}__{lookup}': value})
+                                       | Q(**{field: value, f'id__{lookup}': pk}))
+
+        return queryset[:self.limit + 1]
+
+    def page_results(self, results: list) -> list:
+        field = self.ordering.lstrip('-')
+        has_more = len(results) > self.limit
+        results = results[:self.limit]
+
+        if self.reverse:
+            results.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, self.position is not None
+
+        self.next_position = self.get_position(results[-1], field) if has_next and results else None
+        self.previous_position = self.get_position(results[0], field) if has_previous and results else None
+
+        return results
+
+    def get_paginated_data(self, data):
+        return OrderedDict([('count', self.count),
+                            ('next', self.get_link(self.next_position, reverse=False)),
+                            ('previous', self.get_link(self.previous_position, reverse=True)),
+                            ('results', data)])
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_limit(self, request) -> int:
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return self.default_limit
+
+        return max(1, min(limit, self.max_limit))
+
+    def get_ordering(self, request) -> str:
+        ordering = request.query_params.get(self.ordering_query_param) or self.default_ordering
+        if ordering not in self.ordering_fields:
+            raise ValidationError(f'Cursor pagination does not support ordering by {ordering}')
+
+        return self.ordering_fields[ordering]
+
+    def get_with_count(self, request) -> bool:
+        return request.query_params.get(self.count_query_param, 'true').lower() not in ('false', '0')
+
+    @staticmethod
+    def get_position(instance, field: str) -> tuple:
+        if isinstance(instance, dict):
+            return instance[field], instance['id']
+        return getattr(instance, field), instance.id
+
+    def decode_cursor(self, request) -> tuple:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            if cursor['o'] != self.ordering:
+                raise ValueError
+            value = parse_datetime(cursor['v']) if cursor.get('t') == 'datetime' else cursor['v']
+            if value is None:
+                raise ValueError
+            return (value, int(cursor['i'])), bool(cursor['r'])
+        except (TypeError, KeyError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position: tuple, reverse: bool) -> str:
+        value, pk = position
+        cursor = dict(o=self.ordering, i=pk, r=int(reverse))
+        if hasattr(value, 'isoformat'):
+            cursor.update(v=value.isoformat(), t='datetime')
+        else:
+            cursor.update(v=value)
+
+        return urlsafe_b64encode(json.dumps(cursor, separators=(',', ':')).encode()).decode('ascii')
+
+    def get_link(self, position: tuple, reverse: bool):
+        if position is None:
+            return None
+
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(position, reverse))
+
+
+class AsyncLimitOffsetMixin:
+    """LimitOffsetPagination mixin adding apaginate_queryset, for async views."""
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+
+        self.count = await queryset.acount()
+        self.offset = self.get_offset(request)
+        if self.count == 0 or self.offset > self.count:
+            return []
+
+        return [row async for row in queryset[self.offset:self.offset + self.limit].aiterator()]
@@ -0,0 +1,116 @@
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, transaction as db_transaction
+
+from flowback_addon.ledger.cache import ledger_cache, ledger_cache_shared
+
+
+def ledger_read_database():
+    """
+    The database alias named by settings.LEDGER_READ_DATABASE, a replica of the primary,
+    or None. The pins keeping users on the primary after their writes live in the ledger
+    cache, which every process must share for a write to pin the reads of the others.
+    """
+    replica = getattr(settings, 'LEDGER_READ_DATABASE', None)
+    if replica is not None and not ledger_cache_shared():
+        raise ImproperlyConfigured('LEDGER_READ_DATABASE needs LEDGER_CACHE to name a cache shared by the processes')
+    return replica
+
+
+def _pin_seconds() -> float:
+    return getattr(settings, 'LEDGER_READ_PIN_SECONDS', 5)
+
+
+def _pin_keys(*, user_id: int = None, account_id: int = None) -> list[str]:
+    keys = ['ledger:pin:global']
+    if user_id is not None:
+        keys.append(f'ledger:pin:user:{user_id}')
+    if account_id is not None:
+        keys.append(f'ledger:pin:account:{account_id}')
+    return keys
+
+
+def _pin(keys: list[str]):
+    ledger_cache().set_many(dict.fromkeys(keys, True), _pin_seconds())
+
+
+def ledger_pin(*, user_id: int = None, account_id: int = None):
+    """
+    Sends the selectors reading the user or account to the primary for
+    LEDGER_READ_PIN_SECONDS, so a user reads their own writes while the replica
+    catches up. Pinned again on commit, the window counts from when the replica can
+    start replaying the write.
+    """
+    if ledger_read_database() is None:
+        return
+
+    keys = _pin_keys(user_id=user_id, account_id=account_id)[1:]
+    _pin(keys)
+    db_transaction.on_commit(lambda: _pin(keys))
+
+
+def ledger_pin_all():
+    if ledger_read_database() is None:
+        return
+
+    keys = _pin_keys()
+    _pin(keys)
+    db_transaction.on_commit(lambda: _pin(keys))
+
+
+def ledger_using(*, user_id: int = None, account_id: int = None) -> str:
+    """
+    The database the selectors read the user or account from: the replica unless
+    none is configured or a write pinned them to the primary.
+    """
+    replica = ledger_read_database()
+    if replica is None:
+        return DEFAULT_DB_ALIAS
+
+    if ledger_cache().get_many(_pin_keys(user_id=user_id, account_id=account_id)):
+        return DEFAULT_DB_ALIAS
+    return replica
+
+
+async def aledger_using(*, user_id: int = None, account_id: int = None) -> str:
+    """ledger_using for async selectors, reading the pins through the async cache API."""
+    replica = ledger_read_database()
+    if replica is None:
+        return DEFAULT_DB_ALIAS
+
+    if await ledger_cache().aget_many(_pin_keys(user_id=user_id, account_id=account_id)):
+        return DEFAULT_DB_ALIAS
+    return replica
+
+
+class LedgerRouter:
+    """
+    Keeps the ledger's writes, and reads the selectors do not route, on the primary
+    when DATABASE_ROUTERS routes other reads to a replica. Selectors pass
+    ledger_using() to QuerySet.using() themselves. Needed with LEDGER_READ_DATABASE,
+    as Django saves an instance to the database it was read from otherwise.
+    """
+    app_label = 'ledger'
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != self.app_label:
+            return None
+
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label != self.app_label:
+            return None
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if self.app_label not in (obj1._meta.app_label, obj2._meta.app_label):
+            return None
+
+        databases = {DEFAULT_DB_ALIAS, ledger_read_database()} - {None}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
@@ -1,5 +1,21 @@
+from decimal import Decimal
+from typing import Iterator
+
 import django_filters
-from flowback_addon.ledger.models import Account, Transaction
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.db.models import DecimalField, ExpressionWrapper, F, Q, Sum, Value, Window
+from django.db.models.functions import Coalesce
+from flowback.common.services import get_object
+from flowback_addon.ledger.exports import EXPORT_FIELDS
+from flowback_addon.ledger.metrics import instrumented
+from flowback_addon.ledger.models import (Account,
+                                          AccountBalanceCheckpoint,
+                                          AccountRollup,
+                                          LedgerJob,
+                                          Transaction,
+                                          TransactionHistory)
+from flowback_addon.ledger.routers import aledger_using, ledger_using
 
 
 class BaseAccountFilter(django_filters.FilterSet):
@@ -12,12 +28,52 @@ class BaseAccountFilter(django_filters.FilterSet):
         model = Account
         fields = dict(id=['exact'],)
 
-def account_list(*, user_id: int, filters=None):
+def _account_totals_annotations() -> dict:
+    zero = Value(Decimal(0), output_field=DecimalField(max_digits=20, decimal_places=5))
+    debit_total = Coalesce(Sum('transactions__debit_amount',
+                               filter=Q(transactions__debit_amount__isnull=False)), zero)
+    credit_total = Coalesce(Sum('transactions__credit_amount',
+                                filter=Q(transactions__credit_amount__isnull=False)), zero)
+
+    return dict(debit_total=debit_total,
+                credit_total=credit_total,
+                balance_total=ExpressionWrapper(credit_total - debit_total,
+                                                output_field=DecimalField(max_digits=20, decimal_places=5)))
+
+
+def account_get(*, user_id: int, account_id: int) -> Account:
+    account = get_object(Account, id=account_id)
+
+    if account.user_id != user_id:
+        raise ValidationError("Account doesn't belong to User")
+
+    return account
+
+
+async def aaccount_get(*, user_id: int, account_id: int) -> Account:
+    """account_get for async views, only a failed check runs account_get for its error."""
+    account = await Account.objects.filter(id=account_id).afirst()
+    if account is None or account.user_id != user_id:
+        await sync_to_async(account_get)(user_id=user_id, account_id=account_id)
+
+    return account
+
+
+def account_list(*, user_id: int, filters=None, with_totals: bool = True, using: str = None):
     filters = filters or {}
 
-    qs = Account.objects.filter(user_id=user_id).all()
+    qs = Account.objects.using(using or ledger_using(user_id=user_id)).filter(user_id=user_id)
+    if with_totals:
+        qs = qs.annotate(**_account_totals_annotations())
+
     return BaseAccountFilter(filters, qs).qs
 
+
+async def aaccount_list(*, user_id: int, filters=None, with_totals: bool = True, using: str = None):
+    """account_list for async views, looking up the read database with the async cache API."""
+    return account_list(user_id=user_id, filters=filters, with_totals=with_totals,
+                        using=using or await aledger_using(user_id=user_id))
+
 class BaseTransactionFilter(django_filters.FilterSet):
     order_by = django_filters.OrderingFilter(
         fields=(('created_at', 'created_at_asc'),
@@ -25,13 +81,363 @@ class BaseTransactionFilter(django_filters.FilterSet):
                 ('date', 'date_asc'),
                 ('-date', 'date_desc'))
     )
+    side = django_filters.ChoiceFilter(choices=(('debit', 'debit'), ('credit', 'credit')), method='filter_side')
 
     class Meta:
         model = Transaction
-        fields = dict(id=['exact'],)
+        fields = dict(id=['exact'],
+                      date=['gte', 'lte'],
+                      debit_amount=['gte', 'lte'],
+                      credit_amount=['gte', 'lte'],
+                      verification_number=['exact', 'startswith'],
+                      description=['icontains'])
+
+    def filter_side(self, queryset, name, value):
+        # An opening balance carries both totals and belongs to neither side
+        if queryset.model is Transaction:
+            queryset = queryset.filter(is_opening_balance=False)
+        return queryset.filter(**{f'{value}_amount__gt': 0})
+
+def _transaction_amount() -> ExpressionWrapper:
+    zero = Value(Decimal(0), output_field=DecimalField(max_digits=15, decimal_places=5))
+    return ExpressionWrapper(Coalesce('credit_amount', zero) - Coalesce('debit_amount', zero),
+                             output_field=DecimalField(max_digits=20, decimal_places=5))
+
+
+def _transaction_list_bounds(filters) -> list:
+    return [filters[name] for name in ('date__gte', 'date__lte') if filters.get(name)]
+
+
+def _transaction_list_reaches_archive(*, account_id: int, filters, using: str) -> bool:
+    """
+    Whether a date bound of filters lies before the account's closed periods. Lists
+    without date bounds show the opening balance standing in for the archive instead.
+    """
+    bounds = _transaction_list_bounds(filters)
+    if not bounds:
+        return False
+
+    closed_until = _account_closed_until(account_id=account_id, using=using).first()
+    return closed_until is not None and min(bounds) < closed_until
+
+
+def _account_closed_until(*, account_id: int, using: str):
+    return Account.objects.using(using).filter(id=account_id).values_list('closed_until', flat=True)
 
-def transaction_list(*, account_id: int, filters=None):
+
+def _transaction_list_qs(*, model, account_id: int, filters, running_balance: bool, using: str):
+    qs = model.objects.using(using).filter(account_id=account_id)
+    if running_balance:
+        qs = qs.annotate(running_balance=Window(Sum(_transaction_amount()),
+                                                order_by=[F('date').asc(), F('id').asc()]))
+
+    return BaseTransactionFilter(filters, qs).qs
+
+
+def transaction_list(*, account_id: int, filters=None, running_balance: bool = False, using: str = None):
+    filters = filters or {}
+    using = using or ledger_using(account_id=account_id)
+
+    model = TransactionHistory if _transaction_list_reaches_archive(account_id=account_id, filters=filters,
+                                                                    using=using) else Transaction
+    return _transaction_list_qs(model=model, account_id=account_id, filters=filters,
+                                running_balance=running_balance, using=using)
+
+
+async def atransaction_list(*, account_id: int, filters=None, running_balance: bool = False, using: str = None):
+    """transaction_list for async views, looking up the account's closed periods with the async ORM."""
     filters = filters or {}
+    using = using or await aledger_using(account_id=account_id)
+
+    reaches_archive = False
+    bounds = _transaction_list_bounds(filters)
+    if bounds:
+        closed_until = await _account_closed_until(account_id=account_id, using=using).afirst()
+        reaches_archive = closed_until is not None and min(bounds) < closed_until
+
+    model = TransactionHistory if reaches_archive else Transaction
+    return _transaction_list_qs(model=model, account_id=account_id, filters=filters,
+                                running_balance=running_balance, using=using)
+
+
+def _account_totals(*, account_id: int, date, transaction_filter: Q, using: str) -> dict:
+    """
+    Debit and credit totals of the account's transactions matching transaction_filter,
+    which must select every transaction dated before `date`. Starts from the latest
+    checkpoint ending at or before `date` and only sums the transactions after it, from
+    the history view when they reach into the closed periods.
+    """
+    checkpoint = _account_totals_checkpoints(account_id=account_id, date=date, using=using).first()
+    closed_until = _account_closed_until(account_id=account_id, using=using).first()
+    totals = _account_totals_qs(account_id=account_id, transaction_filter=transaction_filter,
+                                date=date, checkpoint=checkpoint, closed_until=closed_until,
+                                using=using).aggregate(**_account_totals_aggregates())
+    return _account_totals_add(totals, checkpoint)
+
+
+async def _aaccount_totals(*, account_id: int, date, transaction_filter: Q, using: str) -> dict:
+    """_account_totals for async views."""
+    checkpoint = await _account_totals_checkpoints(account_id=account_id, date=date, using=using).afirst()
+    closed_until = await _account_closed_until(account_id=account_id, using=using).afirst()
+    totals = await _account_totals_qs(account_id=account_id, transaction_filter=transaction_filter,
+                                      date=date, checkpoint=checkpoint, closed_until=closed_until,
+                                      using=using).aaggregate(**_account_totals_aggregates())
+    return _account_totals_add(totals, checkpoint)
+
+
+def _account_totals_checkpoints(*, account_id: int, date, using: str):
+    return (AccountBalanceCheckpoint.objects.using(using)
+            .filter(account_id=account_id, period_end__lte=date)
+            .order_by('-period_end'))
+
+
+def _account_totals_qs(*, account_id: int, transaction_filter: Q, date, checkpoint, closed_until, using: str):
+    # Summed from the start, the opening balance stands in for the archived transactions
+    # like in transaction_list, as long as the summed dates do not reach into the closed periods
+    start = checkpoint.period_end if checkpoint else None
+    if closed_until is None or (start or date) >= closed_until:
+        model = Transaction
+    else:
+        model = TransactionHistory
+
+    qs = model.objects.using(using).filter(transaction_filter, account_id=account_id)
+    if checkpoint:
+        qs = qs.filter(date__gte=checkpoint.period_end)
+    return qs
+
+
+def _account_totals_aggregates() -> dict:
+    return dict(debit_total=Coalesce(Sum('debit_amount'), Decimal(0)),
+                credit_total=Coalesce(Sum('credit_amount'), Decimal(0)))
+
+
+def _account_totals_add(totals: dict, checkpoint) -> dict:
+    if checkpoint:
+        totals['debit_total'] += checkpoint.debit_total
+        totals['credit_total'] += checkpoint.credit_total
+
+    totals['balance'] = totals['credit_total'] - totals['debit_total']
+    return totals
+
+
+@instrumented
+def transaction_balance_through(*, account_id: int, date, transaction_id: int, using: str = None) -> Decimal:
+    """Balance of the account after the given transaction, in (date, id) order."""
+    return _account_totals(account_id=account_id, date=date,
+                           transaction_filter=_transaction_through_filter(date, transaction_id),
+                           using=using or ledger_using(account_id=account_id))['balance']
+
+
+def _transaction_through_filter(date, transaction_id: int) -> Q:
+    return Q(date__lt=date) | Q(date=date, id__lte=transaction_id)
+
+
+@instrumented
+def account_balance_at(*, account_id: int, date=None, using: str = None) -> dict:
+    """Debit total, credit total and balance of the account including every transaction up to `date`."""
+    using = using or ledger_using(account_id=account_id)
+    if date is None:
+        account = (Account.objects.using(using)
+                   .only('cached_debit_total', 'cached_credit_total', 'cached_balance')
+                   .get(id=account_id))
+        return dict(debit_total=account.cached_debit_total,
+                    credit_total=account.cached_credit_total,
+                    balance=account.cached_balance)
+
+    return _account_totals(account_id=account_id, date=date, transaction_filter=Q(date__lte=date), using=using)
+
+
+async def aaccount_balance_at(*, account_id: int, date=None, using: str = None) -> dict:
+    """account_balance_at for async views."""
+    using = using or await aledger_using(account_id=account_id)
+    if date is None:
+        account = await (Account.objects.using(using)
+                         .only('cached_debit_total', 'cached_credit_total', 'cached_balance')
+                         .aget(id=account_id))
+        return dict(debit_total=account.cached_debit_total,
+                    credit_total=account.cached_credit_total,
+                    balance=account.cached_balance)
+
+    return await _aaccount_totals(account_id=account_id, date=date, transaction_filter=Q(date__lte=date),
+                                  using=using)
+
+
+@instrumented
+def account_series(*, account_id: int, granularity: str, date__gte=None, date__lte=None,
+                   using: str = None) -> list[dict]:
+    """
+    Debit, credit and transaction totals per period from the account rollups, with the
+    closing balance of every period.
+    """
+    using = using or ledger_using(account_id=account_id)
+    rollups = (AccountRollup.objects.using(using)
+               .filter(account_id=account_id, granularity=granularity)
+               .exclude(transaction_count=0))
+    opening_balance = Decimal(0)
+
+    if date__gte:
+        date__gte = AccountRollup.truncate(date__gte, granularity)
+        rollups = rollups.filter(period_start__gte=date__gte)
+        opening_balance = _account_totals(account_id=account_id, date=date__gte,
+                                          transaction_filter=Q(date__lt=date__gte), using=using)['balance']
+    if date__lte:
+        rollups = rollups.filter(period_start__lte=date__lte)
+
+    series = []
+    balance = opening_balance
+    for period in rollups.order_by('period_start').values('period_start', 'debit_total',
+                                                           'credit_total', 'transaction_count'):
+        balance += period['credit_total'] - period['debit_total']
+        series.append(dict(period, balance=balance))
+
+    return series
+
+
+@instrumented
+def trial_balance(*, user_id: int, as_of=None, date_range: tuple = None, using: str = None) -> dict:
+    """
+    Debit total, credit total and balance of every account of the user, with their grand
+    totals. Without dates the cached account totals are read, otherwise the transactions
+    dated up to `as_of` and within the (start, end) `date_range` are summed in one
+    GROUP BY over the accounts joined to their history, archived transactions included.
+    """
+    accounts = (Account.objects.using(using or ledger_using(user_id=user_id))
+                .filter(user_id=user_id)
+                .order_by('account_number', 'id'))
+
+    if as_of is None and date_range is None:
+        rows = accounts.values('id', 'account_number', 'account_name',
+                               debit_total=F('cached_debit_total'),
+                               credit_total=F('cached_credit_total'),
+                               balance=F('cached_balance'))
+    else:
+        transaction_filter = Q()
+        if as_of is not None:
+            transaction_filter &= Q(history__date__lte=as_of)
+        if date_range is not None:
+            start, end = date_range
+            if start is not None:
+                transaction_filter &= Q(history__date__gte=start)
+            if end is not None:
+                transaction_filter &= Q(history__date__lte=end)
+
+        zero = Value(Decimal(0), output_field=DecimalField(max_digits=20, decimal_places=5))
+        debit_total = Coalesce(Sum('history__debit_amount', filter=transaction_filter), zero)
+        credit_total = Coalesce(Sum('history__credit_amount', filter=transaction_filter), zero)
+        rows = (accounts
+                .values('id', 'account_number', 'account_name')
+                .annotate(debit_total=debit_total,
+                          credit_total=credit_total,
+                          balance=ExpressionWrapper(credit_total - debit_total,
+                                                    output_field=DecimalField(max_digits=20, decimal_places=5))))
+
+    rows = list(rows)
+    debit_total = sum((row['debit_total'] for row in rows), Decimal(0))
+    credit_total = sum((row['credit_total'] for row in rows), Decimal(0))
+    return dict(accounts=rows,
+                debit_total=debit_total,
+                credit_total=credit_total,
+                balance=credit_total - debit_total)
+
+
+@instrumented
+def transaction_running_balance_seed(*, account_id: int, transactions: list[Transaction],
+                                     using: str = None) -> list[Transaction]:
+    """
+    The running_balance window of transaction_list only sums the rows the final query
+    selects, so a page reached through a filter or cursor starts counting from zero.
+    Shifts the page by the real balance of its first row, which costs one aggregate.
+    The rows the query skipped must lie before the page in (date, id) order, true for
+    date filters and date cursors but not for a cursor over created_at or the filters on
+    the amounts, side, verification number or description.
+    """
+    if not transactions:
+        return transactions
+
+    anchor = transactions[0]
+    seed = transaction_balance_through(account_id=account_id,
+                                       date=anchor.date,
+                                       transaction_id=anchor.id,
+                                       using=using) - anchor.running_balance
+    for transaction in transactions:
+        transaction.running_balance += seed
+
+    return transactions
+
+
+async def atransaction_running_balance_seed(*, account_id: int, transactions: list[Transaction],
+                                            using: str = None) -> list[Transaction]:
+    """transaction_running_balance_seed for async views."""
+    if not transactions:
+        return transactions
+
+    anchor = transactions[0]
+    totals = await _aaccount_totals(account_id=account_id, date=anchor.date,
+                                    transaction_filter=_transaction_through_filter(anchor.date, anchor.id),
+                                    using=using or await aledger_using(account_id=account_id))
+    seed = totals['balance'] - anchor.running_balance
+    for transaction in transactions:
+        transaction.running_balance += seed
+
+    return transactions
+
+
+def _transaction_export_running_balance(rows, opening_balance: Decimal) -> Iterator[tuple]:
+    debit_index, credit_index = EXPORT_FIELDS.index('debit_amount'), EXPORT_FIELDS.index('credit_amount')
+
+    balance = opening_balance
+    for row in rows:
+        balance += (row[credit_index] or 0) - (row[debit_index] or 0)
+        yield *row, balance
+
+
+@instrumented
+def transaction_export(*, user_id: int, account_id: int, filters=None, running_balance: bool = False,
+                       chunk_size: int = 2000, using: str = None) -> tuple[list[str], Iterator[tuple]]:
+    """
+    Returns the export header and a lazy iterator over the account's transactions in
+    (date, id) order, optionally with the balance after each transaction appended.
+    """
+    filters = filters or {}
+    account_get(user_id=user_id, account_id=account_id)
+    using = using or ledger_using(user_id=user_id, account_id=account_id)
+
+    rows = (transaction_list(account_id=account_id, filters=filters, using=using)
+            .order_by('date', 'id')
+            .values_list(*EXPORT_FIELDS)
+            .iterator(chunk_size=chunk_size))
+
+    if not running_balance:
+        return EXPORT_FIELDS, rows
+
+    opening_balance = Decimal(0)
+    if filters.get('date__gte'):
+        opening_balance = _account_totals(account_id=account_id,
+                                          date=filters['date__gte'],
+                                          transaction_filter=Q(date__lt=filters['date__gte']),
+                                          using=using)['balance']
+
+    return EXPORT_FIELDS + ['running_balance'], _transaction_export_running_balance(rows, opening_balance)
+
+def account_balance_discrepancies(*, account_ids: list[int] = None):
+    qs = Account.objects.all()
+    if account_ids is not None:
+        qs = qs.filter(id__in=account_ids)
+
+    qs = qs.annotate(**_account_totals_annotations())
+
+    return (qs.exclude(cached_debit_total=F('debit_total'),
+                       cached_credit_total=F('credit_total'),
+                       cached_balance=F('balance_total'))
+            .values('id', 'cached_debit_total', 'cached_credit_total', 'cached_balance',
+                    'debit_total', 'credit_total', 'balance_total')
+            .order_by('id'))
+
+
+def ledger_job_get(*, user_id: int, job_id: int) -> LedgerJob:
+    job = get_object(LedgerJob, id=job_id)
+
+    if job.user_id != user_id:
+        raise ValidationError("Job doesn't belong to User")
 
-    qs = Transaction.objects.filter(account_id=account_id).all()
-    return BaseTransactionFilter(filters, qs).qs
\ No newline at end of file
+    return job
@@ -0,0 +1,65 @@
+from collections import OrderedDict
+from typing import Optional
+
+from django.conf import settings
+from rest_framework import serializers
+
+
+def fast_serialization_enabled() -> bool:
+    return getattr(settings, 'LEDGER_FAST_SERIALIZATION', False)
+
+
+def values_fields(serializer_class) -> list[str]:
+    """The attributes the output fields of serializer_class read, to pass to QuerySet.values()."""
+    return [field.source for field in serializer_class().fields.values()]
+
+
+def values_serialize(serializer_class, rows: list[dict]) -> list[OrderedDict]:
+    """
+    Serializes rows from QuerySet.values() with the to_representation of each field of
+    serializer_class, skipping model instantiation and the per object field lookups
+    of Serializer.to_representation. The output matches serializer_class(many=True).data
+    for fields that read a model attribute, by name or by a plain `source`.
+    """
+    fields = [(name, field.source, field.to_representation, field.required)
+              for name, field in serializer_class().fields.items()
+              if not field.write_only]
+
+    data = []
+    for row in rows:
+        item = OrderedDict()
+        for name, source, to_representation, required in fields:
+            if source not in row:
+                if required:
+                    raise KeyError(source)
+                continue
+
+            value = row[source]
+            item[name] = None if value is None else to_representation(value)
+        data.append(item)
+
+    return data
+
+
+class SparseFieldsMixin:
+    """Serializer mixin taking a `fields` argument with the subset of fields to output."""
+
+    def __init__(self, *args, fields: list[str] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for name in set(self.fields.keys()) - set(fields):
+                self.fields.pop(name)
+
+
+def sparse_fields(serializer_class, fields: str = None) -> Optional[list[str]]:
+    """Parses a comma separated `fields` query value against the fields of serializer_class."""
+    if not fields:
+        return None
+
+    names = [name.strip() for name in fields.split(',') if name.strip()]
+    invalid_fields = [name for name in names if name not in serializer_class().fields]
+    if invalid_fields:
+        raise serializers.ValidationError(f"Invalid output fields: {','.join(invalid_fields)}")
+
+    return names
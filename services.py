@@ -1,23 +1,45 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import islice
+from typing import Callable, Iterable, Optional
 
 from flowback.common.services import model_update, get_object
-from flowback_addon.ledger.models import Account, Transaction
+from flowback_addon.ledger.cache import ledger_cache_invalidate, ledger_cache_invalidate_all
+from flowback_addon.ledger.imports import IMPORT_FIELDS
+from flowback_addon.ledger.metrics import instrumented
+from flowback_addon.ledger.models import (Account,
+                                          AccountBalanceCheckpoint,
+                                          AccountRollup,
+                                          ArchivedTransaction,
+                                          LedgerJob,
+                                          Transaction,
+                                          TransactionHistory)
+from flowback_addon.ledger.routers import ledger_pin, ledger_pin_all
 from flowback.user.models import User
+from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce, TruncDay, TruncMonth
+from django.utils import timezone
 
 
+@instrumented
 def account_create(*, account_number: str, account_name: str, user_id: int) -> Account:
     user = get_object(User, id=user_id)
     account = Account(account_number=account_number,
                       account_name=account_name,
                       user=user)
 
-    account.full_clean()
+    account.full_clean(exclude=['user'])
     account.save()
+    ledger_cache_invalidate(user_id=user.id)
+    ledger_pin(user_id=user.id)
 
     return account
 
 
+@instrumented
 def account_update(user_id: int, account_id: int, data) -> Account:
     account = get_object(Account, id=account_id)
 
@@ -29,9 +51,12 @@ def account_update(user_id: int, account_id: int, data) -> Account:
     account, has_updated = model_update(instance=account,
                                         fields=non_side_effect_fields,
                                         data=data)
+    ledger_cache_invalidate(user_id=user_id, account_id=account_id)
+    ledger_pin(user_id=user_id, account_id=account_id)
     return account
 
 
+@instrumented
 def account_delete(user_id: int, account_id: int):
     account = get_object(Account, id=account_id)
 
@@ -39,8 +64,348 @@ def account_delete(user_id: int, account_id: int):
         raise ValidationError("Account doesn't belong to User")
 
     account.delete()
+    ledger_cache_invalidate(user_id=user_id, account_id=account_id)
+    ledger_pin(user_id=user_id, account_id=account_id)
 
 
+def transaction_amount_error(*, debit_amount, credit_amount) -> Optional[str]:
+    if not debit_amount and not credit_amount:
+        return "You must provide a debit or credit amount."
+    if debit_amount and credit_amount:
+        return "Each transaction must have either a debit or a credit amount, but not both"
+    if (debit_amount or 0) <= 0 and (credit_amount or 0) <= 0:
+        return "The debit or credit amount must be greater than zero."
+    return None
+
+
+def _account_balance_apply(*, account_id: int, debit_amount, credit_amount):
+    debit_amount = debit_amount or Decimal(0)
+    credit_amount = credit_amount or Decimal(0)
+    if not debit_amount and not credit_amount:
+        return
+
+    Account.objects.filter(id=account_id).update(
+        cached_debit_total=F('cached_debit_total') + debit_amount,
+        cached_credit_total=F('cached_credit_total') + credit_amount,
+        cached_balance=F('cached_balance') + credit_amount - debit_amount)
+
+
+@instrumented
+@db_transaction.atomic
+def account_balance_rebuild(*, account_ids: list[int] = None, batch_size: int = 1000, user_id: int = None) -> int:
+    """
+    Recomputes the cached totals of the accounts from their transactions. With user_id
+    only the user's accounts are rebuilt, and only their cached reads are invalidated.
+    """
+    accounts = Account.objects.all()
+    if account_ids is not None:
+        accounts = accounts.filter(id__in=account_ids)
+    if user_id is not None:
+        accounts = accounts.filter(user_id=user_id)
+
+    locked_ids = list(accounts.select_for_update().order_by('id').values_list('id', flat=True))
+    totals = {row['account_id']: row for row in (Transaction.objects
+                                                 .filter(account__in=accounts)
+                                                 .values('account_id')
+                                                 .annotate(debit_total=Sum('debit_amount'),
+                                                           credit_total=Sum('credit_amount'))
+                                                 .order_by())}
+
+    updated = []
+    for account_id in locked_ids:
+        row = totals.get(account_id, {})
+        debit_total = row.get('debit_total') or Decimal(0)
+        credit_total = row.get('credit_total') or Decimal(0)
+        updated.append(Account(id=account_id,
+                               cached_debit_total=debit_total,
+                               cached_credit_total=credit_total,
+                               cached_balance=credit_total - debit_total))
+
+    Account.objects.bulk_update(updated,
+                                fields=['cached_debit_total', 'cached_credit_total', 'cached_balance'],
+                                batch_size=batch_size)
+    if user_id is None:
+        ledger_cache_invalidate_all()
+        ledger_pin_all()
+    else:
+        for account_id in locked_ids:
+            ledger_cache_invalidate(user_id=user_id, account_id=account_id)
+            ledger_pin(user_id=user_id, account_id=account_id)
+    return len(updated)
+
+
+def account_balances_rebuild(*, account_ids: list[int] = None, user_id: int = None, chunk_size: int = 100,
+                             batch_size: int = 1000, progress: Callable = None) -> int:
+    """
+    account_balance_rebuild for a whole ledger: rebuilds chunk_size accounts at a time,
+    each chunk in its own transaction, so posting to the other accounts waits for one
+    chunk at most. Reports progress(done, total) after every chunk.
+    """
+    accounts = Account.objects.all()
+    if account_ids is not None:
+        accounts = accounts.filter(id__in=account_ids)
+    if user_id is not None:
+        accounts = accounts.filter(user_id=user_id)
+    account_ids = list(accounts.order_by('id').values_list('id', flat=True))
+
+    if progress:
+        progress(0, len(account_ids))
+    rebuilt = 0
+    for start in range(0, len(account_ids), chunk_size):
+        rebuilt += account_balance_rebuild(account_ids=account_ids[start:start + chunk_size],
+                                           batch_size=batch_size, user_id=user_id)
+        if progress:
+            progress(min(start + chunk_size, len(account_ids)), len(account_ids))
+    return rebuilt
+
+
+def _account_checkpoints_invalidate(*, account_id: int, since):
+    AccountBalanceCheckpoint.objects.filter(account_id=account_id, period_end__gt=since).delete()
+
+
+def _account_rollups_apply(*, account_id: int, entries: list[tuple]):
+    for granularity in AccountRollup.Granularity.values:
+        deltas = {}
+        for date, debit_amount, credit_amount, count in entries:
+            delta = deltas.setdefault(AccountRollup.truncate(date, granularity), [Decimal(0), Decimal(0), 0])
+            delta[0] += debit_amount
+            delta[1] += credit_amount
+            delta[2] += count
+
+        for period_start, (debit_amount, credit_amount, count) in deltas.items():
+            rollup = AccountRollup.objects.filter(account_id=account_id,
+                                                  granularity=granularity,
+                                                  period_start=period_start)
+            changes = dict(debit_total=F('debit_total') + debit_amount,
+                           credit_total=F('credit_total') + credit_amount,
+                           transaction_count=F('transaction_count') + count)
+
+            if rollup.update(**changes):
+                continue
+
+            try:
+                with db_transaction.atomic():
+                    AccountRollup.objects.create(account_id=account_id,
+                                                 granularity=granularity,
+                                                 period_start=period_start,
+                                                 debit_total=debit_amount,
+                                                 credit_total=credit_amount,
+                                                 transaction_count=count)
+            except IntegrityError:
+                rollup.update(**changes)
+
+
+def _account_ledger_apply(*, user_id: int, account_id: int, entries: list[tuple]):
+    """
+    Keeps the data derived from an account's transactions current. Every entry is a
+    (date, debit_amount, credit_amount, count) tuple added to the ledger, negated for
+    removed transactions.
+    """
+    entries = [(date, debit_amount or Decimal(0), credit_amount or Decimal(0), count)
+               for date, debit_amount, credit_amount, count in entries]
+    if not entries:
+        return
+
+    ledger_cache_invalidate(user_id=user_id, account_id=account_id)
+    ledger_pin(user_id=user_id, account_id=account_id)
+    _account_balance_apply(account_id=account_id,
+                           debit_amount=sum(entry[1] for entry in entries),
+                           credit_amount=sum(entry[2] for entry in entries))
+    _account_checkpoints_invalidate(account_id=account_id, since=min(entry[0] for entry in entries))
+    _account_rollups_apply(account_id=account_id, entries=entries)
+
+
+@instrumented
+def account_rollups_rebuild(*, account_ids: list[int] = None, batch_size: int = 1000) -> int:
+    rollups = AccountRollup.objects.all()
+    transactions = TransactionHistory.objects.all()
+    if account_ids is not None:
+        rollups = rollups.filter(account_id__in=account_ids)
+        transactions = transactions.filter(account_id__in=account_ids)
+
+    created = 0
+    with db_transaction.atomic():
+        rollups.delete()
+
+        for granularity, trunc in ((AccountRollup.Granularity.DAY, TruncDay),
+                                   (AccountRollup.Granularity.MONTH, TruncMonth)):
+            periods = (transactions
+                       .annotate(period_start=trunc('date'))
+                       .values('account_id', 'period_start')
+                       .annotate(debit_total=Sum('debit_amount'),
+                                 credit_total=Sum('credit_amount'),
+                                 transaction_count=Count('id'))
+                       .order_by())
+
+            batch = []
+            for period in periods.iterator():
+                batch.append(AccountRollup(account_id=period['account_id'],
+                                           granularity=granularity,
+                                           period_start=period['period_start'],
+                                           debit_total=period['debit_total'] or 0,
+                                           credit_total=period['credit_total'] or 0,
+                                           transaction_count=period['transaction_count']))
+                if len(batch) >= batch_size:
+                    created += len(AccountRollup.objects.bulk_create(batch))
+                    batch = []
+
+            created += len(AccountRollup.objects.bulk_create(batch))
+
+    ledger_cache_invalidate_all()
+    ledger_pin_all()
+    return created
+
+
+def _next_month(date: datetime) -> datetime:
+    if date.month == 12:
+        return date.replace(year=date.year + 1, month=1)
+    return date.replace(month=date.month + 1)
+
+
+@instrumented
+def account_checkpoints_build(*, account_ids: list[int] = None, until: datetime = None,
+                              rebuild: bool = False) -> int:
+    """
+    Adds monthly checkpoints for every closed month of the given accounts, continuing from
+    each account's latest checkpoint, or from scratch with rebuild. Months without
+    transactions get no checkpoint.
+    """
+    until = until or timezone.localtime().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    accounts = Account.objects.all()
+    if account_ids is not None:
+        accounts = accounts.filter(id__in=account_ids)
+
+    created = 0
+    for account_id in accounts.values_list('id', flat=True).iterator():
+        with db_transaction.atomic():
+            # A transaction posted back into the months being summed would be missed
+            _account_row_lock(account_id=account_id)
+            if rebuild:
+                # Under the lock, so balance reads only ever see the old or the new checkpoints
+                AccountBalanceCheckpoint.objects.filter(account_id=account_id).delete()
+
+            last = (AccountBalanceCheckpoint.objects
+                    .filter(account_id=account_id)
+                    .order_by('-period_end')
+                    .first())
+
+            transactions = TransactionHistory.objects.filter(account_id=account_id, date__lt=until)
+            if last:
+                transactions = transactions.filter(date__gte=last.period_end)
+
+            months = (transactions
+                      .annotate(month=TruncMonth('date'))
+                      .values('month')
+                      .annotate(debit_total=Sum('debit_amount'), credit_total=Sum('credit_amount'))
+                      .order_by('month'))
+
+            debit_total = last.debit_total if last else Decimal(0)
+            credit_total = last.credit_total if last else Decimal(0)
+            checkpoints = []
+            for month in months:
+                debit_total += month['debit_total'] or 0
+                credit_total += month['credit_total'] or 0
+                checkpoints.append(AccountBalanceCheckpoint(account_id=account_id,
+                                                            period_end=_next_month(month['month']),
+                                                            debit_total=debit_total,
+                                                            credit_total=credit_total))
+
+            AccountBalanceCheckpoint.objects.bulk_create(checkpoints)
+            created += len(checkpoints)
+
+    return created
+
+
+def _account_owner_check(*, user_id: int, account_id: int) -> Optional[datetime]:
+    """
+    Checks the account belongs to the user in one query, only a failed check costs more.
+    Returns the end of the account's closed periods.
+    """
+    closed_until = list(Account.objects.filter(id=account_id, user_id=user_id).values_list('closed_until', flat=True))
+    if closed_until:
+        return closed_until[0]
+
+    get_object(Account, id=account_id)
+    raise ValidationError("Account doesn't belong to User")
+
+
+def _accounts_lock(*, user_id: int, account_ids: Iterable[int]) -> dict[int, Optional[datetime]]:
+    """
+    Locks the user's accounts in id order, so writers spanning several accounts
+    always acquire the locks in the same order and cannot deadlock each other.
+    Returns the end of the closed periods of every account.
+    """
+    account_ids = sorted(set(account_ids))
+    owners = {account_id: (owner_id, closed_until)
+              for account_id, owner_id, closed_until in (Account.objects
+                                                         .select_for_update()
+                                                         .filter(id__in=account_ids)
+                                                         .order_by('id')
+                                                         .values_list('id', 'user_id', 'closed_until'))}
+
+    for account_id in account_ids:
+        if account_id not in owners:
+            get_object(Account, id=account_id)
+        if owners[account_id][0] != user_id:
+            raise ValidationError("Account doesn't belong to User")
+
+    return {account_id: owners[account_id][1] for account_id in account_ids}
+
+
+def _account_lock(*, user_id: int, account_id: int) -> Optional[datetime]:
+    """
+    Locks the user's account until the end of the database transaction. Every service
+    that reads a transaction before changing the ledger derived from it takes this lock
+    first, so concurrent writers of one account apply their changes one at a time and
+    always lock the account row before its rollups and checkpoints.
+    """
+    return _accounts_lock(user_id=user_id, account_ids=[account_id])[account_id]
+
+
+def _account_row_lock(*, account_id: int) -> Optional[datetime]:
+    """
+    _account_lock without the owner check, for services that check ownership after
+    other errors. Returns the end of the account's closed periods, also None when
+    there is no such account.
+    """
+    closed_until = list(Account.objects.select_for_update().filter(id=account_id)
+                        .values_list('closed_until', flat=True))
+    return closed_until[0] if closed_until else None
+
+
+def _closed_period_check(closed_until: Optional[datetime], *dates):
+    if closed_until is None:
+        return
+
+    for date in dates:
+        if settings.USE_TZ and timezone.is_naive(date):
+            date = timezone.make_aware(date)
+        if date < closed_until:
+            raise ValidationError("The period is closed")
+
+
+def _transaction_get(*, user_id: int, account_id: int, transaction_id: int) -> Transaction:
+    """
+    Fetches a transaction of the user's account in one query. When there is no such
+    transaction the lookups are repeated one by one to raise the matching error.
+    """
+    try:
+        return Transaction.objects.get(id=transaction_id, account_id=account_id, account__user_id=user_id)
+    except Transaction.DoesNotExist:
+        pass
+
+    account = get_object(Account, id=account_id)
+    transaction = get_object(Transaction, id=transaction_id)
+
+    if account.id != transaction.account_id:
+        raise ValidationError("Transaction doesn't belong to Account")
+
+    raise ValidationError("Account doesn't belong to User")
+
+
+@instrumented
+@db_transaction.atomic
 def transaction_create(*,
                        user_id: int,
                        debit_amount: float = 0,
@@ -49,13 +414,8 @@ def transaction_create(*,
                        verification_number: str,
                        account_id: int,
                        date: str = datetime.now()) -> Transaction:
-    account = get_object(Account, id=account_id)
-
-    if account.user_id != user_id:
-        raise ValidationError("Account doesn't belong to User")
-
     transaction = Transaction(
-        account=account,
+        account_id=account_id,
         debit_amount=debit_amount,
         credit_amount=credit_amount,
         description=description,
@@ -63,41 +423,373 @@ def transaction_create(*,
         date=date
     )
 
-    transaction.full_clean()
+    # The account lock checks the account exists
+    closed_until = _account_lock(user_id=user_id, account_id=account_id)
+    transaction.full_clean(exclude=['account'])
+    _closed_period_check(closed_until, transaction.date)
     transaction.save()
+    _account_ledger_apply(user_id=user_id, account_id=account_id,
+                          entries=[(transaction.date, transaction.debit_amount, transaction.credit_amount, 1)])
 
     return transaction
 
 
+@instrumented
+@db_transaction.atomic
 def transaction_update(user_id: int, account_id: int, transaction_id: int, data) -> Account:
-    account = get_object(Account, id=account_id)
-    transaction = get_object(Transaction, id=transaction_id)
-
-    if account.id != transaction.account_id:
-        raise ValidationError("Transaction doesn't belong to Account")
-
-    if account.user_id != user_id:
-        raise ValidationError("Account doesn't belong to User")
+    closed_until = _account_row_lock(account_id=account_id)
+    transaction = _transaction_get(user_id=user_id, account_id=account_id, transaction_id=transaction_id)
+    _closed_period_check(closed_until, transaction.date, data.get('date', transaction.date))
 
     if 'debit_amount' in data:
         data['credit_amount'] = 0
     else:
         data['debit_amount'] = 0
 
+    old_entry = (transaction.date, -(transaction.debit_amount or Decimal(0)),
+                 -(transaction.credit_amount or Decimal(0)), -1)
+
     data['updated_at'] = datetime.now()
     non_side_effect_fields = [
         'debit_amount', 'credit_amount', 'description', 'verification_number', 'date', 'updated_at']
     transaction, has_updated = model_update(instance=transaction,
                                             fields=non_side_effect_fields,
                                             data=data)
+
+    _account_ledger_apply(user_id=user_id, account_id=transaction.account_id,
+                          entries=[old_entry,
+                                   (transaction.date, transaction.debit_amount, transaction.credit_amount, 1)])
     return transaction
 
 
+@instrumented
+@db_transaction.atomic
 def transaction_delete(user_id: int, account_id: int, transaction_id: int):
-    account = get_object(Account, id=account_id)
-    transaction = get_object(Transaction, id=transaction_id)
-
-    if account.user_id != user_id:
-        raise ValidationError("Account doesn't belong to User")
+    closed_until = _account_row_lock(account_id=account_id)
+    transaction = _transaction_get(user_id=user_id, account_id=account_id, transaction_id=transaction_id)
+    _closed_period_check(closed_until, transaction.date)
 
     transaction.delete()
+    _account_ledger_apply(user_id=user_id, account_id=transaction.account_id,
+                          entries=[(transaction.date, -(transaction.debit_amount or Decimal(0)),
+                                    -(transaction.credit_amount or Decimal(0)), -1)])
+
+
+@instrumented
+@db_transaction.atomic
+def journal_entry_create(*,
+                         user_id: int,
+                         verification_number: str,
+                         description: str,
+                         legs: list[dict],
+                         date: datetime = None) -> list[Transaction]:
+    """
+    Posts a balanced entry as one transaction per leg, all sharing the verification
+    number. Every leg is a dict with account_id, debit_amount or credit_amount and
+    optionally its own description.
+    """
+    if len(legs) < 2:
+        raise ValidationError("A journal entry needs at least two legs")
+
+    date = date or timezone.now()
+    debit_total, credit_total = Decimal(0), Decimal(0)
+    transactions = []
+    for number, leg in enumerate(legs, start=1):
+        error = transaction_amount_error(debit_amount=leg.get('debit_amount'),
+                                         credit_amount=leg.get('credit_amount'))
+        if error:
+            raise ValidationError(f"Leg {number}: {error}")
+
+        transaction = Transaction(account_id=leg['account_id'],
+                                  debit_amount=leg.get('debit_amount'),
+                                  credit_amount=leg.get('credit_amount'),
+                                  description=leg.get('description') or description,
+                                  verification_number=verification_number,
+                                  date=date)
+        transaction.full_clean(exclude=['account'])
+        debit_total += transaction.debit_amount or 0
+        credit_total += transaction.credit_amount or 0
+        transactions.append(transaction)
+
+    if debit_total != credit_total:
+        raise ValidationError("The debits and credits of a journal entry must balance")
+
+    closed = _accounts_lock(user_id=user_id, account_ids=[transaction.account_id for transaction in transactions])
+    for closed_until in closed.values():
+        _closed_period_check(closed_until, date)
+    transactions = Transaction.objects.bulk_create(transactions)
+
+    for account_id in sorted({transaction.account_id for transaction in transactions}):
+        _account_ledger_apply(user_id=user_id, account_id=account_id,
+                              entries=[(transaction.date, transaction.debit_amount, transaction.credit_amount, 1)
+                                       for transaction in transactions if transaction.account_id == account_id])
+
+    return transactions
+
+
+def _transaction_bulk_select(*, user_id: int, account_id: int, transaction_ids: list[int] = None, filters=None):
+    """The transactions of the user's account with the given ids and matching filters."""
+    filters = filters or {}
+    if transaction_ids is None and not filters:
+        raise ValidationError("Select the transactions by id or with a filter")
+
+    transactions = Transaction.objects.filter(account_id=account_id, account__user_id=user_id,
+                                              is_opening_balance=False, **filters)
+    if transaction_ids is not None:
+        transactions = transactions.filter(id__in=transaction_ids)
+
+    return transactions
+
+
+def _transaction_day_entries(transactions, sign: int = 1) -> list[tuple]:
+    days = (transactions
+            .annotate(day=TruncDay('date'))
+            .values('day')
+            .annotate(debit_total=Sum('debit_amount'), credit_total=Sum('credit_amount'), count=Count('id'))
+            .order_by())
+
+    return [(day['day'], sign * (day['debit_total'] or Decimal(0)),
+             sign * (day['credit_total'] or Decimal(0)), sign * day['count']) for day in days]
+
+
+@instrumented
+@db_transaction.atomic
+def transaction_bulk_update(*, user_id: int, account_id: int, data, transaction_ids: list[int] = None,
+                            filters=None) -> int:
+    """
+    Sets the description, verification number or date of the selected transactions
+    with one UPDATE and returns the number of updated transactions.
+    """
+    transactions = _transaction_bulk_select(user_id=user_id, account_id=account_id,
+                                            transaction_ids=transaction_ids, filters=filters)
+    data = {field: data[field] for field in ('description', 'verification_number', 'date') if field in data}
+    if not data:
+        raise ValidationError("Nothing to update")
+
+    closed_until = _account_lock(user_id=user_id, account_id=account_id)
+    if 'date' in data:
+        _closed_period_check(closed_until, data['date'])
+
+    # Moving transactions to another date moves their amounts between rollups and checkpoints
+    entries = _transaction_day_entries(transactions, sign=-1) if 'date' in data else []
+
+    updated = transactions.update(updated_at=timezone.now(), **data)
+    if not updated:
+        return 0
+
+    if entries:
+        entries.append((data['date'], -sum(entry[1] for entry in entries),
+                        -sum(entry[2] for entry in entries), -sum(entry[3] for entry in entries)))
+        _account_ledger_apply(user_id=user_id, account_id=account_id, entries=entries)
+    else:
+        ledger_cache_invalidate(user_id=user_id, account_id=account_id)
+        ledger_pin(user_id=user_id, account_id=account_id)
+
+    return updated
+
+
+@instrumented
+@db_transaction.atomic
+def transaction_bulk_delete(*, user_id: int, account_id: int, transaction_ids: list[int] = None,
+                            filters=None) -> int:
+    """Deletes the selected transactions with one DELETE and returns the number of deleted transactions."""
+    transactions = _transaction_bulk_select(user_id=user_id, account_id=account_id,
+                                            transaction_ids=transaction_ids, filters=filters)
+    _account_lock(user_id=user_id, account_id=account_id)
+
+    entries = _transaction_day_entries(transactions, sign=-1)
+    if not entries:
+        return 0
+
+    _, deleted = transactions.delete()
+    _account_ledger_apply(user_id=user_id, account_id=account_id, entries=entries)
+
+    return deleted.get(Transaction._meta.label, 0)
+
+
+def _transaction_import_clean(row: dict) -> tuple[dict, list[str]]:
+    data, errors = {}, []
+    for name in IMPORT_FIELDS:
+        field = Transaction._meta.get_field(name)
+        value = row.get(name)
+
+        if value in ('', None):
+            if name == 'date':
+                data['date'] = timezone.now()
+                continue
+            value = None if field.null else ''
+
+        try:
+            data[name] = field.clean(value, None)
+        except ValidationError as e:
+            errors.extend(f'{name}: {message}' for message in e.messages)
+
+    if errors:
+        return data, errors
+
+    if settings.USE_TZ and timezone.is_naive(data['date']):
+        data['date'] = timezone.make_aware(data['date'])
+
+    amount_error = transaction_amount_error(debit_amount=data['debit_amount'],
+                                            credit_amount=data['credit_amount'])
+    if amount_error:
+        errors.append(amount_error)
+
+    return data, errors
+
+
+@instrumented
+@db_transaction.atomic
+def transaction_import(*,
+                       user_id: int,
+                       account_id: int,
+                       rows: Iterable[tuple[int, dict, str]],
+                       batch_size: int = 1000,
+                       dry_run: bool = False,
+                       max_errors: int = 100) -> dict:
+    """
+    Validates and inserts (row number, row, parse error) tuples batch by batch.
+    Nothing is written if any row is invalid or when running with dry_run.
+    """
+    # Only new rows are inserted, so the account row is locked by the balance update
+    # at the end instead of for the whole import
+    closed_until = _account_owner_check(user_id=user_id, account_id=account_id)
+
+    rows = iter(rows)
+    total, errors = 0, []
+    days = {}
+
+    while len(errors) < max_errors and (chunk := list(islice(rows, batch_size))):
+        transactions = []
+        for row_number, row, parse_error in chunk:
+            total += 1
+            data, row_errors = ({}, [parse_error]) if parse_error else _transaction_import_clean(row)
+            if not row_errors and closed_until and data['date'] < closed_until:
+                row_errors = ["The period is closed"]
+
+            if row_errors:
+                errors.append(dict(row=row_number, errors=row_errors))
+                continue
+
+            day = days.setdefault(AccountRollup.truncate(data['date'], AccountRollup.Granularity.DAY),
+                                  [Decimal(0), Decimal(0), 0])
+            day[0] += data['debit_amount'] or 0
+            day[1] += data['credit_amount'] or 0
+            day[2] += 1
+            transactions.append(Transaction(account_id=account_id, **data))
+
+        if not errors and not dry_run:
+            Transaction.objects.bulk_create(transactions, batch_size=batch_size)
+
+    errors = errors[:max_errors]
+    if errors or dry_run:
+        db_transaction.set_rollback(True)
+        return dict(rows=total, created=0, dry_run=dry_run, errors=errors)
+
+    _account_ledger_apply(user_id=user_id, account_id=account_id,
+                          entries=[(day, *totals) for day, totals in days.items()])
+    return dict(rows=total, created=total, dry_run=dry_run, errors=errors)
+
+
+ARCHIVE_FIELDS = ['id', 'account_id', 'debit_amount', 'credit_amount', 'description',
+                  'verification_number', 'date', 'created_at', 'updated_at']
+
+
+def _account_period_archive(*, account_id: int, cutoff: datetime, batch_size: int) -> int:
+    transactions = Transaction.objects.filter(account_id=account_id, date__lt=cutoff)
+    totals = transactions.aggregate(debit_total=Coalesce(Sum('debit_amount'), Decimal(0)),
+                                    credit_total=Coalesce(Sum('credit_amount'), Decimal(0)))
+
+    # The opening balance keeps both totals so aggregates over Transaction keep their value
+    amount_field = Transaction._meta.get_field('debit_amount')
+    if max(totals.values()) >= Decimal(10) ** (amount_field.max_digits - amount_field.decimal_places):
+        raise ValidationError("The totals before the cutoff are too large for an opening balance")
+
+    rows = transactions.filter(is_opening_balance=False).values_list(*ARCHIVE_FIELDS)
+    archived, batch = 0, []
+    for row in rows.iterator(chunk_size=batch_size):
+        batch.append(ArchivedTransaction(**dict(zip(ARCHIVE_FIELDS, row))))
+        if len(batch) >= batch_size:
+            archived += len(ArchivedTransaction.objects.bulk_create(batch))
+            batch = []
+    archived += len(ArchivedTransaction.objects.bulk_create(batch))
+
+    # The earlier opening balance is part of the totals and is replaced by the new one
+    transactions.delete()
+    if totals['debit_total'] or totals['credit_total']:
+        Transaction.objects.create(account_id=account_id,
+                                   debit_amount=totals['debit_total'] or None,
+                                   credit_amount=totals['credit_total'] or None,
+                                   description='Opening balance',
+                                   verification_number='',
+                                   date=cutoff - timedelta(microseconds=1),
+                                   is_opening_balance=True)
+    return archived
+
+
+@instrumented
+@db_transaction.atomic
+def period_close(*, user_id: int, cutoff: datetime, account_ids: list[int] = None, batch_size: int = 1000) -> dict:
+    """
+    Moves the transactions dated before cutoff to ArchivedTransaction and puts one opening
+    balance transaction per account in their place, dated just before the cutoff with
+    their debit and credit totals. Aggregates over Transaction, like the cached totals,
+    keep their value, while rollups, checkpoints and historical reads use the
+    TransactionHistory view over both tables. Accounts closed at or after cutoff are skipped.
+    """
+    if cutoff > timezone.now():
+        raise ValidationError("Only past periods can be closed")
+
+    if account_ids is None:
+        account_ids = Account.objects.filter(user_id=user_id).values_list('id', flat=True)
+    closed = _accounts_lock(user_id=user_id, account_ids=account_ids)
+
+    accounts, archived = 0, 0
+    for account_id, closed_until in closed.items():
+        if closed_until is not None and closed_until >= cutoff:
+            continue
+
+        archived += _account_period_archive(account_id=account_id, cutoff=cutoff, batch_size=batch_size)
+        Account.objects.filter(id=account_id).update(closed_until=cutoff)
+        ledger_cache_invalidate(user_id=user_id, account_id=account_id)
+        ledger_pin(user_id=user_id, account_id=account_id)
+        accounts += 1
+
+    return dict(accounts=accounts, archived=archived)
+
+
+@instrumented
+def ledger_job_create(*, user_id: int, kind: str, params: dict = None) -> LedgerJob:
+    """
+    Validates and records a pending job of the user. The worker threads of the web
+    processes and the ledger_run_jobs command pick pending jobs up, see jobs.py.
+    """
+    params = params or {}
+
+    if kind == LedgerJob.Kind.TRANSACTION_EXPORT:
+        _account_owner_check(user_id=user_id, account_id=params['account_id'])
+    elif kind == LedgerJob.Kind.BALANCE_REBUILD and params.get('account_ids'):
+        owned = set(Account.objects.filter(user_id=user_id, id__in=params['account_ids']).values_list('id', flat=True))
+        for account_id in params['account_ids']:
+            if account_id not in owned:
+                _account_owner_check(user_id=user_id, account_id=account_id)
+    elif kind not in LedgerJob.Kind.values:
+        raise ValidationError(f'Unknown job kind {kind}')
+
+    return LedgerJob.objects.create(user_id=user_id, kind=kind, params=params)
+
+
+@instrumented
+def ledger_jobs_cleanup(*, days: int) -> int:
+    """Deletes the jobs finished more than `days` ago with their result files. Returns how many."""
+    jobs = LedgerJob.objects.filter(status__in=[LedgerJob.Status.SUCCEEDED, LedgerJob.Status.FAILED],
+                                    finished_at__lt=timezone.now() - timedelta(days=days))
+
+    deleted = 0
+    for job in jobs.only('id', 'result_file').iterator():
+        # The file goes first, a job row left behind is deleted by the next cleanup
+        if job.result_file:
+            job.result_file.delete(save=False)
+        job.delete()
+        deleted += 1
+    return deleted
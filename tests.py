@@ -1,16 +1,87 @@
 import datetime
 import json
+import os
 import pytz
+import shutil
+import tempfile
+import time
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.exceptions import ImproperlyConfigured, ValidationError as DjangoValidationError
+from django.core.management.base import CommandError
+from django.db import connection
 from django.urls import reverse
-from rest_framework.test import APIClient
+from asgiref.sync import async_to_sync
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework.throttling import BaseThrottle
 from rest_framework import status
-from django.test import TestCase
-from flowback_addon.ledger.models import Account, Transaction
+from rest_framework.exceptions import ValidationError
+from django.test import (TestCase as DjangoTestCase, TransactionTestCase as DjangoTransactionTestCase,
+                         override_settings, skipUnlessDBFeature)
+from django.test.utils import CaptureQueriesContext
+from flowback_addon.ledger.benchmarks.concurrency import run_concurrency_benchmark
+from flowback_addon.ledger.benchmarks.endpoints import run_endpoint_benchmark
+from flowback_addon.ledger.benchmarks.posting import run_posting_benchmark
+from flowback_addon.ledger.benchmarks.seed import seed_ledger
+from flowback_addon.ledger.cache import ledger_cache, ledger_cache_stats, ledger_versions
+from flowback_addon.ledger.jobs import JOB_HANDLERS, ledger_job_enqueue, ledger_job_run, ledger_jobs_poll
+from flowback_addon.ledger.metrics import metrics_reset, prometheus_text
+from flowback_addon.ledger.models import (Account,
+                                          AccountBalanceCheckpoint,
+                                          AccountRollup,
+                                          ArchivedTransaction,
+                                          LedgerJob,
+                                          Transaction)
+from flowback_addon.ledger.routers import LedgerRouter, aledger_using, ledger_using
+from flowback_addon.ledger.selectors import (account_balance_at,
+                                             account_balance_discrepancies,
+                                             account_list,
+                                             account_series,
+                                             transaction_list,
+                                             transaction_running_balance_seed,
+                                             trial_balance)
+from flowback_addon.ledger.services import (account_balance_rebuild,
+                                            account_balances_rebuild,
+                                            account_checkpoints_build,
+                                            account_create,
+                                            account_delete,
+                                            account_rollups_rebuild,
+                                            account_update,
+                                            journal_entry_create,
+                                            ledger_job_create,
+                                            period_close,
+                                            transaction_create,
+                                            transaction_bulk_delete,
+                                            transaction_bulk_update,
+                                            transaction_delete,
+                                            transaction_import,
+                                            transaction_update)
+from flowback_addon.ledger.views import AccountListAsyncAPI
 
 from flowback.user.models import User
 
 
+# A cache the processes share, which conditional requests and read replica routing need
+SHARED_CACHE = dict(LEDGER_CACHE='ledger_shared',
+                    CACHES={**settings.CACHES,
+                            'ledger_shared': dict(BACKEND='django.core.cache.backends.filebased.FileBasedCache',
+                                                  LOCATION=os.path.join(tempfile.gettempdir(), 'ledger-test-cache'))})
+
+
+class TestCase(DjangoTestCase):
+    def __call__(self, result=None):
+        # SQLite hands out the ids of rolled back rows again, so cached pages of an
+        # earlier test would match the same user or account id in the next one
+        ledger_cache().clear()
+        return super().__call__(result)
+
+
 class AccountListAPITestCase(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -413,3 +484,1867 @@ class TransactionDeleteAPITest(TestCase):
         self.assertEqual(
             response_json['detail']['non_field_errors'][0], 'Account doesn\'t belong to User')
 
+
+
+class AccountCachedBalanceTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='test@user.com', username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        self.account = Account.objects.create(
+            account_number='123456789', account_name='Test Account', user=self.user)
+
+    def create_transaction(self, **data):
+        url = reverse('api:addon:ledger:transactions_create',
+                      args=[self.account.id])
+        data = {'description': 'Test transaction',
+                'verification_number': '123',
+                'date': datetime.datetime.now(pytz.utc),
+                **data}
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_transaction_create_updates_balance(self):
+        self.create_transaction(credit_amount=20)
+        self.create_transaction(debit_amount=5)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.cached_credit_total, 20)
+        self.assertEqual(self.account.cached_debit_total, 5)
+        self.assertEqual(self.account.balance(), 15)
+
+    def test_transaction_update_updates_balance(self):
+        transaction_id = self.create_transaction(credit_amount=20)
+        url = reverse('api:addon:ledger:transactions_update',
+                      args=[self.account.id, transaction_id])
+        payload = {'description': 'Update transaction',
+                   'verification_number': '123',
+                   'debit_amount': 5,
+                   'date': datetime.datetime.now(pytz.utc)}
+        response = self.client.post(url, payload)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.cached_credit_total, 0)
+        self.assertEqual(self.account.cached_debit_total, 5)
+        self.assertEqual(self.account.balance(), -5)
+
+    def test_transaction_delete_updates_balance(self):
+        self.create_transaction(credit_amount=20)
+        transaction_id = self.create_transaction(debit_amount=5)
+        url = reverse('api:addon:ledger:transactions_delete',
+                      args=[self.account.id, transaction_id])
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.cached_debit_total, 0)
+        self.assertEqual(self.account.balance(), 20)
+
+    def test_rebuild_balances_command(self):
+        Transaction.objects.create(description='Test transaction', verification_number='123',
+                                   credit_amount=20, account=self.account)
+        Transaction.objects.create(description='Test transaction', verification_number='124',
+                                   debit_amount=8, account=self.account)
+
+        with self.assertRaises(CommandError):
+            call_command('ledger_rebuild_balances', '--verify', stdout=StringIO(), stderr=StringIO())
+
+        call_command('ledger_rebuild_balances', stdout=StringIO())
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.cached_credit_total, 20)
+        self.assertEqual(self.account.cached_debit_total, 8)
+        self.assertEqual(self.account.balance(), 12)
+
+        call_command('ledger_rebuild_balances', '--verify', stdout=StringIO(), stderr=StringIO())
+
+    def test_rebuild_balances_chunks(self):
+        accounts = [self.account] + [Account.objects.create(account_number=f'12345678{i}', account_name='Test Account',
+                                                            user=self.user) for i in range(2)]
+        for account in accounts:
+            Transaction.objects.create(description='Test transaction', verification_number='123',
+                                       credit_amount=20, account=account)
+
+        reports = []
+        with mock.patch('flowback_addon.ledger.services.account_balance_rebuild',
+                        wraps=account_balance_rebuild) as rebuild:
+            rebuilt = account_balances_rebuild(chunk_size=2, progress=lambda done, total: reports.append((done, total)))
+
+        self.assertEqual(rebuilt, 3)
+        self.assertEqual([call.kwargs['account_ids'] for call in rebuild.call_args_list],
+                         [[accounts[0].id, accounts[1].id], [accounts[2].id]])
+        self.assertEqual(reports, [(0, 3), (2, 3), (3, 3)])
+        for account in accounts:
+            account.refresh_from_db()
+            self.assertEqual(account.balance(), 20)
+
+
+class AccountListBalanceTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='test@user.com', username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+
+    def create_accounts(self, count):
+        for i in range(count):
+            account = Account.objects.create(
+                account_number=str(i), account_name=f'Account {i}', user=self.user)
+            Transaction.objects.create(description='Credit', verification_number='1',
+                                       credit_amount=20, account=account)
+            Transaction.objects.create(description='Debit', verification_number='2',
+                                       debit_amount=5, account=account)
+
+    def test_account_list_api_balance(self):
+        self.create_accounts(1)
+        url = reverse('api:addon:ledger:accounts_list')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        account = response.data['results'][0]
+        self.assertEqual(account['debit_total'], 5)
+        self.assertEqual(account['credit_total'], 20)
+        self.assertEqual(account['balance'], 15)
+
+    def test_account_list_keeps_balance_method(self):
+        self.create_accounts(1)
+        account = account_list(user_id=self.user.id).get()
+        self.assertEqual(account.balance_total, 15)
+        self.assertEqual(account.balance(), account.cached_balance)
+
+    def test_account_list_api_query_count(self):
+        url = reverse('api:addon:ledger:accounts_list')
+        self.create_accounts(1)
+        with self.assertNumQueries(2):
+            self.client.get(url)
+
+        self.create_accounts(19)
+        ledger_cache().clear()
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['results']), 20)
+
+
+class TransactionListCursorPaginationTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='test@user.com', username='testuser', password='testpass')
+        self.account = Account.objects.create(
+            account_number='123456789', account_name='Test Account', user=self.user)
+        self.client.force_authenticate(user=self.user)
+
+        base_date = datetime.datetime(2023, 1, 1, tzinfo=pytz.utc)
+        for i in range(25):
+            Transaction.objects.create(description=f'Transaction {i}', verification_number=str(i),
+                                       credit_amount=10,
+                                       date=base_date + datetime.timedelta(days=i // 2),
+                                       account=self.account)
+
+    def get_page(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_transaction_list_cursor_pagination(self):
+        url = reverse('api:addon:ledger:transactions_list',
+                      args=[self.account.id]) + '?pagination=cursor&order_by=date_asc&limit=10'
+        expected = list(Transaction.objects.order_by('date', 'id').values_list('id', flat=True))
+
+        pages = [self.get_page(url)]
+        self.assertIsNone(pages[0]['previous'])
+        while pages[-1]['next']:
+            pages.append(self.get_page(pages[-1]['next']))
+
+        self.assertEqual(len(pages), 3)
+        self.assertEqual([row['id'] for page in pages for row in page['results']], expected)
+        self.assertEqual(pages[0]['count'], 25)
+
+        previous = self.get_page(pages[-1]['previous'])
+        self.assertEqual([row['id'] for row in previous['results']], expected[10:20])
+        first = self.get_page(previous['previous'])
+        self.assertEqual([row['id'] for row in first['results']], expected[:10])
+        self.assertIsNone(first['previous'])
+
+    def test_transaction_list_cursor_pagination_descending(self):
+        url = reverse('api:addon:ledger:transactions_list',
+                      args=[self.account.id]) + '?pagination=cursor&order_by=date_desc&limit=7'
+        expected = list(Transaction.objects.order_by('-date', '-id').values_list('id', flat=True))
+
+        page = self.get_page(url)
+        results = [row['id'] for row in page['results']]
+        while page['next']:
+            page = self.get_page(page['next'])
+            results += [row['id'] for row in page['results']]
+
+        self.assertEqual(results, expected)
+
+    def test_transaction_list_cursor_pagination_query_count(self):
+        url = reverse('api:addon:ledger:transactions_list',
+                      args=[self.account.id]) + '?pagination=cursor&count=false&limit=5'
+        with self.assertNumQueries(1):
+            page = self.get_page(url)
+        self.assertIsNone(page['count'])
+
+        for _ in range(3):
+            page = self.get_page(page['next'])
+        with self.assertNumQueries(1):
+            self.get_page(page['next'])
+
+    def test_transaction_list_cursor_pagination_invalid_cursor(self):
+        url = reverse('api:addon:ledger:transactions_list',
+                      args=[self.account.id]) + '?pagination=cursor&cursor=invalid'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_transaction_list_offset_pagination(self):
+        url = reverse('api:addon:ledger:transactions_list',
+                      args=[self.account.id]) + '?limit=10&offset=20'
+        page = self.get_page(url)
+        self.assertEqual(page['count'], 25)
+        self.assertEqual(len(page['results']), 5)
+
+
+class TransactionImportAPITest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='test@user.com', username='testuser', password='testpass')
+        self.account = Account.objects.create(
+            account_number='123456789', account_name='Test Account', user=self.user)
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('api:addon:ledger:transactions_import', args=[self.account.id])
+
+    def test_transaction_import_csv(self):
+        body = ('description,verification_number,debit_amount,credit_amount,date\n'
+                'Salary,1,,1000.50,2023-01-25T10:00:00Z\n'
+                'Rent,2,400,,2023-01-28\n'
+                '"Groceries, weekly",3,50.25,,2023-01-29T12:00:00Z\n')
+        response = self.client.post(self.url + '?batch_size=2', data=body, content_type='text/csv')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(Transaction.objects.filter(account=self.account).count(), 3)
+        self.assertTrue(Transaction.objects.filter(description='Groceries, weekly').exists())
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.cached_debit_total, Decimal('450.25'))
+        self.assertEqual(self.account.cached_credit_total, Decimal('1000.50'))
+
+    def test_transaction_import_ndjson(self):
+        body = ('{"description": "Salary", "verification_number": "1", "credit_amount": 0.1}\n'
+                '\n'
+                '{"description": "Rent", "verification_number": "2", "debit_amount": "400"}\n')
+        response = self.client.post(self.url, data=body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(Transaction.objects.get(description='Salary').credit_amount, Decimal('0.1'))
+
+    def test_transaction_import_row_errors(self):
+        body = ('description,verification_number,debit_amount,credit_amount\n'
+                'Valid,1,10,\n'
+                'Both,2,10,10\n'
+                ',3,,10\n'
+                'Amount,4,abc,\n')
+        response = self.client.post(self.url, data=body, content_type='text/csv')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 3, 4])
+        self.assertEqual(response.data['errors'][0]['errors'],
+                         ['Each transaction must have either a debit or a credit amount, but not both'])
+        self.assertEqual(Transaction.objects.count(), 0)
+
+    def test_transaction_import_dry_run(self):
+        body = '{"description": "Salary", "verification_number": "1", "credit_amount": 10}\n'
+        response = self.client.post(self.url + '?dry_run=true', data=body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['rows'], 1)
+        self.assertEqual(Transaction.objects.count(), 0)
+
+    def test_transaction_import_with_other_user(self):
+        other_user = User.objects.create_user(
+            email='test2@user.com', username='testuser2', password='testpass')
+        self.client.force_authenticate(user=other_user)
+        body = '{"description": "Salary", "verification_number": "1", "credit_amount": 10}\n'
+        response = self.client.post(self.url, data=body, content_type='application/x-ndjson')
+        response_json = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response_json['detail']['non_field_errors'][0], "Account doesn\'t belong to User")
+
+
+class TransactionExportAPITest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='test@user.com', username='testuser', password='testpass')
+        self.account = Account.objects.create(
+            account_number='123456789', account_name='Test Account', user=self.user)
+        self.client.force_authenticate(user=self.user)
+
+        base_date = datetime.datetime(2023, 1, 1, tzinfo=pytz.utc)
+        for i, (debit_amount, credit_amount) in enumerate([(None, 100), (30, None), (None, 5), (20, None)]):
+            Transaction.objects.create(description=f'Transaction {i}', verification_number=str(i),
+                                       debit_amount=debit_amount, credit_amount=credit_amount,
+                                       date=base_date + datetime.timedelta(days=i), account=self.account)
+        self.url = reverse('api:addon:ledger:transactions_export', args=[self.account.id])
+
+    def test_transaction_export_csv(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,date,verification_number,description,debit_amount,credit_amount')
+        self.assertEqual(len(lines), 5)
+        self.assertTrue(lines[1].endswith(',Transaction 0,,100.00000'))
+
+    def test_transaction_export_ndjson_running_balance(self):
+        response = self.client.get(self.url + '?output_format=ndjson&running_balance=true'
+                                              '&date__gte=2023-01-02T00:00:00Z')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['verification_number'] for row in rows], ['1', '2', '3'])
+        self.assertEqual([Decimal(row['running_balance']) for row in rows], [70, 75, 55])
+
+    def test_transaction_export_with_other_user(self):
+        other_user = User.objects.create_user(
+            email='test2@user.com', username='testuser2', password='testpass')
+        self.client.force_authenticate(user=other_user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TransactionListRunningBalanceTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='test@user.com', username='testuser', password='testpass')
+        self.account = Account.objects.create(
+            account_number='123456789', account_name='Test Account', user=self.user)
+        self.client.force_authenticate(user=self.user)
+
+        base_date = datetime.datetime(2023, 1, 1, tzinfo=pytz.utc)
+        for i in range(20):
+            Transaction.objects.create(description=f'Transaction {i}', verification_number=str(i),
+                                       debit_amount=i if i % 3 == 0 else None,
+                                       credit_amount=None if i % 3 == 0 else 10 + i,
+                                       date=base_date + datetime.timedelta(days=(i * 7) % 5),
+                                       account=self.account)
+
+        self.expected = {}
+        balance = Decimal(0)
+        for transaction in Transaction.objects.order_by('date', 'id'):
+            balance += (transaction.credit_amount or 0) - (transaction.debit_amount or 0)
+            self.expected[transaction.id] = balance
+        self.url = reverse('api:addon:ledger:transactions_list', args=[self.account.id])
+
+    def assertRunningBalance(self, results):
+        self.assertTrue(results)
+        for row in results:
+            self.assertEqual(row['running_balance'], float(self.expected[row['id']]))
+
+    def test_transaction_list_running_balance_offset(self):
+        response = self.client.get(self.url + '?running_balance=true&order_by=date_desc&limit=5&offset=10')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertRunningBalance(response.data['results'])
+
+    def test_transaction_list_running_balance_cursor(self):
+        for order_by in ('date_asc', 'date_desc'):
+            page = self.client.get(self.url + f'?running_balance=true&pagination=cursor&order_by={order_by}&limit=4').data
+            page = self.client.get(page['next']).data
+            page = self.client.get(page['next']).data
+            self.assertRunningBalance(page['results'])
+
+    def test_transaction_list_running_balance_created_at_order(self):
+        response = self.client.get(self.url + '?running_balance=true&order_by=created_at_asc&limit=5&offset=5')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertNotEqual(results, sorted(results, key=lambda row: (row['date'], row['id'])))
+        self.assertRunningBalance(response.data['results'])
+
+        for view in ('transactions_list', 'transactions_list_async'):
+            url = reverse(f'api:addon:ledger:{view}', args=[self.account.id])
+            response = self.client.get(url + '?running_balance=true&pagination=cursor&order_by=created_at_asc')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_transaction_list_running_balance_side_filter(self):
+        for view in ('transactions_list', 'transactions_list_async'):
+            url = reverse(f'api:addon:ledger:{view}', args=[self.account.id])
+            response = self.client.get(url + '?running_balance=true&side=credit')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data['detail']['non_field_errors'][0],
+                             'running_balance can not be combined with the filters: side')
+
+        response = self.client.get(self.url + '?side=credit')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_transaction_list_running_balance_date_filter(self):
+        transactions = transaction_list(account_id=self.account.id, running_balance=True,
+                                        filters=dict(date__gte=datetime.datetime(2023, 1, 3, tzinfo=pytz.utc)))
+        page = transaction_running_balance_seed(account_id=self.account.id, transactions=list(transactions))
+        self.assertEqual({t.id: t.running_balance for t in page},
+                         {t.id: self.expected[t.id] for t in page})
+
+    def test_transaction_list_without_running_balance(self):
+        response = self.client.get(self.url)
+        self.assertNotIn('running_balance', response.data['results'][0])
+
+
+class AccountBalanceCheckpointTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='test@user.com', username='testuser', password='testpass')
+        self.account = Account.objects.create(
+            account_number='123456789', account_name='Test Account', user=self.user)
+        self.client.force_authenticate(user=self.user)
+
+        self.transactions = []
+        for month in range(1, 7):
+            for day, (debit_amount, credit_amount) in ((3, (None, 100)), (17, (month * 10, None))):
+                self.transactions.append(transaction_create(
+                    user_id=self.user.id, account_id=self.account.id,
+                    debit_amount=debit_amount, credit_amount=credit_amount,
+                    description='Test transaction', verification_number=str(month),
+                    date=datetime.datetime(2023, month, day, tzinfo=pytz.utc)))
+
+    def expected_balance(self, date):
+        return sum((t.credit_amount or 0) - (t.debit_amount or 0)
+                   for t in Transaction.objects.filter(account=self.account, date__lte=date))
+
+    def test_account_balance_at_uses_checkpoints(self):
+        call_command('ledger_build_checkpoints', stdout=StringIO())
+        self.assertEqual(AccountBalanceCheckpoint.objects.filter(account=self.account).count(), 6)
+
+        for date in (datetime.datetime(2022, 12, 31, tzinfo=pytz.utc),
+                     datetime.datetime(2023, 3, 1, tzinfo=pytz.utc),
+                     datetime.datetime(2023, 4, 17, tzinfo=pytz.utc),
+                     datetime.datetime(2024, 1, 1, tzinfo=pytz.utc)):
+            # The checkpoint, the closed periods of the account and the sum after the checkpoint
+            with self.assertNumQueries(3):
+                balance = account_balance_at(account_id=self.account.id, date=date)
+            self.assertEqual(balance['balance'], self.expected_balance(date))
+
+    def test_transaction_update_invalidates_closed_periods(self):
+        call_command('ledger_build_checkpoints', stdout=StringIO())
+        transaction_update(user_id=self.user.id, account_id=self.account.id,
+                           transaction_id=self.transactions[4].id,
+                           data={'credit_amount': 500, 'description': 'Test transaction',
+                                 'verification_number': '3', 'date': self.transactions[4].date})
+        self.assertEqual(list(AccountBalanceCheckpoint.objects.values_list('period_end__month', flat=True)
+                              .order_by('period_end')), [2, 3])
+
+        date = datetime.datetime(2023, 5, 1, tzinfo=pytz.utc)
+        self.assertEqual(account_balance_at(account_id=self.account.id, date=date)['balance'],
+                         self.expected_balance(date))
+
+        transaction_delete(user_id=self.user.id, account_id=self.account.id,
+                           transaction_id=self.transactions[0].id)
+        self.assertFalse(AccountBalanceCheckpoint.objects.exists())
+
+        call_command('ledger_build_checkpoints', stdout=StringIO())
+        self.assertEqual(account_balance_at(account_id=self.account.id, date=date)['balance'],
+                         self.expected_balance(date))
+
+    def test_rebuild_checkpoints_under_lock(self):
+        call_command('ledger_build_checkpoints', stdout=StringIO())
+        AccountBalanceCheckpoint.objects.update(credit_total=0)
+
+        with CaptureQueriesContext(connection) as queries:
+            call_command('ledger_build_checkpoints', '--rebuild', stdout=StringIO())
+        statements = [query['sql'] for query in queries.captured_queries]
+        lock = next(i for i, sql in enumerate(statements) if '"closed_until"' in sql)
+        delete = next(i for i, sql in enumerate(statements) if sql.startswith('DELETE'))
+        self.assertLess(lock, delete)
+
+        self.assertEqual(AccountBalanceCheckpoint.objects.filter(account=self.account).count(), 6)
+        date = datetime.datetime(2023, 4, 17, tzinfo=pytz.utc)
+        self.assertEqual(account_balance_at(account_id=self.account.id, date=date)['balance'],
+                         self.expected_balance(date))
+
+    def test_account_balance_api(self):
+        call_command('ledger_build_checkpoints', stdout=StringIO())
+        url = reverse('api:addon:ledger:accounts_balance', args=[self.account.id])
+        response = self.client.get(url + '?date=2023-02-20T00:00:00Z')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['balance'], 170)
+
+        response = self.client.get(url)
+        self.assertEqual(response.data['balance'], float(self.account.transactions.count() // 2 * 100 - 210))
+
+
+class AccountSeriesAPITest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='test@user.com', username='testuser', password='testpass')
+        self.account = Account.objects.create(
+            account_number='123456789', account_name='Test Account', user=self.user)
+        self.client.force_authenticate(user=self.user)
+
+        self.transactions = [
+            transaction_create(user_id=self.user.id, account_id=self.account.id,
+                               debit_amount=debit_amount, credit_amount=credit_amount,
+                               description='Test transaction', verification_number='1',
+                               date=datetime.datetime(2023, month, day, 12, tzinfo=pytz.utc))
+            for month, day, debit_amount, credit_amount in ((1, 5, None, 100), (1, 5, 20, None),
+                                                            (1, 20, 10, None), (2, 1, None, 50),
+                                                            (3, 15, 40, None))]
+
+    def rollups(self):
+        return sorted(AccountRollup.objects.exclude(transaction_count=0).values_list(
+            'granularity', 'period_start', 'debit_total', 'credit_total', 'transaction_count'))
+
+    def test_rollups_match_rebuild(self):
+        transaction_update(user_id=self.user.id, account_id=self.account.id,
+                           transaction_id=self.transactions[2].id,
+                           data={'debit_amount': 15, 'description': 'Moved', 'verification_number': '1',
+                                 'date': datetime.datetime(2023, 2, 3, tzinfo=pytz.utc)})
+        transaction_delete(user_id=self.user.id, account_id=self.account.id,
+                           transaction_id=self.transactions[4].id)
+        incremental = self.rollups()
+
+        call_command('ledger_rebuild_rollups', stdout=StringIO())
+        self.assertEqual(incremental, self.rollups())
+        self.assertEqual(AccountRollup.objects.get(granularity='month', period_start__month=2).debit_total, 15)
+
+    def test_account_series_api(self):
+        url = reverse('api:addon:ledger:accounts_series', args=[self.account.id])
+        with self.assertNumQueries(2):
+            response = self.client.get(url + '?granularity=month')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(row['debit_total'], row['credit_total'], row['balance']) for row in response.data],
+                         [(30, 100, 70), (0, 50, 120), (40, 0, 80)])
+
+        response = self.client.get(url + '?granularity=day&date__gte=2023-01-20T18:00:00Z')
+        self.assertEqual([(row['transaction_count'], row['balance']) for row in response.data],
+                         [(1, 70), (1, 120), (1, 80)])
+
+
+@override_settings(**SHARED_CACHE)
+class LedgerCacheTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='test@user.com', username='testuser', password='testpass')
+        self.account = Account.objects.create(
+            account_number='123456789', account_name='Test Account', user=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def test_account_list_cached_until_change(self):
+        url = reverse('api:addon:ledger:accounts_list')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.data['results'][0]['balance'], 0)
+
+        create_url = reverse('api:addon:ledger:transactions_create', args=[self.account.id])
+        self.client.post(create_url, {'description': 'Test transaction', 'verification_number': '1',
+                                      'credit_amount': 20, 'date': datetime.datetime.now(pytz.utc)})
+        response = self.client.get(url)
+        self.assertEqual(response.data['results'][0]['balance'], 20)
+
+    def test_transaction_list_and_balance_cached(self):
+        list_url = reverse('api:addon:ledger:transactions_list', args=[self.account.id])
+        balance_url = reverse('api:addon:ledger:accounts_balance', args=[self.account.id])
+        self.client.get(list_url)
+        self.client.get(balance_url)
+
+        stats = ledger_cache_stats()
+        with self.assertNumQueries(0):
+            self.client.get(list_url)
+            self.client.get(balance_url)
+        self.assertEqual(ledger_cache_stats()['hits'], stats['hits'] + 2)
+
+        transaction = transaction_create(user_id=self.user.id, account_id=self.account.id, debit_amount=5,
+                                         description='Test transaction', verification_number='1',
+                                         date=datetime.datetime.now(pytz.utc))
+        self.assertEqual(self.client.get(list_url).data['results'][0]['id'], transaction.id)
+        self.assertEqual(self.client.get(balance_url).data['balance'], -5)
+
+    def test_cached_balance_keeps_ownership_check(self):
+        url = reverse('api:addon:ledger:accounts_balance', args=[self.account.id])
+        self.client.get(url)
+
+        other_user = User.objects.create_user(
+            email='test2@user.com', username='testuser2', password='testpass')
+        self.client.force_authenticate(user=other_user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cached_transaction_list_keeps_ownership_check(self):
+        other_user = User.objects.create_user(
+            email='test2@user.com', username='testuser2', password='testpass')
+
+        for view in ('transactions_list', 'transactions_list_async'):
+            url = reverse(f'api:addon:ledger:{view}', args=[self.account.id])
+            self.client.force_authenticate(user=self.user)
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+            self.client.force_authenticate(user=other_user)
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data['detail']['non_field_errors'], ["Account doesn't belong to User"])
+
+    def test_local_cache_computes_every_time(self):
+        url = reverse('api:addon:ledger:accounts_balance', args=[self.account.id])
+        with self.settings(LEDGER_CACHE=None):
+            self.client.get(url)
+            stats = ledger_cache_stats()
+            with self.assertNumQueries(2):
+                self.client.get(url)
+        self.assertEqual(ledger_cache_stats(), stats)
+
+    def test_cache_stats_api(self):
+        url = reverse('api:addon:ledger:cache_stats')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('hits', response.data)
+
+
+@override_settings(**SHARED_CACHE)
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='test@user.com', username='testuser', password='testpass')
+        self.account = Account.objects.create(
+            account_number='123456789', account_name='Test Account', user=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def test_account_list_etag(self):
+        url = reverse('api:addon:ledger:accounts_list')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(url + '?order_by=created_at_desc', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        account_update(user_id=self.user.id, account_id=self.account.id,
+                       data={'account_number': '1', 'account_name': 'Renamed'})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_transaction_list_last_modified(self):
+        url = reverse('api:addon:ledger:transactions_list', args=[self.account.id])
+        response = self.client.get(url)
+        last_modified = response['Last-Modified']
+
+        # The ownership check of the account
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        other_user = User.objects.create_user(
+            email='test2@user.com', username='testuser2', password='testpass')
+        self.client.force_authenticate(user=other_user)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.client.force_authenticate(user=self.user)
+
+        etag = self.client.get(url)['ETag']
+        transaction_create(user_id=self.user.id, account_id=self.account.id, credit_amount=5,
+                           description='Test transaction', verification_number='1',
+                           date=datetime.datetime.now(pytz.utc))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+
+    def test_invalid_query_not_modified(self):
+        url = reverse('api:addon:ledger:transactions_list', args=[self.account.id])
+        response = self.client.get(url + '?unknown=1', HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn('ETag', response)
+
+    def test_local_cache_sends_no_validators(self):
+        url = reverse('api:addon:ledger:accounts_list')
+        with self.settings(LEDGER_CACHE=None):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+
+
+class FastSerializationTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='test@user.com', username='testuser', password='testpass')
+        self.account = Account.objects.create(
+            account_number='123456789', account_name='Test Account', user=self.user)
+        Account.objects.create(account_number='987654321', account_name='Tomt Konto', user=self.user)
+        self.client.force_authenticate(user=self.user)
+
+        date = datetime.datetime(2024, 1, 1, 12, 30, 15, 123456, tzinfo=pytz.utc)
+        for i in range(5):
+            transaction_create(user_id=self.user.id, account_id=self.account.id,
+                               debit_amount=Decimal('10.12345') if i % 2 else None,
+                               credit_amount=None if i % 2 else Decimal(f'{i}.33333'),
+                               description=f'Transaktion {i} \u00e5\u00e4\u00f6', verification_number=str(i),
+                               date=date + datetime.timedelta(days=i % 3))
+
+    def assertSameContent(self, url):
+        ledger_cache().clear()
+        expected = self.client.get(url)
+        ledger_cache().clear()
+        with override_settings(LEDGER_FAST_SERIALIZATION=True):
+            response = self.client.get(url)
+
+        self.assertEqual(expected.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, expected.content)
+        return response
+
+    def test_account_list(self):
+        self.assertSameContent(reverse('api:addon:ledger:accounts_list') + '?order_by=created_at_desc')
+
+    def test_transaction_list(self):
+        url = reverse('api:addon:ledger:transactions_list', args=[self.account.id])
+        self.assertSameContent(url + '?order_by=date_asc&limit=2&offset=1')
+
+    def test_transaction_list_cursor(self):
+        url = reverse('api:addon:ledger:transactions_list', args=[self.account.id])
+        response = self.assertSameContent(url + '?pagination=cursor&order_by=created_at_asc&limit=2')
+        self.assertSameContent(response.data['next'])
+
+    def test_transaction_list_running_balance(self):
+        url = reverse('api:addon:ledger:transactions_list', args=[self.account.id])
+        self.assertSameContent(url + '?running_balance=true&limit=2&offset=2')
+
+
+class SparseFieldsTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='test@user.com', username='testuser', password='testpass')
+        self.account = Account.objects.create(
+            account_number='123456789', account_name='Test Account', user=self.user)
+        self.client.force_authenticate(user=self.user)
+
+        date = datetime.datetime(2024, 1, 1, tzinfo=pytz.utc)
+        for i in range(3):
+            transaction_create(user_id=self.user.id, account_id=self.account.id, credit_amount=10 * (i + 1),
+                               description='Test transaction', verification_number=str(i),
+                               date=date + datetime.timedelta(days=i))
+
+    def test_transaction_list_fields(self):
+        url = reverse('api:addon:ledger:transactions_list', args=[self.account.id])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url + '?fields=date,credit_amount&order_by=date_asc')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(response.data['results'][0]), ['credit_amount', 'date'])
+        self.assertEqual(response.data['results'][0]['credit_amount'], 10.0)
+        self.assertFalse(any('description' in query['sql'] for query in queries.captured_queries))
+
+    def test_transaction_list_fields_cursor_running_balance(self):
+        url = reverse('api:addon:ledger:transactions_list', args=[self.account.id])
+        response = self.client.get(url + '?fields=running_balance&pagination=cursor'
+                                         '&order_by=date_asc&running_balance=true&limit=2')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [{'running_balance': 10.0}, {'running_balance': 30.0}])
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(response.data['results'], [{'running_balance': 60.0}])
+
+    def test_transaction_list_fields_fast_path(self):
+        url = reverse('api:addon:ledger:transactions_list', args=[self.account.id]) + '?fields=id,debit_amount'
+        expected = self.client.get(url)
+        ledger_cache().clear()
+
+        with override_settings(LEDGER_FAST_SERIALIZATION=True):
+            response = self.client.get(url)
+        self.assertEqual(response.content, expected.content)
+
+    def test_transaction_list_invalid_fields(self):
+        url = reverse('api:addon:ledger:transactions_list', args=[self.account.id])
+        response = self.client.get(url + '?fields=id,account')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_account_list_fields_without_totals(self):
+        url = reverse('api:addon:ledger:accounts_list')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url + '?fields=id,account_name')
+
+        self.assertEqual(response.data['results'], [{'id': self.account.id, 'account_name': 'Test Account'}])
+        self.assertFalse(any('ledger_transaction' in query['sql'] for query in queries.captured_queries))
+
+        response = self.client.get(url + '?fields=balance')
+        self.assertEqual(response.data['results'], [{'balance': 60.0}])
+
+
+class ServiceQueryCountTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@user.com', username='testuser', password='testpass')
+        self.other_user = User.objects.create_user(
+            email='other@user.com', username='otheruser', password='testpass')
+        self.account = Account.objects.create(
+            account_number='123456789', account_name='Test Account', user=self.user)
+        self.other_account = Account.objects.create(
+            account_number='987654321', account_name='Other Account', user=self.other_user)
+        self.date = datetime.datetime(2024, 1, 15, tzinfo=pytz.utc)
+        self.transaction = transaction_create(user_id=self.user.id, account_id=self.account.id, credit_amount=10,
+                                              description='Test transaction', verification_number='1',
+                                              date=self.date)
+
+    def assertValidationError(self, message, func, **kwargs):
+        with self.assertRaises((DjangoValidationError, ValidationError)) as context:
+            func(**kwargs)
+
+        exception = context.exception
+        messages = exception.messages if isinstance(exception, DjangoValidationError) else exception.detail
+        self.assertEqual([str(m) for m in messages], [message])
+
+    def test_account_create(self):
+        with self.assertNumQueries(2):
+            account_create(user_id=self.user.id, account_number='1', account_name='New Account')
+
+    def test_account_update(self):
+        with self.assertNumQueries(3):
+            account_update(user_id=self.user.id, account_id=self.account.id,
+                           data=dict(account_number='1', account_name='Renamed'))
+
+    def test_account_delete(self):
+        with self.assertNumQueries(6):
+            account_delete(user_id=self.user.id, account_id=self.account.id)
+
+    def test_transaction_create(self):
+        with self.assertNumQueries(8):
+            transaction_create(user_id=self.user.id, account_id=self.account.id, debit_amount=5,
+                               description='Test transaction', verification_number='2', date=self.date)
+
+    def test_transaction_update(self):
+        with self.assertNumQueries(10):
+            transaction_update(user_id=self.user.id, account_id=self.account.id,
+                               transaction_id=self.transaction.id, data=dict(debit_amount=5))
+
+    def test_transaction_delete(self):
+        with self.assertNumQueries(9):
+            transaction_delete(user_id=self.user.id, account_id=self.account.id,
+                               transaction_id=self.transaction.id)
+
+    def test_transaction_import(self):
+        rows = [(i, dict(credit_amount='1', description='Imported', verification_number=str(i),
+                         date='2024-01-20T00:00:00Z'), None) for i in range(1, 51)]
+        with self.assertNumQueries(11):
+            transaction_import(user_id=self.user.id, account_id=self.account.id, rows=rows)
+
+    def test_journal_entry_create(self):
+        with self.assertNumQueries(8):
+            journal_entry_create(user_id=self.user.id, verification_number='J1', description='Transfer',
+                                 date=self.date,
+                                 legs=[dict(account_id=self.account.id, debit_amount=5),
+                                       dict(account_id=self.account.id, credit_amount=5)])
+
+    def test_transaction_bulk_update(self):
+        with self.assertNumQueries(12):
+            transaction_bulk_update(user_id=self.user.id, account_id=self.account.id,
+                                    transaction_ids=[self.transaction.id],
+                                    data=dict(date=datetime.datetime(2024, 2, 1, tzinfo=pytz.utc)))
+
+    def test_transaction_bulk_delete(self):
+        with self.assertNumQueries(9):
+            transaction_bulk_delete(user_id=self.user.id, account_id=self.account.id,
+                                    filters=dict(date__lte=self.date))
+
+    def test_account_balance_rebuild(self):
+        with self.assertNumQueries(5):
+            account_balance_rebuild()
+
+    def test_account_rollups_rebuild(self):
+        with self.assertNumQueries(7):
+            account_rollups_rebuild()
+
+    def test_account_checkpoints_build(self):
+        with self.assertNumQueries(12):
+            account_checkpoints_build(until=datetime.datetime(2024, 3, 1, tzinfo=pytz.utc))
+
+    def test_transaction_errors(self):
+        kwargs = dict(user_id=self.user.id, account_id=self.account.id, transaction_id=self.transaction.id)
+        other_transaction = transaction_create(user_id=self.other_user.id, account_id=self.other_account.id,
+                                               credit_amount=10, description='Test transaction',
+                                               verification_number='1', date=self.date)
+
+        for service in (transaction_update, transaction_delete):
+            service_kwargs = dict(data=dict(debit_amount=5)) if service is transaction_update else {}
+            self.assertValidationError('account does not exist', service,
+                                       **{**kwargs, 'account_id': 0}, **service_kwargs)
+            self.assertValidationError('transaction does not exist', service,
+                                       **{**kwargs, 'transaction_id': 0}, **service_kwargs)
+            self.assertValidationError("Transaction doesn't belong to Account", service,
+                                       **{**kwargs, 'transaction_id': other_transaction.id}, **service_kwargs)
+            self.assertValidationError("Account doesn't belong to User", service,
+                                       **{**kwargs, 'user_id': self.other_user.id}, **service_kwargs)
+            self.assertValidationError('transaction does not exist', service,
+                                       **{**kwargs, 'user_id': self.other_user.id, 'transaction_id': 0},
+                                       **service_kwargs)
+
+        self.assertValidationError('account does not exist', transaction_create,
+                                   user_id=self.user.id, account_id=0, credit_amount=1,
+                                   description='Test', verification_number='1')
+        self.assertValidationError("Account doesn't belong to User", transaction_create,
+                                   user_id=self.user.id, account_id=self.other_account.id, credit_amount=1,
+                                   description='Test', verification_number='1')
+        self.assertValidationError("Account doesn't belong to User", transaction_create,
+                                   user_id=self.user.id, account_id=self.other_account.id, credit_amount=1,
+                                   description='Test', verification_number='1' * 100)
+        self.assertTrue(Transaction.objects.filter(id=other_transaction.id).exists())
+
+
+class TransactionBulkAPITest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='test@user.com', username='testuser', password='testpass')
+        self.other_user = User.objects.create_user(
+            email='other@user.com', username='otheruser', password='testpass')
+        self.account = Account.objects.create(
+            account_number='123456789', account_name='Test Account', user=self.user)
+        self.other_account = Account.objects.create(
+            account_number='987654321', account_name='Other Account', user=self.other_user)
+        self.client.force_authenticate(user=self.user)
+
+        self.transactions = [
+            transaction_create(user_id=self.user.id, account_id=self.account.id,
+                               debit_amount=debit_amount, credit_amount=credit_amount,
+                               description='Imported', verification_number=verification_number,
+                               date=datetime.datetime(2023, month, day, 12, tzinfo=pytz.utc))
+            for month, day, debit_amount, credit_amount, verification_number in (
+                (1, 5, None, 100, 'IMP-1'), (1, 5, 20, None, 'IMP-2'), (1, 20, 10, None, 'IMP-3'),
+                (2, 1, None, 50, 'V-1'), (3, 15, 40, None, 'IMP-4'))]
+        self.other_transaction = transaction_create(user_id=self.other_user.id, account_id=self.other_account.id,
+                                                    credit_amount=5, description='Other',
+                                                    verification_number='IMP-1',
+                                                    date=datetime.datetime(2023, 1, 5, tzinfo=pytz.utc))
+
+    def assertDerivedDataConsistent(self):
+        rollups = sorted(AccountRollup.objects.exclude(transaction_count=0).values_list(
+            'granularity', 'period_start', 'debit_total', 'credit_total', 'transaction_count'))
+        call_command('ledger_rebuild_rollups', stdout=StringIO())
+        self.assertEqual(rollups, sorted(AccountRollup.objects.exclude(transaction_count=0).values_list(
+            'granularity', 'period_start', 'debit_total', 'credit_total', 'transaction_count')))
+        self.assertFalse(account_balance_discrepancies().exists())
+
+    def test_bulk_delete_by_filter(self):
+        url = reverse('api:addon:ledger:transactions_bulk_delete', args=[self.account.id])
+        response = self.client.post(url, dict(verification_number__startswith='IMP',
+                                              date__lte='2023-02-01T00:00:00Z'), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, dict(deleted=3))
+        self.assertEqual(Transaction.objects.filter(account=self.account).count(), 2)
+        self.assertTrue(Transaction.objects.filter(id=self.other_transaction.id).exists())
+
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance(), 10)
+        self.assertDerivedDataConsistent()
+
+    def test_bulk_delete_by_ids(self):
+        url = reverse('api:addon:ledger:transactions_bulk_delete', args=[self.account.id])
+        response = self.client.post(url, dict(ids=[self.transactions[0].id, self.other_transaction.id]),
+                                    format='json')
+
+        self.assertEqual(response.data, dict(deleted=1))
+        self.assertTrue(Transaction.objects.filter(id=self.other_transaction.id).exists())
+        self.assertDerivedDataConsistent()
+
+    def test_bulk_delete_requires_selection(self):
+        url = reverse('api:addon:ledger:transactions_bulk_delete', args=[self.account.id])
+        response = self.client.post(url, {}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Transaction.objects.filter(account=self.account).count(), 5)
+
+    def test_bulk_delete_other_users_account(self):
+        url = reverse('api:addon:ledger:transactions_bulk_delete', args=[self.other_account.id])
+        response = self.client.post(url, dict(ids=[self.other_transaction.id]), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['detail']['non_field_errors'], ["Account doesn't belong to User"])
+        self.assertTrue(Transaction.objects.filter(id=self.other_transaction.id).exists())
+
+    def test_bulk_update_date(self):
+        url = reverse('api:addon:ledger:transactions_bulk_update', args=[self.account.id])
+        response = self.client.post(url, dict(verification_number__startswith='IMP',
+                                              data=dict(date='2023-04-02T00:00:00Z', description='Corrected')),
+                                    format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, dict(updated=4))
+        self.assertEqual(Transaction.objects.filter(description='Corrected', date__month=4).count(), 4)
+        self.assertEqual(Transaction.objects.get(id=self.other_transaction.id).description, 'Other')
+        self.assertEqual(account_balance_at(account_id=self.account.id,
+                                            date=datetime.datetime(2023, 3, 31, tzinfo=pytz.utc))['balance'], 50)
+        self.assertDerivedDataConsistent()
+
+    def test_bulk_update_description_invalidates_list(self):
+        list_url = reverse('api:addon:ledger:transactions_list', args=[self.account.id])
+        self.client.get(list_url)
+
+        url = reverse('api:addon:ledger:transactions_bulk_update', args=[self.account.id])
+        self.client.post(url, dict(ids=[self.transactions[0].id], data=dict(description='Renamed')), format='json')
+
+        descriptions = [row['description'] for row in self.client.get(list_url).data['results']]
+        self.assertIn('Renamed', descriptions)
+
+
+class JournalEntryCreateAPITest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='test@user.com', username='testuser', password='testpass')
+        self.other_user = User.objects.create_user(
+            email='other@user.com', username='otheruser', password='testpass')
+        self.bank = Account.objects.create(account_number='1930', account_name='Bank', user=self.user)
+        self.rent = Account.objects.create(account_number='5010', account_name='Rent', user=self.user)
+        self.power = Account.objects.create(account_number='5020', account_name='Power', user=self.user)
+        self.other_account = Account.objects.create(
+            account_number='1930', account_name='Other Bank', user=self.other_user)
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('api:addon:ledger:journal_entries_create')
+
+    def test_split_expense(self):
+        response = self.client.post(self.url, dict(
+            verification_number='V100', description='March bills', date='2023-03-01T12:00:00Z',
+            legs=[dict(account_id=self.bank.id, debit_amount='150.50'),
+                  dict(account_id=self.rent.id, credit_amount='100.00', description='Rent'),
+                  dict(account_id=self.power.id, credit_amount='50.50')]), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        transactions = Transaction.objects.filter(id__in=response.data)
+        self.assertEqual(transactions.count(), 3)
+        self.assertEqual(set(transactions.values_list('verification_number', flat=True)), {'V100'})
+        self.assertEqual(transactions.get(account=self.rent).description, 'Rent')
+        self.assertEqual(transactions.get(account=self.power).description, 'March bills')
+
+        self.assertEqual(Account.objects.get(id=self.bank.id).balance(), Decimal('-150.5'))
+        self.assertEqual(Account.objects.get(id=self.power.id).balance(), Decimal('50.5'))
+        self.assertEqual(AccountRollup.objects.get(account=self.rent, granularity='month').credit_total, 100)
+        self.assertFalse(account_balance_discrepancies().exists())
+
+    def test_unbalanced(self):
+        response = self.client.post(self.url, dict(
+            verification_number='V100', description='Transfer',
+            legs=[dict(account_id=self.bank.id, debit_amount=100),
+                  dict(account_id=self.rent.id, credit_amount=90)]), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['detail']['non_field_errors'],
+                         ['The debits and credits of a journal entry must balance'])
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_other_users_account(self):
+        response = self.client.post(self.url, dict(
+            verification_number='V100', description='Transfer',
+            legs=[dict(account_id=self.bank.id, debit_amount=100),
+                  dict(account_id=self.other_account.id, credit_amount=100)]), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Transaction.objects.exists())
+        self.assertEqual(Account.objects.get(id=self.bank.id).balance(), 0)
+
+    def test_invalid_leg(self):
+        response = self.client.post(self.url, dict(
+            verification_number='V100', description='Transfer',
+            legs=[dict(account_id=self.bank.id, debit_amount=100, credit_amount=100),
+                  dict(account_id=self.rent.id, credit_amount=100)]), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_accounts_locked_in_id_order(self):
+        with CaptureQueriesContext(connection) as queries:
+            journal_entry_create(user_id=self.user.id, verification_number='V100', description='Transfer',
+                                 legs=[dict(account_id=self.rent.id, credit_amount=10),
+                                       dict(account_id=self.bank.id, debit_amount=10)])
+
+        lock = next(query['sql'] for query in queries.captured_queries if 'ledger_account"."user_id' in query['sql'])
+        self.assertIn('ORDER BY "ledger_account"."id" ASC', lock)
+
+
+class TrialBalanceAPITest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='test@user.com', username='testuser', password='testpass')
+        self.bank = Account.objects.create(account_number='1930', account_name='Bank', user=self.user)
+        self.rent = Account.objects.create(account_number='5010', account_name='Rent', user=self.user)
+        self.unused = Account.objects.create(account_number='9999', account_name='Unused', user=self.user)
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('api:addon:ledger:accounts_trial_balance')
+
+        for month in (1, 2, 3):
+            journal_entry_create(user_id=self.user.id, verification_number=str(month), description='Rent',
+                                 date=datetime.datetime(2023, month, 1, tzinfo=pytz.utc),
+                                 legs=[dict(account_id=self.bank.id, debit_amount=month * 100),
+                                       dict(account_id=self.rent.id, credit_amount=month * 100)])
+
+    def test_trial_balance(self):
+        with self.assertNumQueries(1):
+            balance = trial_balance(user_id=self.user.id)
+
+        self.assertEqual([row['account_number'] for row in balance['accounts']], ['1930', '5010', '9999'])
+        self.assertEqual(balance['accounts'][0]['balance'], -600)
+        self.assertEqual(balance['accounts'][2]['debit_total'], 0)
+        self.assertEqual(balance['debit_total'], 600)
+        self.assertEqual(balance['credit_total'], 600)
+        self.assertEqual(balance['balance'], 0)
+
+    def test_trial_balance_dates(self):
+        with self.assertNumQueries(1):
+            balance = trial_balance(user_id=self.user.id, as_of=datetime.datetime(2023, 2, 15, tzinfo=pytz.utc))
+        self.assertEqual(balance['accounts'][1]['credit_total'], 300)
+        self.assertEqual(balance['accounts'][2]['balance'], 0)
+
+        balance = trial_balance(user_id=self.user.id,
+                                date_range=(datetime.datetime(2023, 2, 1, tzinfo=pytz.utc), None))
+        self.assertEqual(balance['accounts'][0]['debit_total'], 500)
+        self.assertEqual(balance['debit_total'], 500)
+
+    def test_trial_balance_api(self):
+        response = self.client.get(self.url + '?date__gte=2023-02-01T00:00:00Z&date__lte=2023-02-28T00:00:00Z')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['accounts'][0]['debit_total'], 200)
+        self.assertEqual(response.data['credit_total'], 200)
+
+        other_user = User.objects.create_user(
+            email='test2@user.com', username='testuser2', password='testpass')
+        self.client.force_authenticate(user=other_user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['accounts'], [])
+        self.assertEqual(response.data['balance'], 0)
+
+
+class PeriodCloseTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='test@user.com', username='testuser', password='testpass')
+        self.other_user = User.objects.create_user(
+            email='other@user.com', username='otheruser', password='testpass')
+        self.account = Account.objects.create(
+            account_number='123456789', account_name='Test Account', user=self.user)
+        self.other_account = Account.objects.create(
+            account_number='987654321', account_name='Other Account', user=self.other_user)
+        self.client.force_authenticate(user=self.user)
+        self.cutoff = datetime.datetime(2023, 4, 1, tzinfo=pytz.utc)
+
+        self.transactions = []
+        for month in range(1, 7):
+            for day, (debit_amount, credit_amount) in ((3, (None, 100)), (17, (month * 10, None))):
+                self.transactions.append(transaction_create(
+                    user_id=self.user.id, account_id=self.account.id,
+                    debit_amount=debit_amount, credit_amount=credit_amount,
+                    description='Test transaction', verification_number=str(month),
+                    date=datetime.datetime(2023, month, day, tzinfo=pytz.utc)))
+        call_command('ledger_build_checkpoints', stdout=StringIO())
+
+    def expected_balance(self, date):
+        return sum((t.credit_amount or 0) - (t.debit_amount or 0) for t in self.transactions if t.date <= date)
+
+    def test_period_close(self):
+        rollups = list(AccountRollup.objects.order_by('id').values_list('period_start', 'debit_total', 'credit_total'))
+        result = period_close(user_id=self.user.id, cutoff=self.cutoff)
+        self.assertEqual(result, dict(accounts=1, archived=6))
+
+        self.assertEqual(ArchivedTransaction.objects.filter(account=self.account).count(), 6)
+        opening = Transaction.objects.get(account=self.account, is_opening_balance=True)
+        self.assertEqual((opening.debit_amount, opening.credit_amount), (60, 300))
+        self.assertEqual(Transaction.objects.filter(account=self.account).count(), 7)
+        self.assertEqual(Account.objects.get(id=self.account.id).closed_until, self.cutoff)
+
+        self.assertEqual(Account.objects.get(id=self.account.id).balance(), 600 - 210)
+        self.assertFalse(account_balance_discrepancies().exists())
+        account_rollups_rebuild()
+        self.assertEqual(list(AccountRollup.objects.values_list('period_start', 'debit_total', 'credit_total')
+                              .order_by('period_start', 'debit_total')), sorted(rollups))
+
+    def test_side_filter_skips_opening_balance(self):
+        period_close(user_id=self.user.id, cutoff=self.cutoff)
+
+        for side in ('debit', 'credit'):
+            transactions = transaction_list(account_id=self.account.id, filters=dict(side=side))
+            self.assertEqual(transactions.count(), 3)
+            self.assertFalse(transactions.filter(is_opening_balance=True).exists())
+
+    def test_period_close_totals_too_large(self):
+        for amount in (6 * 10 ** 9, 6 * 10 ** 9):
+            transaction_create(user_id=self.user.id, account_id=self.other_account.id, credit_amount=amount,
+                               description='Large', verification_number='1',
+                               date=datetime.datetime(2023, 1, 10, tzinfo=pytz.utc))
+
+        with self.assertRaises(DjangoValidationError):
+            period_close(user_id=self.other_user.id, cutoff=self.cutoff)
+        self.assertFalse(ArchivedTransaction.objects.filter(account=self.other_account).exists())
+        self.assertEqual(Transaction.objects.filter(account=self.other_account).count(), 2)
+
+    def test_balances_read_archive(self):
+        period_close(user_id=self.user.id, cutoff=self.cutoff)
+
+        for date in (datetime.datetime(2023, 2, 20, tzinfo=pytz.utc),
+                     datetime.datetime(2023, 3, 31, tzinfo=pytz.utc),
+                     datetime.datetime(2023, 5, 10, tzinfo=pytz.utc)):
+            self.assertEqual(account_balance_at(account_id=self.account.id, date=date)['balance'],
+                             self.expected_balance(date))
+
+        AccountBalanceCheckpoint.objects.all().delete()
+        call_command('ledger_build_checkpoints', stdout=StringIO())
+        date = datetime.datetime(2023, 5, 10, tzinfo=pytz.utc)
+        self.assertEqual(account_balance_at(account_id=self.account.id, date=date)['balance'],
+                         self.expected_balance(date))
+
+    def test_balances_read_archive_only_when_reached(self):
+        period_close(user_id=self.user.id, cutoff=self.cutoff)
+        AccountBalanceCheckpoint.objects.all().delete()
+
+        for date, reaches_archive in ((datetime.datetime(2023, 3, 31, tzinfo=pytz.utc), True),
+                                      (self.cutoff, False),
+                                      (datetime.datetime(2023, 5, 10, tzinfo=pytz.utc), False)):
+            with CaptureQueriesContext(connection) as queries:
+                balance = account_balance_at(account_id=self.account.id, date=date)
+            self.assertEqual(balance['balance'], self.expected_balance(date))
+            self.assertEqual('ledger_transaction_history' in queries.captured_queries[-1]['sql'], reaches_archive)
+
+        with CaptureQueriesContext(connection) as queries:
+            series = account_series(account_id=self.account.id, granularity='month',
+                                    date__gte=datetime.datetime(2023, 5, 1, tzinfo=pytz.utc))
+        self.assertEqual(series[-1]['balance'], self.expected_balance(self.transactions[-1].date))
+        self.assertFalse(any('ledger_transaction_history' in query['sql'] for query in queries.captured_queries))
+
+    def test_list_reads_archive_only_when_reached(self):
+        period_close(user_id=self.user.id, cutoff=self.cutoff)
+
+        live = transaction_list(account_id=self.account.id, filters=dict(order_by='date_asc'))
+        self.assertTrue(live.first().is_opening_balance)
+        self.assertEqual(live.count(), 7)
+
+        with self.assertNumQueries(1):
+            later = transaction_list(account_id=self.account.id,
+                                     filters=dict(date__gte=datetime.datetime(2023, 5, 1, tzinfo=pytz.utc)))
+        self.assertEqual(later.model, Transaction)
+        self.assertEqual(later.count(), 4)
+
+        history = transaction_list(account_id=self.account.id, filters=dict(
+            date__gte=datetime.datetime(2023, 3, 1, tzinfo=pytz.utc), order_by='date_asc'))
+        self.assertEqual(list(history.values_list('id', flat=True)), [t.id for t in self.transactions[4:]])
+
+        url = reverse('api:addon:ledger:transactions_export', args=[self.account.id])
+        response = self.client.get(url + '?output_format=ndjson&running_balance=true&date__gte=2023-03-01T00:00:00Z')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['id'] for row in rows], [t.id for t in self.transactions[4:]])
+        self.assertEqual(Decimal(rows[-1]['running_balance']), self.expected_balance(self.transactions[-1].date))
+
+    def test_closed_period_is_read_only(self):
+        period_close(user_id=self.user.id, cutoff=self.cutoff)
+        opening = Transaction.objects.get(account=self.account, is_opening_balance=True)
+
+        with self.assertRaises(DjangoValidationError):
+            transaction_create(user_id=self.user.id, account_id=self.account.id, credit_amount=1,
+                               description='Late', verification_number='1',
+                               date=datetime.datetime(2023, 3, 30, tzinfo=pytz.utc))
+        with self.assertRaises(DjangoValidationError):
+            transaction_delete(user_id=self.user.id, account_id=self.account.id, transaction_id=opening.id)
+        with self.assertRaises(DjangoValidationError):
+            transaction_update(user_id=self.user.id, account_id=self.account.id,
+                               transaction_id=self.transactions[-1].id,
+                               data=dict(credit_amount=1, date=datetime.datetime(2023, 1, 1, tzinfo=pytz.utc)))
+        self.assertEqual(transaction_bulk_delete(user_id=self.user.id, account_id=self.account.id,
+                                                 filters=dict(date__lte=self.cutoff)), 0)
+
+    def test_period_close_api(self):
+        url = reverse('api:addon:ledger:accounts_close_period')
+        response = self.client.post(url, dict(cutoff='2023-04-01T00:00:00Z', account_ids=[self.other_account.id]),
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ArchivedTransaction.objects.exists())
+
+        response = self.client.post(url, dict(cutoff='2023-04-01T00:00:00Z'), format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, dict(accounts=1, archived=6))
+
+        response = self.client.post(url, dict(cutoff='2023-03-01T00:00:00Z'), format='json')
+        self.assertEqual(response.data, dict(accounts=0, archived=0))
+
+
+class TransactionListFilterTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='test@user.com', username='testuser', password='testpass')
+        self.account = Account.objects.create(
+            account_number='123456789', account_name='Test Account', user=self.user)
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('api:addon:ledger:transactions_list', args=[self.account.id])
+
+        self.transactions = [
+            transaction_create(user_id=self.user.id, account_id=self.account.id,
+                               debit_amount=debit_amount, credit_amount=credit_amount,
+                               description=description, verification_number=verification_number,
+                               date=datetime.datetime(2023, 1, day, tzinfo=pytz.utc))
+            for day, debit_amount, credit_amount, description, verification_number in (
+                (1, None, 100, 'Salary January', 'A100'),
+                (5, 40, None, 'Groceries', 'A101'),
+                (10, 250, None, 'Rent', 'B200'),
+                (20, None, 15, 'Refund groceries', 'B201'),
+            )]
+
+    def assertFiltered(self, query, indexes):
+        response = self.client.get(self.url + '?order_by=date_asc&' + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['id'] for row in response.data['results']],
+                         [self.transactions[i].id for i in indexes])
+
+    def test_filters(self):
+        self.assertFiltered('date__gte=2023-01-05T00:00:00Z&date__lte=2023-01-10T00:00:00Z', [1, 2])
+        self.assertFiltered('debit_amount__gte=50', [2])
+        self.assertFiltered('credit_amount__lte=50', [3])
+        self.assertFiltered('side=credit', [0, 3])
+        self.assertFiltered('verification_number=B200', [2])
+        self.assertFiltered('verification_number__startswith=A', [0, 1])
+        self.assertFiltered('description__icontains=GROCERIES', [1, 3])
+        self.assertFiltered('side=debit&description__icontains=groceries', [1])
+
+    def test_invalid_filters(self):
+        for query in ('side=both', 'debit_amount__gte=abc', 'description__contains=rent'):
+            response = self.client.get(self.url + '?' + query)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_indexes(self):
+        indexes = {index.name: index.fields for index in Transaction._meta.indexes}
+        self.assertEqual(indexes['ledger_tx_account_verification'], ['account', 'verification_number'])
+        self.assertEqual(indexes['ledger_tx_account_credit'], ['account', 'credit_amount'])
+
+        with CaptureQueriesContext(connection) as queries:
+            list(transaction_list(account_id=self.account.id, filters=dict(verification_number__startswith='A')))
+        self.assertIn('LIKE', queries.captured_queries[-1]['sql'])
+
+
+class LedgerBenchmarkTest(TestCase):
+    def setUp(self):
+        self.user_id = seed_ledger(users=1, accounts_per_user=3, transactions_per_account=60, seed=1)[0]
+        self.account_id = Account.objects.filter(user_id=self.user_id).order_by('id').values_list('id', flat=True)[0]
+
+    def test_endpoints_within_query_budgets(self):
+        accounts = Account.objects.filter(user_id=self.user_id).order_by('id')
+        before = list(accounts.values_list('id', 'account_number', 'account_name', 'closed_until', 'cached_balance'))
+        transactions = list(Transaction.objects.filter(account__user_id=self.user_id).order_by('id')
+                            .values_list('id', 'description', 'verification_number'))
+
+        results = run_endpoint_benchmark(user_id=self.user_id, account_id=self.account_id, repeat=2)
+
+        for name, result in results.items():
+            self.assertTrue(result['succeeded'], f'{name}: status {result["status"]}')
+            self.assertTrue(result['within_budget'], f'{name}: {result["queries"]} > {result["budget"]} queries')
+
+        # The writing scenarios only wrote the accounts they created, which are gone again
+        self.assertEqual(list(accounts.values_list('id', 'account_number', 'account_name', 'closed_until',
+                                                   'cached_balance')), before)
+        self.assertEqual(list(Transaction.objects.filter(account__user_id=self.user_id).order_by('id')
+                              .values_list('id', 'description', 'verification_number')), transactions)
+        self.assertFalse(LedgerJob.objects.filter(user_id=self.user_id).exists())
+
+    def test_benchmark_command(self):
+        output = StringIO()
+        call_command('ledger_benchmark', user_id=self.user_id, repeat=1, stdout=output)
+
+        results = json.loads(output.getvalue())['results']
+        self.assertEqual(results['transactions_list_deep_cursor']['endpoint'], 'transactions_list')
+
+    def test_seed_needs_accounts(self):
+        users = User.objects.count()
+        with self.assertRaises(CommandError):
+            call_command('ledger_seed', accounts_per_user=0, stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('ledger_benchmark', transactions_per_account=0, stdout=StringIO())
+        self.assertEqual(User.objects.count(), users)
+
+    def test_seed_delete_only_seeded_users(self):
+        user = User.objects.create_user(email='test@user.com', username='testuser', password='testpass')
+
+        with self.assertRaises(CommandError):
+            call_command('ledger_seed', delete=[user.id, self.user_id], stdout=StringIO())
+        self.assertTrue(User.objects.filter(id=user.id).exists())
+        self.assertFalse(User.objects.filter(id=self.user_id).exists())
+
+
+class LedgerMetricsTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='test@user.com', username='testuser', password='testpass')
+        self.account = Account.objects.create(
+            account_number='123456789', account_name='Test Account', user=self.user)
+        self.client.force_authenticate(user=self.user)
+        for i in range(3):
+            transaction_create(user_id=self.user.id, account_id=self.account.id, credit_amount=10,
+                               description='Test transaction', verification_number=str(i),
+                               date=datetime.datetime(2023, 1, 1 + i, tzinfo=pytz.utc))
+        metrics_reset()
+
+    def test_disabled_by_default(self):
+        self.client.get(reverse('api:addon:ledger:transactions_list', args=[self.account.id]))
+        self.assertNotIn('ledger_view_seconds', prometheus_text())
+
+    @override_settings(LEDGER_METRICS=True)
+    def test_view_and_function_metrics(self):
+        self.client.get(reverse('api:addon:ledger:transactions_list', args=[self.account.id]) + '?running_balance=true')
+        self.client.get(reverse('api:addon:ledger:accounts_balance', args=[self.account.id]) +
+                        '?date=2023-01-02T12:00:00Z')
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse('api:addon:ledger:metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+
+        text = response.content.decode()
+        self.assertIn('ledger_view_seconds_count{method="GET",view="TransactionListAPI"} 1', text)
+        self.assertIn('ledger_view_rows_sum{method="GET",view="TransactionListAPI"} 3', text)
+        self.assertIn('ledger_view_sql_queries_bucket{method="GET",view="AccountBalanceAPI",le="+Inf"} 1', text)
+        for span in ('filter', 'paginate', 'running_balance', 'serialize'):
+            self.assertIn(f'ledger_span_seconds_count{{span="{span}",view="TransactionListAPI"}} 1', text)
+        self.assertIn('ledger_function_seconds_count{function="account_balance_at"} 1', text)
+        self.assertIn('ledger_cache_misses_total', text)
+
+    @override_settings(LEDGER_METRICS=True)
+    def test_streamed_export_metrics(self):
+        url = reverse('api:addon:ledger:transactions_export', args=[self.account.id])
+        response = self.client.get(url)
+        self.assertNotIn('view="TransactionExportAPI"', prometheus_text())
+
+        with CaptureQueriesContext(connection) as queries:
+            b''.join(response.streaming_content)
+        self.assertTrue(queries.captured_queries)
+
+        # The ownership check in the view, and the queries of the streamed rows
+        text = prometheus_text()
+        self.assertIn('ledger_view_seconds_count{method="GET",view="TransactionExportAPI"} 1', text)
+        sql_queries = next(line for line in text.splitlines()
+                           if line.startswith('ledger_view_sql_queries_sum{method="GET",view="TransactionExportAPI"}'))
+        self.assertEqual(float(sql_queries.split()[-1]), 1 + len(queries.captured_queries))
+
+    def test_metrics_api_requires_admin(self):
+        response = self.client.get(reverse('api:addon:ledger:metrics'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(LEDGER_SLOW_REQUEST_MS=0)
+    def test_slow_request_log(self):
+        with self.assertLogs('flowback_addon.ledger.slow', level='WARNING') as logs:
+            self.client.get(reverse('api:addon:ledger:transactions_list', args=[self.account.id]))
+
+        self.assertIn('ledger_transaction', logs.output[0])
+        self.assertNotIn('ledger_view_seconds', prometheus_text())
+
+
+class AsyncViewsTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='test@user.com', username='testuser', password='testpass')
+        self.account = Account.objects.create(account_number='1930', account_name='Bank', user=self.user)
+        Account.objects.create(account_number='5010', account_name='Rent', user=self.user)
+        self.client.force_authenticate(user=self.user)
+        for i in range(5):
+            amount = dict(debit_amount=i) if i % 2 else dict(credit_amount=10 + i)
+            transaction_create(user_id=self.user.id, account_id=self.account.id, description='Test transaction',
+                               verification_number=str(i), date=datetime.datetime(2023, 1, 1 + i, tzinfo=pytz.utc),
+                               **amount)
+
+    def assertSameResponse(self, name: str, query: str = '', args: list = None):
+        sync_response = self.client.get(reverse(f'api:addon:ledger:{name}', args=args) + query)
+        async_response = self.client.get(reverse(f'api:addon:ledger:{name}_async', args=args) + query)
+
+        self.assertEqual(async_response.status_code, status.HTTP_200_OK, async_response.content)
+        self.assertEqual(async_response.json(), sync_response.json())
+        return async_response.json()
+
+    def test_accounts_list(self):
+        data = self.assertSameResponse('accounts_list')
+        self.assertEqual(data['count'], 2)
+
+        self.assertSameResponse('accounts_list', '?limit=1&offset=1&fields=id,balance')
+
+    def test_transactions_list(self):
+        data = self.assertSameResponse('transactions_list', '?order_by=date_desc&limit=2', args=[self.account.id])
+        self.assertEqual(data['count'], 5)
+
+        self.assertSameResponse('transactions_list', '?order_by=date_asc&side=debit', args=[self.account.id])
+        self.assertSameResponse('transactions_list', '?offset=2&limit=2&running_balance=true', args=[self.account.id])
+
+    def test_transactions_list_cursor(self):
+        url = reverse('api:addon:ledger:transactions_list_async', args=[self.account.id])
+        response = self.client.get(url + '?pagination=cursor&order_by=date_desc&limit=2')
+        self.assertEqual([row['verification_number'] for row in response.json()['results']], ['4', '3'])
+
+        response = self.client.get(response.json()['next'])
+        self.assertEqual([row['verification_number'] for row in response.json()['results']], ['2', '1'])
+
+    def test_accounts_balance(self):
+        data = self.assertSameResponse('accounts_balance', args=[self.account.id])
+        self.assertEqual(data['balance'], 32)
+
+        data = self.assertSameResponse('accounts_balance', '?date=2023-01-02T00:00:00Z', args=[self.account.id])
+        self.assertEqual(data['balance'], 9)
+
+    def test_accounts_balance_errors(self):
+        other_user = User.objects.create_user(
+            email='other@user.com', username='otheruser', password='testpass')
+        other_account = Account.objects.create(account_number='1930', account_name='Bank', user=other_user)
+
+        response = self.client.get(reverse('api:addon:ledger:accounts_balance_async', args=[other_account.id]))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['detail']['non_field_errors'][0], "Account doesn\'t belong to User")
+
+        response = self.client.get(reverse('api:addon:ledger:accounts_balance_async', args=[self.account.id])
+                                   + '?date=yesterday')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(user=None)
+        response = self.client.get(reverse('api:addon:ledger:accounts_balance_async', args=[self.account.id]))
+        self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+
+    def test_transactions_list_ownership(self):
+        other_user = User.objects.create_user(
+            email='other@user.com', username='otheruser', password='testpass')
+        other_account = Account.objects.create(account_number='1930', account_name='Bank', user=other_user)
+
+        response = self.client.get(reverse('api:addon:ledger:transactions_list_async', args=[other_account.id]))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['detail']['non_field_errors'][0], "Account doesn\'t belong to User")
+
+    def test_throttles(self):
+        class DenyThrottle(BaseThrottle):
+            def allow_request(self, request, view):
+                return False
+
+        request = APIRequestFactory().get('/ledger/accounts_list_async')
+        force_authenticate(request, user=self.user)
+        response = async_to_sync(AccountListAsyncAPI.as_view(throttle_classes=[DenyThrottle]))(request)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_browsable_api(self):
+        view = AccountListAsyncAPI.as_view(renderer_classes=[BrowsableAPIRenderer, JSONRenderer])
+        request = APIRequestFactory().get('/ledger/accounts_list_async', HTTP_ACCEPT='text/html')
+        force_authenticate(request, user=self.user)
+        response = async_to_sync(view)(request)
+        response.render()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/html'))
+
+
+@override_settings(LEDGER_READ_DATABASE='replica', **SHARED_CACHE)
+class ReadReplicaRoutingTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@user.com', username='testuser', password='testpass')
+        self.account = Account.objects.create(account_number='1930', account_name='Bank', user=self.user)
+        ledger_cache().clear()
+
+    def test_selectors_read_replica(self):
+        self.assertEqual(account_list(user_id=self.user.id).db, 'replica')
+        self.assertEqual(transaction_list(account_id=self.account.id).db, 'replica')
+        self.assertEqual(transaction_list(account_id=self.account.id, using='default').db, 'default')
+
+        with override_settings(LEDGER_READ_DATABASE=None):
+            self.assertEqual(transaction_list(account_id=self.account.id).db, 'default')
+
+    def test_writes_pin_reads_to_primary(self):
+        other_account = Account.objects.create(account_number='5010', account_name='Rent', user=self.user)
+        transaction_create(user_id=self.user.id, account_id=self.account.id, credit_amount=10,
+                           description='Test transaction', verification_number='1')
+
+        self.assertEqual(ledger_using(user_id=self.user.id), 'default')
+        self.assertEqual(transaction_list(account_id=self.account.id).db, 'default')
+        self.assertEqual(transaction_list(account_id=other_account.id).db, 'replica')
+
+        ledger_cache().clear()
+        self.assertEqual(transaction_list(account_id=self.account.id).db, 'replica')
+
+        with override_settings(LEDGER_READ_PIN_SECONDS=0):
+            transaction_create(user_id=self.user.id, account_id=self.account.id, credit_amount=10,
+                               description='Test transaction', verification_number='2')
+            self.assertEqual(transaction_list(account_id=self.account.id).db, 'replica')
+
+    def test_router(self):
+        router = LedgerRouter()
+        self.assertEqual(router.db_for_read(Transaction), 'default')
+        self.assertEqual(router.db_for_write(Transaction), 'default')
+        self.assertIsNone(router.db_for_read(User))
+
+        self.account._state.db = 'replica'
+        self.assertEqual(router.db_for_read(Transaction, instance=self.account), 'replica')
+        self.assertEqual(router.db_for_write(Account, instance=self.account), 'default')
+        self.assertTrue(router.allow_relation(self.account, self.user))
+
+        with override_settings(LEDGER_READ_DATABASE=None):
+            self.assertIsNone(router.allow_relation(self.account, self.user))
+
+    def test_async_routing(self):
+        self.assertEqual(async_to_sync(aledger_using)(account_id=self.account.id), 'replica')
+
+        transaction_create(user_id=self.user.id, account_id=self.account.id, credit_amount=10,
+                           description='Test transaction', verification_number='1')
+        self.assertEqual(async_to_sync(aledger_using)(account_id=self.account.id), 'default')
+
+    def test_needs_shared_cache(self):
+        with override_settings(LEDGER_CACHE=None):
+            with self.assertRaises(ImproperlyConfigured):
+                ledger_using(user_id=self.user.id)
+
+
+@skipUnless('replica' in settings.DATABASES and not settings.DATABASES['replica'].get('TEST', {}).get('MIRROR'),
+            'needs a separate "replica" database')
+@override_settings(LEDGER_READ_DATABASE='replica', **SHARED_CACHE)
+class ReadReplicaDatabaseTest(TestCase):
+    databases = {'default', 'replica'}
+
+    def test_reads_own_writes_from_primary(self):
+        user = User.objects.create_user(email='test@user.com', username='testuser', password='testpass')
+        account = Account.objects.create(account_number='1930', account_name='Bank', user=user)
+        # Stands in for replication, the transaction below never reaches the replica
+        user.save(using='replica')
+        account.save(using='replica')
+
+        transaction_create(user_id=user.id, account_id=account.id, credit_amount=10,
+                           description='Test transaction', verification_number='1')
+        self.assertEqual(transaction_list(account_id=account.id).count(), 1)
+        self.assertEqual(account_balance_at(account_id=account.id)['balance'], 10)
+
+        ledger_cache().clear()
+        self.assertEqual(transaction_list(account_id=account.id).count(), 0)
+        self.assertEqual(account_balance_at(account_id=account.id)['balance'], 0)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='ledger-test-'), LEDGER_JOB_WORKERS=0)
+class LedgerJobTest(TestCase):
+    def setUp(self):
+        self.addCleanup(shutil.rmtree, settings.MEDIA_ROOT, ignore_errors=True)
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='test@user.com', username='testuser', password='testpass')
+        self.account = Account.objects.create(account_number='1930', account_name='Bank', user=self.user)
+        self.client.force_authenticate(user=self.user)
+        for i in range(5):
+            transaction_create(user_id=self.user.id, account_id=self.account.id, credit_amount=10,
+                               description='Test transaction', verification_number=str(i),
+                               date=datetime.datetime(2023, 1, 1 + i, tzinfo=pytz.utc))
+
+    def create_job(self, kind: str, **params):
+        response = self.client.post(reverse('api:addon:ledger:jobs_create'), dict(kind=kind, params=params),
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return response.data
+
+    def job_detail(self, job_id: int) -> dict:
+        response = self.client.get(reverse('api:addon:ledger:jobs_detail', args=[job_id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return response.data
+
+    def test_transaction_export_job(self):
+        job_id = self.create_job('transaction_export', account_id=self.account.id,
+                                 date__gte='2023-01-02T00:00:00Z', running_balance=True)
+        self.assertEqual(self.job_detail(job_id)['status'], 'pending')
+        self.assertIsNone(self.job_detail(job_id)['result_url'])
+
+        ledger_job_run(job_id)
+
+        detail = self.job_detail(job_id)
+        self.assertEqual(detail['status'], 'succeeded')
+        self.assertEqual((detail['progress_done'], detail['progress_total']), (4, 4))
+        self.assertTrue(detail['result_url'].endswith(f'/jobs/{job_id}/result'))
+
+        response = self.client.get(reverse('api:addon:ledger:jobs_result', args=[job_id]))
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,date,verification_number,description,debit_amount,credit_amount,running_balance')
+        self.assertEqual(len(lines), 5)
+        self.assertTrue(lines[-1].endswith(',50.00000'))
+
+    def test_trial_balance_and_rebuild_jobs(self):
+        Account.objects.filter(id=self.account.id).update(cached_balance=0, cached_credit_total=0)
+        rebuild_id = self.create_job('balance_rebuild', account_ids=[self.account.id])
+        trial_balance_id = self.create_job('trial_balance', as_of='2023-01-03T00:00:00Z')
+
+        call_command('ledger_run_jobs', stdout=StringIO())
+
+        self.assertEqual(self.job_detail(rebuild_id)['progress_done'], 1)
+        self.assertEqual(Account.objects.get(id=self.account.id).balance(), 50)
+
+        response = self.client.get(reverse('api:addon:ledger:jobs_result', args=[trial_balance_id]))
+        result = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(Decimal(result['credit_total']), 30)
+        self.assertEqual(result['accounts'][0]['account_number'], '1930')
+
+    def test_job_errors(self):
+        other_user = User.objects.create_user(
+            email='other@user.com', username='otheruser', password='testpass')
+        other_account = Account.objects.create(account_number='1930', account_name='Bank', user=other_user)
+
+        url = reverse('api:addon:ledger:jobs_create')
+        response = self.client.post(url, dict(kind='transaction_export', params=dict(account_id=other_account.id)),
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['detail']['non_field_errors'][0], "Account doesn\'t belong to User")
+
+        response = self.client.post(url, dict(kind='transaction_export', params={}), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url, dict(kind='unknown'), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        job = ledger_job_create(user_id=other_user.id, kind=LedgerJob.Kind.TRIAL_BALANCE)
+        response = self.client.get(reverse('api:addon:ledger:jobs_detail', args=[job.id]))
+        self.assertEqual(response.json()['detail']['non_field_errors'][0], "Job doesn\'t belong to User")
+
+        job_id = self.create_job('trial_balance')
+        response = self.client.get(reverse('api:addon:ledger:jobs_result', args=[job_id]))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_failed_job(self):
+        job_id = self.create_job('transaction_export', account_id=self.account.id)
+        account_delete(user_id=self.user.id, account_id=self.account.id)
+
+        job = ledger_job_run(job_id)
+        self.assertEqual(job.status, LedgerJob.Status.FAILED)
+        self.assertEqual(job.error, 'account does not exist')
+        self.assertIsNone(ledger_job_run(job_id))
+
+    def test_stale_jobs_run_again(self):
+        job_id = self.create_job('trial_balance')
+        LedgerJob.objects.filter(id=job_id).update(status=LedgerJob.Status.RUNNING,
+                                                   updated_at=datetime.datetime(2023, 1, 1, tzinfo=pytz.utc))
+
+        call_command('ledger_run_jobs', stale_minutes=5, stdout=StringIO())
+        self.assertEqual(LedgerJob.objects.get(id=job_id).status, LedgerJob.Status.SUCCEEDED)
+
+    def test_requeued_run_is_dropped(self):
+        job_id = self.create_job('trial_balance')
+
+        def claimed_again(job, output, progress):
+            # Queued again as stale and claimed by another worker while this run goes on
+            LedgerJob.objects.filter(id=job.id).update(started_at=job.started_at + datetime.timedelta(seconds=1))
+            output.write(b'{}')
+            return 'trial-balance.json', 'application/json'
+
+        with mock.patch.dict(JOB_HANDLERS, {LedgerJob.Kind.TRIAL_BALANCE: claimed_again}):
+            self.assertIsNone(ledger_job_run(job_id))
+
+        job = LedgerJob.objects.get(id=job_id)
+        self.assertEqual(job.status, LedgerJob.Status.RUNNING)
+        self.assertFalse(job.result_file)
+        self.assertFalse(any(files for _, _, files in os.walk(settings.MEDIA_ROOT)))
+
+    def test_rebuild_job_keeps_other_users_cache(self):
+        other_user = User.objects.create_user(
+            email='other@user.com', username='otheruser', password='testpass')
+        versions = ledger_versions(user_id=other_user.id)
+
+        ledger_job_run(self.create_job('balance_rebuild'))
+        self.assertEqual(ledger_versions(user_id=other_user.id), versions)
+
+    def test_finished_jobs_cleanup(self):
+        job_id = self.create_job('trial_balance')
+        result_name = ledger_job_run(job_id).result_file.name
+        kept_id = self.create_job('trial_balance')
+        LedgerJob.objects.filter(id=job_id).update(finished_at=datetime.datetime(2023, 1, 1, tzinfo=pytz.utc))
+
+        call_command('ledger_run_jobs', retention_days=7, stdout=StringIO())
+        self.assertFalse(LedgerJob.objects.filter(id=job_id).exists())
+        self.assertFalse(default_storage.exists(result_name))
+        self.assertEqual(LedgerJob.objects.get(id=kept_id).status, LedgerJob.Status.SUCCEEDED)
+
+
+class TransactionTestCase(DjangoTransactionTestCase):
+    def __call__(self, result=None):
+        ledger_cache().clear()
+        return super().__call__(result)
+
+
+class ConcurrentPostingTest(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@user.com', username='testuser', password='testpass')
+        self.account = Account.objects.create(account_number='1930', account_name='Bank', user=self.user)
+        self.other_account = Account.objects.create(account_number='5010', account_name='Rent', user=self.user)
+
+    def test_services_lock_account_before_reading(self):
+        transaction = transaction_create(user_id=self.user.id, account_id=self.account.id, credit_amount=10,
+                                         description='Test transaction', verification_number='1')
+
+        with CaptureQueriesContext(connection) as queries:
+            transaction_delete(user_id=self.user.id, account_id=self.account.id, transaction_id=transaction.id)
+
+        statements = [query['sql'] for query in queries.captured_queries if 'SAVEPOINT' not in query['sql']]
+        self.assertIn('FROM "ledger_account"', statements[0])
+        self.assertIn('FROM "ledger_transaction"', statements[1])
+
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_parallel_writers_keep_balances(self):
+        results = run_posting_benchmark(user_id=self.user.id, account_id=self.account.id,
+                                        other_account_id=self.other_account.id,
+                                        writer_counts=(1, 4), posts_per_writer=20)
+
+        for writers, result in results.items():
+            self.assertTrue(result['consistent'], f'{writers} writer(s): {result}')
+        self.assertEqual(Transaction.objects.filter(account=self.account).count(), 100)
+        self.assertEqual(Account.objects.get(id=self.account.id).balance(), 50)
+
+
+class AsyncConcurrencyBenchmarkTest(TransactionTestCase):
+    @skipUnlessDBFeature('test_db_allows_multiple_connections')
+    def test_concurrency_benchmark(self):
+        user_id = seed_ledger(users=1, accounts_per_user=2, transactions_per_account=30, seed=1)[0]
+        account_id = Account.objects.filter(user_id=user_id).order_by('id').values_list('id', flat=True)[0]
+
+        results = run_concurrency_benchmark(user_id=user_id, account_id=account_id,
+                                            concurrency_levels=(1, 4), requests=8)
+
+        self.assertEqual(set(results), {'accounts_list', 'accounts_balance', 'transactions_list'})
+        for name, levels in results.items():
+            for concurrency, result in levels.items():
+                self.assertEqual(result['sync']['status'], status.HTTP_200_OK, name)
+                self.assertEqual(result['async']['status'], status.HTTP_200_OK, name)
+                self.assertLessEqual(result['async']['peak_in_flight'], concurrency)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='ledger-test-'), LEDGER_JOB_WORKERS=2)
+class LedgerJobWorkerTest(TransactionTestCase):
+    @skipUnlessDBFeature('test_db_allows_multiple_connections')
+    def test_worker_thread_runs_job(self):
+        self.addCleanup(shutil.rmtree, settings.MEDIA_ROOT, ignore_errors=True)
+        user = User.objects.create_user(email='test@user.com', username='testuser', password='testpass')
+        account = Account.objects.create(account_number='1930', account_name='Bank', user=user)
+        transaction_create(user_id=user.id, account_id=account.id, credit_amount=10,
+                           description='Test transaction', verification_number='1')
+
+        job = LedgerJob.objects.create(user=user, kind=LedgerJob.Kind.TRANSACTION_EXPORT,
+                                       params=dict(account_id=account.id, output_format='ndjson'))
+        ledger_job_enqueue(job.id).result(timeout=30)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, LedgerJob.Status.SUCCEEDED, job.error)
+        self.assertEqual(job.result_content_type, 'application/x-ndjson')
+        with job.result_file.open('rb') as result:
+            self.assertEqual(json.loads(result.readline())['description'], 'Test transaction')
+
+    @skipUnlessDBFeature('test_db_allows_multiple_connections')
+    def test_workers_poll_pending_jobs(self):
+        self.addCleanup(shutil.rmtree, settings.MEDIA_ROOT, ignore_errors=True)
+        user = User.objects.create_user(email='test@user.com', username='testuser', password='testpass')
+        # Left pending by a restart, or created by a process without workers
+        job = LedgerJob.objects.create(user=user, kind=LedgerJob.Kind.TRIAL_BALANCE)
+
+        self.assertEqual(ledger_jobs_poll(), 1)
+        for _ in range(300):
+            job.refresh_from_db()
+            if job.status == LedgerJob.Status.SUCCEEDED:
+                break
+            time.sleep(0.1)
+        self.assertEqual(job.status, LedgerJob.Status.SUCCEEDED, job.error)
@@ -1,27 +1,69 @@
 from django.urls import path
 
 from .views import (AccountListAPI,
+                    AccountListAsyncAPI,
+                    AccountBalanceAPI,
+                    AccountBalanceAsyncAPI,
+                    AccountSeriesAPI,
+                    TrialBalanceAPI,
                     AccountCreateAPI,
                     AccountUpdateApi,
                     AccountDeleteAPI,
+                    PeriodCloseAPI,
                     TransactionListAPI,
+                    TransactionListAsyncAPI,
+                    TransactionExportAPI,
                     TransactionCreateAPI,
+                    TransactionImportAPI,
+                    JournalEntryCreateAPI,
                     TransactionUpdateApi,
-                    TransactionDeleteAPI)
+                    TransactionDeleteAPI,
+                    TransactionBulkUpdateAPI,
+                    TransactionBulkDeleteAPI,
+                    LedgerJobCreateAPI,
+                    LedgerJobDetailAPI,
+                    LedgerJobResultAPI,
+                    LedgerCacheStatsAPI,
+                    LedgerMetricsAPI)
 
 ledger_patterns = [
     path('accounts', AccountListAPI.as_view(), name='accounts_list'),
+    path('async/accounts', AccountListAsyncAPI.as_view(), name='accounts_list_async'),
+    path('accounts/trial_balance', TrialBalanceAPI.as_view(), name='accounts_trial_balance'),
     path('accounts/create', AccountCreateAPI.as_view(), name='accounts_create'),
     path('accounts/<int:account_id>/update',
          AccountUpdateApi.as_view(), name='accounts_update'),
     path('accounts/<int:account_id>/delete',
          AccountDeleteAPI.as_view(), name='accounts_delete'),
+    path('accounts/close_period', PeriodCloseAPI.as_view(), name='accounts_close_period'),
+    path('accounts/<int:account_id>/balance',
+         AccountBalanceAPI.as_view(), name='accounts_balance'),
+    path('async/accounts/<int:account_id>/balance',
+         AccountBalanceAsyncAPI.as_view(), name='accounts_balance_async'),
+    path('accounts/<int:account_id>/series',
+         AccountSeriesAPI.as_view(), name='accounts_series'),
     path('accounts/<int:account_id>/transactions',
          TransactionListAPI.as_view(), name='transactions_list'),
+    path('async/accounts/<int:account_id>/transactions',
+         TransactionListAsyncAPI.as_view(), name='transactions_list_async'),
+    path('accounts/<int:account_id>/transactions/export',
+         TransactionExportAPI.as_view(), name='transactions_export'),
     path('accounts/<int:account_id>/transactions/create',
          TransactionCreateAPI.as_view(), name='transactions_create'),
+    path('accounts/<int:account_id>/transactions/import',
+         TransactionImportAPI.as_view(), name='transactions_import'),
     path('accounts/<int:account_id>/transactions/<int:transaction_id>/update',
          TransactionUpdateApi.as_view(), name='transactions_update'),
     path('accounts/<int:account_id>/transactions/<int:transaction_id>/delete',
          TransactionDeleteAPI.as_view(), name='transactions_delete'),
+    path('accounts/<int:account_id>/transactions/bulk_update',
+         TransactionBulkUpdateAPI.as_view(), name='transactions_bulk_update'),
+    path('accounts/<int:account_id>/transactions/bulk_delete',
+         TransactionBulkDeleteAPI.as_view(), name='transactions_bulk_delete'),
+    path('journal_entries/create', JournalEntryCreateAPI.as_view(), name='journal_entries_create'),
+    path('jobs/create', LedgerJobCreateAPI.as_view(), name='jobs_create'),
+    path('jobs/<int:job_id>', LedgerJobDetailAPI.as_view(), name='jobs_detail'),
+    path('jobs/<int:job_id>/result', LedgerJobResultAPI.as_view(), name='jobs_result'),
+    path('cache/stats', LedgerCacheStatsAPI.as_view(), name='cache_stats'),
+    path('metrics', LedgerMetricsAPI.as_view(), name='metrics'),
 ]
@@ -1,20 +1,107 @@
+import os
+from functools import partial
+
+from django.db import transaction as db_transaction
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from rest_framework import serializers
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
-from flowback_addon.ledger.models import Account, Transaction
-from flowback_addon.ledger.selectors import account_list, transaction_list
+from flowback_addon.ledger.models import Account, AccountRollup, LedgerJob, Transaction
+from flowback_addon.ledger.selectors import (aaccount_balance_at,
+                                             aaccount_get,
+                                             aaccount_list,
+                                             account_get,
+                                             account_list,
+                                             account_balance_at,
+                                             account_series,
+                                             atransaction_list,
+                                             atransaction_running_balance_seed,
+                                             ledger_job_get,
+                                             transaction_list,
+                                             transaction_export,
+                                             transaction_running_balance_seed,
+                                             trial_balance)
 
 from flowback_addon.ledger.services import (account_create,
                                       account_update,
                                       account_delete,
+                                      journal_entry_create,
+                                      ledger_job_create,
+                                      period_close,
+                                      transaction_amount_error,
                                       transaction_create,
                                       transaction_update,
-                                      transaction_delete)
+                                      transaction_delete,
+                                      transaction_bulk_delete,
+                                      transaction_bulk_update,
+                                      transaction_import)
 from flowback.common.pagination import LimitOffsetPagination, get_paginated_response
-
-
-class AccountListAPI(APIView):
+from flowback_addon.ledger.async_views import AsyncAPIView
+from flowback_addon.ledger.cache import ledger_cache_stats, ledger_cached, ledger_etag, ledger_last_modified
+from flowback_addon.ledger.exports import csv_lines, ndjson_lines
+from flowback_addon.ledger.imports import csv_rows, ndjson_rows
+from flowback_addon.ledger.jobs import ledger_job_enqueue, ledger_job_workers_start
+from flowback_addon.ledger.metrics import ViewMetricsMixin, ledger_span, prometheus_text
+from flowback_addon.ledger.pagination import AsyncLimitOffsetMixin, KeysetPagination
+from flowback_addon.ledger.serialization import (SparseFieldsMixin,
+                                                 fast_serialization_enabled,
+                                                 sparse_fields,
+                                                 values_fields,
+                                                 values_serialize)
+
+
+def _query_valid(view_class, request) -> bool:
+    """Whether the view accepts the query, so condition() never answers 304 where the view answers 400."""
+    try:
+        serializer = view_class.FilterSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return False
+        sparse_fields(view_class.OutputSerializer, serializer.validated_data.get('fields'))
+    except serializers.ValidationError:
+        return False
+    return True
+
+
+def _account_owned(request, account_id: int) -> bool:
+    """
+    Whether the account is the user's, so condition() never answers 304 where the view
+    answers 400. Only queried for conditional requests, the view checks the others.
+    """
+    if 'HTTP_IF_NONE_MATCH' not in request.META and 'HTTP_IF_MODIFIED_SINCE' not in request.META:
+        return True
+    return Account.objects.filter(id=account_id, user_id=request.user.id).exists()
+
+
+def accounts_list_etag(request, *args, **kwargs):
+    if not _query_valid(AccountListAPI, request):
+        return None
+    return ledger_etag(f'accounts_list:{request.build_absolute_uri()}', user_id=request.user.id)
+
+
+def accounts_list_last_modified(request, *args, **kwargs):
+    if not _query_valid(AccountListAPI, request):
+        return None
+    return ledger_last_modified(user_id=request.user.id)
+
+
+def transactions_list_etag(request, account_id: int, *args, **kwargs):
+    if not _query_valid(TransactionListAPI, request) or not _account_owned(request, account_id):
+        return None
+    return ledger_etag(f'transactions_list:{request.build_absolute_uri()}',
+                       user_id=request.user.id, account_id=account_id)
+
+
+def transactions_list_last_modified(request, account_id: int, *args, **kwargs):
+    if not _query_valid(TransactionListAPI, request) or not _account_owned(request, account_id):
+        return None
+    return ledger_last_modified(account_id=account_id)
+
+
+class AccountListAPI(ViewMetricsMixin, APIView):
     class Pagination(LimitOffsetPagination):
         default_limit = 20
         max_limit = 100
@@ -22,6 +109,7 @@ class AccountListAPI(APIView):
     class FilterSerializer(serializers.Serializer):
         order_by = serializers.CharField(required=False)
         id = serializers.IntegerField(required=False)
+        fields = serializers.CharField(required=False)
 
         def __init__(self, *args, **kwargs):
             super().__init__(*args, **kwargs)
@@ -32,27 +120,183 @@ class AccountListAPI(APIView):
                     f"Invalid fields: {','.join(invalid_fields)}"
                 )
 
-    class OutputSerializer(serializers.Serializer):
+    class OutputSerializer(SparseFieldsMixin, serializers.Serializer):
         id = serializers.IntegerField()
         account_number = serializers.CharField()
         account_name = serializers.CharField()
+        debit_total = serializers.FloatField()
+        credit_total = serializers.FloatField()
+        balance = serializers.FloatField(source='balance_total')
+
+    total_fields = {'debit_total', 'credit_total', 'balance'}
+
+    @method_decorator(condition(etag_func=accounts_list_etag, last_modified_func=accounts_list_last_modified))
+    def get(self, request):
+        serializer = self.FilterSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        filters = serializer.validated_data
+        output_fields = sparse_fields(self.OutputSerializer, filters.pop('fields', None))
+        output_serializer = partial(self.OutputSerializer, fields=output_fields)
+
+        def get_data():
+            accounts = account_list(user_id=request.user.id,
+                                    filters=filters,
+                                    with_totals=output_fields is None or bool(self.total_fields & set(output_fields)))
+
+            if fast_serialization_enabled():
+                paginator = self.Pagination()
+                page = paginator.paginate_queryset(accounts.values(*values_fields(output_serializer)),
+                                                   request, view=self)
+                return paginator.get_paginated_data(values_serialize(output_serializer, page))
+
+            if output_fields is not None:
+                accounts = accounts.only('id', *(set(output_fields) - self.total_fields))
+
+            return get_paginated_response(pagination_class=self.Pagination,
+                                          serializer_class=output_serializer,
+                                          queryset=accounts,
+                                          request=request,
+                                          view=self).data
+
+        data = ledger_cached(f'accounts_list:{request.build_absolute_uri()}', get_data,
+                             user_id=request.user.id)
+        return Response(data)
+
+
+class AccountListAsyncAPI(AsyncAPIView):
+    """AccountListAPI for ASGI deployments, reading the database with the async ORM and bypassing the cache."""
+
+    class Pagination(AsyncLimitOffsetMixin, AccountListAPI.Pagination):
+        pass
+
+    FilterSerializer = AccountListAPI.FilterSerializer
+    OutputSerializer = AccountListAPI.OutputSerializer
+
+    async def get(self, request):
+        serializer = self.FilterSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        filters = serializer.validated_data
+        output_fields = sparse_fields(self.OutputSerializer, filters.pop('fields', None))
+        output_serializer = partial(self.OutputSerializer, fields=output_fields)
+
+        accounts = await aaccount_list(user_id=request.user.id,
+                                       filters=filters,
+                                       with_totals=output_fields is None
+                                       or bool(AccountListAPI.total_fields & set(output_fields)))
+
+        paginator = self.Pagination()
+        page = await paginator.apaginate_queryset(accounts.values(*values_fields(output_serializer)),
+                                                  request, view=self)
+        return Response(paginator.get_paginated_data(values_serialize(output_serializer, page)))
+
+
+class AccountBalanceAPI(ViewMetricsMixin, APIView):
+    class FilterSerializer(serializers.Serializer):
+        date = serializers.DateTimeField(required=False)
+
+    class OutputSerializer(serializers.Serializer):
+        debit_total = serializers.FloatField()
+        credit_total = serializers.FloatField()
+        balance = serializers.FloatField()
+
+    def get(self, request, account_id: int):
+        serializer = self.FilterSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        def get_data():
+            account_get(user_id=request.user.id, account_id=account_id)
+            balance = account_balance_at(account_id=account_id,
+                                         date=serializer.validated_data.get('date'))
+            return self.OutputSerializer(balance).data
+
+        data = ledger_cached(f'accounts_balance:{serializer.validated_data.get("date")}', get_data,
+                             user_id=request.user.id, account_id=account_id)
+        return Response(status=status.HTTP_200_OK, data=data)
+
+
+class AccountBalanceAsyncAPI(AsyncAPIView):
+    """AccountBalanceAPI for ASGI deployments, reading the database with the async ORM and bypassing the cache."""
+
+    FilterSerializer = AccountBalanceAPI.FilterSerializer
+    OutputSerializer = AccountBalanceAPI.OutputSerializer
+
+    async def get(self, request, account_id: int):
+        serializer = self.FilterSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        await aaccount_get(user_id=request.user.id, account_id=account_id)
+        balance = await aaccount_balance_at(account_id=account_id, date=serializer.validated_data.get('date'))
+        return Response(status=status.HTTP_200_OK, data=self.OutputSerializer(balance).data)
+
+
+class AccountSeriesAPI(ViewMetricsMixin, APIView):
+    class FilterSerializer(serializers.Serializer):
+        granularity = serializers.ChoiceField(choices=AccountRollup.Granularity.choices,
+                                              required=False, default=AccountRollup.Granularity.MONTH)
+        date__gte = serializers.DateTimeField(required=False)
+        date__lte = serializers.DateTimeField(required=False)
+
+    class OutputSerializer(serializers.Serializer):
+        period_start = serializers.DateTimeField()
+        debit_total = serializers.FloatField()
+        credit_total = serializers.FloatField()
+        transaction_count = serializers.IntegerField()
+        balance = serializers.FloatField()
+
+    def get(self, request, account_id: int):
+        serializer = self.FilterSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        def get_data():
+            account_get(user_id=request.user.id, account_id=account_id)
+            series = account_series(account_id=account_id, **serializer.validated_data)
+            return self.OutputSerializer(series, many=True).data
+
+        data = ledger_cached(f'accounts_series:{sorted(serializer.validated_data.items())}', get_data,
+                             user_id=request.user.id, account_id=account_id)
+        return Response(status=status.HTTP_200_OK, data=data)
+
+
+class TrialBalanceAPI(ViewMetricsMixin, APIView):
+    class FilterSerializer(serializers.Serializer):
+        as_of = serializers.DateTimeField(required=False)
+        date__gte = serializers.DateTimeField(required=False)
+        date__lte = serializers.DateTimeField(required=False)
+
+    class OutputSerializer(serializers.Serializer):
+        class AccountSerializer(serializers.Serializer):
+            id = serializers.IntegerField()
+            account_number = serializers.CharField()
+            account_name = serializers.CharField()
+            debit_total = serializers.FloatField()
+            credit_total = serializers.FloatField()
+            balance = serializers.FloatField()
+
+        accounts = AccountSerializer(many=True)
+        debit_total = serializers.FloatField()
+        credit_total = serializers.FloatField()
         balance = serializers.FloatField()
 
     def get(self, request):
         serializer = self.FilterSerializer(data=request.query_params)
         serializer.is_valid(raise_exception=True)
 
-        accounts = account_list(user_id=request.user.id,
-                                filters=serializer.validated_data)
+        filters = serializer.validated_data
+        date_range = None
+        if 'date__gte' in filters or 'date__lte' in filters:
+            date_range = (filters.get('date__gte'), filters.get('date__lte'))
 
-        return get_paginated_response(pagination_class=self.Pagination,
-                                      serializer_class=self.OutputSerializer,
-                                      queryset=accounts,
-                                      request=request,
-                                      view=self)
+        def get_data():
+            balance = trial_balance(user_id=request.user.id, as_of=filters.get('as_of'), date_range=date_range)
+            return self.OutputSerializer(balance).data
 
+        data = ledger_cached(f'trial_balance:{sorted(filters.items())}', get_data, user_id=request.user.id)
+        return Response(status=status.HTTP_200_OK, data=data)
 
-class AccountCreateAPI(APIView):
+
+class AccountCreateAPI(ViewMetricsMixin, APIView):
     class InputSerializer(serializers.ModelSerializer):
         class Meta:
             model = Account
@@ -68,7 +312,7 @@ class AccountCreateAPI(APIView):
         return Response(status=status.HTTP_200_OK, data=account.id)
 
 
-class AccountUpdateApi(APIView):
+class AccountUpdateApi(ViewMetricsMixin, APIView):
     class InputSerializer(serializers.ModelSerializer):
         class Meta:
             model = Account
@@ -83,21 +327,62 @@ class AccountUpdateApi(APIView):
         return Response(status=status.HTTP_200_OK)
 
 
-class AccountDeleteAPI(APIView):
+class AccountDeleteAPI(ViewMetricsMixin, APIView):
     def post(self, request, account_id: int):
         account_delete(user_id=request.user.id, account_id=account_id)
 
         return Response(status=status.HTTP_200_OK)
 
 
-class TransactionListAPI(APIView):
+class PeriodCloseAPI(ViewMetricsMixin, APIView):
+    class InputSerializer(serializers.Serializer):
+        cutoff = serializers.DateTimeField()
+        account_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+
+    def post(self, request):
+        serializer = self.InputSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        result = period_close(user_id=request.user.id, **serializer.validated_data)
+
+        return Response(status=status.HTTP_200_OK, data=result)
+
+
+class TransactionListAPI(ViewMetricsMixin, APIView):
     class Pagination(LimitOffsetPagination):
         default_limit = 20
         max_limit = 100
 
+    class CursorPagination(KeysetPagination):
+        default_limit = 20
+        max_limit = 100
+        ordering_fields = {'created_at_asc': 'created_at',
+                           'created_at_desc': '-created_at',
+                           'date_asc': 'date',
+                           'date_desc': '-date'}
+        default_ordering = 'date_desc'
+
     class FilterSerializer(serializers.Serializer):
         order_by = serializers.CharField(required=False)
         id = serializers.IntegerField(required=False)
+        date__gte = serializers.DateTimeField(required=False)
+        date__lte = serializers.DateTimeField(required=False)
+        debit_amount__gte = serializers.DecimalField(max_digits=15, decimal_places=5, required=False)
+        debit_amount__lte = serializers.DecimalField(max_digits=15, decimal_places=5, required=False)
+        credit_amount__gte = serializers.DecimalField(max_digits=15, decimal_places=5, required=False)
+        credit_amount__lte = serializers.DecimalField(max_digits=15, decimal_places=5, required=False)
+        side = serializers.ChoiceField(choices=['debit', 'credit'], required=False)
+        verification_number = serializers.CharField(max_length=20, required=False)
+        verification_number__startswith = serializers.CharField(max_length=20, required=False)
+        description__icontains = serializers.CharField(max_length=100, required=False)
+
+        pagination = serializers.ChoiceField(choices=['offset', 'cursor'], required=False)
+        limit = serializers.IntegerField(required=False)
+        offset = serializers.IntegerField(required=False)
+        cursor = serializers.CharField(required=False)
+        count = serializers.BooleanField(required=False)
+        running_balance = serializers.BooleanField(required=False)
+        fields = serializers.CharField(required=False)
 
         def __init__(self, *args, **kwargs):
             super().__init__(*args, **kwargs)
@@ -108,29 +393,163 @@ class TransactionListAPI(APIView):
                     f"Invalid fields: {','.join(invalid_fields)}"
                 )
 
-    class OutputSerializer(serializers.Serializer):
+        # The filters selecting rows scattered over (date, id) order, unlike the date and id filters
+        scattered_filters = ('debit_amount__gte', 'debit_amount__lte', 'credit_amount__gte', 'credit_amount__lte',
+                             'side', 'verification_number', 'verification_number__startswith',
+                             'description__icontains')
+
+        def validate(self, data):
+            # The running balance of a page is seeded from its first row, so the rows the
+            # query skips must lie before the page in (date, id) order
+            if not data.get('running_balance'):
+                return data
+
+            if data.get('pagination') == 'cursor' and data.get('order_by', '').startswith('created_at'):
+                raise serializers.ValidationError('running_balance needs a date order_by with cursor pagination')
+
+            filters = [name for name in self.scattered_filters if name in data]
+            if filters:
+                raise serializers.ValidationError(f'running_balance can not be combined with the filters: '
+                                                  f'{", ".join(filters)}')
+            return data
+
+    class OutputSerializer(SparseFieldsMixin, serializers.Serializer):
         id = serializers.IntegerField()
         debit_amount = serializers.FloatField()
         credit_amount = serializers.FloatField()
         description = serializers.CharField()
         verification_number = serializers.CharField()
         date = serializers.DateTimeField()
+        running_balance = serializers.FloatField(required=False)
 
+    @method_decorator(condition(etag_func=transactions_list_etag,
+                                last_modified_func=transactions_list_last_modified))
     def get(self, request, account_id: int):
         serializer = self.FilterSerializer(data=request.query_params)
         serializer.is_valid(raise_exception=True)
 
-        transactions = transaction_list(account_id=account_id,
-                                        filters=serializer.validated_data)
+        filters = serializer.validated_data
+        pagination_class = self.CursorPagination if filters.pop('pagination', None) == 'cursor' else self.Pagination
+        running_balance = filters.pop('running_balance', False)
+        for param in ('limit', 'offset', 'cursor', 'count'):
+            filters.pop(param, None)
+
+        output_fields = sparse_fields(self.OutputSerializer, filters.pop('fields', None))
+        output_serializer = partial(self.OutputSerializer, fields=output_fields)
+
+        # The columns to load: the requested fields, plus what pagination and the running balance seed read
+        columns = ['id'] + [field for field in values_fields(output_serializer) if field != 'running_balance']
+        if pagination_class is self.CursorPagination:
+            columns.append(self.CursorPagination().get_ordering(request).lstrip('-'))
+        if running_balance:
+            columns.append('date')
+        columns = list(dict.fromkeys(columns))
+
+        def get_data():
+            account_get(user_id=request.user.id, account_id=account_id)
+            with ledger_span('filter'):
+                transactions = transaction_list(account_id=account_id, filters=filters,
+                                                running_balance=running_balance)
+
+            paginator = pagination_class()
+            if fast_serialization_enabled() and not running_balance:
+                with ledger_span('paginate'):
+                    page = paginator.paginate_queryset(transactions.values(*columns), request, view=self)
+                with ledger_span('serialize'):
+                    return paginator.get_paginated_data(values_serialize(output_serializer, page))
+
+            if output_fields is not None:
+                transactions = transactions.only(*columns)
+
+            # Paginated by hand rather than with get_paginated_response to time the phases apart
+            with ledger_span('paginate'):
+                page = paginator.paginate_queryset(transactions, request, view=self)
+            if running_balance:
+                with ledger_span('running_balance'):
+                    transaction_running_balance_seed(account_id=account_id, transactions=page,
+                                                     using=transactions.db)
+            with ledger_span('serialize'):
+                return paginator.get_paginated_response(output_serializer(page, many=True).data).data
+
+        data = ledger_cached(f'transactions_list:{request.build_absolute_uri()}', get_data,
+                             user_id=request.user.id, account_id=account_id)
+        return Response(data)
+
+
+class TransactionListAsyncAPI(AsyncAPIView):
+    """TransactionListAPI for ASGI deployments, reading the database with the async ORM and bypassing the cache."""
+
+    class Pagination(AsyncLimitOffsetMixin, TransactionListAPI.Pagination):
+        pass
+
+    CursorPagination = TransactionListAPI.CursorPagination
+    FilterSerializer = TransactionListAPI.FilterSerializer
+    OutputSerializer = TransactionListAPI.OutputSerializer
+
+    async def get(self, request, account_id: int):
+        serializer = self.FilterSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        filters = serializer.validated_data
+        pagination_class = self.CursorPagination if filters.pop('pagination', None) == 'cursor' else self.Pagination
+        running_balance = filters.pop('running_balance', False)
+        for param in ('limit', 'offset', 'cursor', 'count'):
+            filters.pop(param, None)
+
+        output_fields = sparse_fields(self.OutputSerializer, filters.pop('fields', None))
+        output_serializer = partial(self.OutputSerializer, fields=output_fields)
+
+        # The running balance seed reads model instances, every other page loads values
+        columns = ['id'] + [field for field in values_fields(output_serializer) if field != 'running_balance']
+        if pagination_class is self.CursorPagination:
+            columns.append(self.CursorPagination().get_ordering(request).lstrip('-'))
+        if running_balance:
+            columns.append('date')
+        columns = list(dict.fromkeys(columns))
+
+        await aaccount_get(user_id=request.user.id, account_id=account_id)
+        transactions = await atransaction_list(account_id=account_id, filters=filters,
+                                               running_balance=running_balance)
 
-        return get_paginated_response(pagination_class=self.Pagination,
-                                      serializer_class=self.OutputSerializer,
-                                      queryset=transactions,
-                                      request=request,
-                                      view=self)
+        paginator = pagination_class()
+        if not running_balance:
+            page = await paginator.apaginate_queryset(transactions.values(*columns), request, view=self)
+            return Response(paginator.get_paginated_data(values_serialize(output_serializer, page)))
 
+        page = await paginator.apaginate_queryset(transactions.only(*columns), request, view=self)
+        await atransaction_running_balance_seed(account_id=account_id, transactions=page, using=transactions.db)
+        return paginator.get_paginated_response(output_serializer(page, many=True).data)
 
-class TransactionCreateAPI(APIView):
+
+class TransactionExportAPI(ViewMetricsMixin, APIView):
+    class FilterSerializer(serializers.Serializer):
+        output_format = serializers.ChoiceField(choices=['csv', 'ndjson'], required=False, default='csv')
+        date__gte = serializers.DateTimeField(required=False)
+        date__lte = serializers.DateTimeField(required=False)
+        running_balance = serializers.BooleanField(required=False, default=False)
+
+    def get(self, request, account_id: int):
+        serializer = self.FilterSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        filters = serializer.validated_data
+        output_format = filters.pop('output_format')
+        header, rows = transaction_export(user_id=request.user.id,
+                                          account_id=account_id,
+                                          running_balance=filters.pop('running_balance'),
+                                          filters=filters)
+
+        if output_format == 'ndjson':
+            response = StreamingHttpResponse(ndjson_lines(header, rows), content_type='application/x-ndjson')
+        else:
+            response = StreamingHttpResponse(csv_lines(header, rows), content_type='text/csv')
+
+        response['Content-Disposition'] = (f'attachment; filename="account-{account_id}-transactions.'
+                                           f'{output_format}"')
+        return response
+
+
+class TransactionCreateAPI(ViewMetricsMixin, APIView):
     class InputSerializer(serializers.ModelSerializer):
         class Meta:
             model = Transaction
@@ -138,15 +557,10 @@ class TransactionCreateAPI(APIView):
                       'description', 'verification_number', 'date']
 
         def validate(self, data):
-            if not data.get('debit_amount') and not data.get('credit_amount'):
-                raise serializers.ValidationError(
-                    "You must provide a debit or credit amount.")
-            if data.get('debit_amount') and data.get('credit_amount'):
-                raise serializers.ValidationError(
-                    "Each transaction must have either a debit or a credit amount, but not both")
-            if data.get('debit_amount', 0) <= 0 and data.get('credit_amount', 0) <= 0:
-                raise serializers.ValidationError(
-                    "The debit or credit amount must be greater than zero.")
+            error = transaction_amount_error(debit_amount=data.get('debit_amount'),
+                                             credit_amount=data.get('credit_amount'))
+            if error:
+                raise serializers.ValidationError(error)
             return data
 
     def post(self, request, account_id: int):
@@ -159,7 +573,61 @@ class TransactionCreateAPI(APIView):
         return Response(status=status.HTTP_200_OK, data=account.id)
 
 
-class TransactionUpdateApi(APIView):
+class JournalEntryCreateAPI(ViewMetricsMixin, APIView):
+    class InputSerializer(serializers.Serializer):
+        class LegSerializer(serializers.Serializer):
+            account_id = serializers.IntegerField()
+            debit_amount = serializers.DecimalField(max_digits=15, decimal_places=5, required=False, allow_null=True)
+            credit_amount = serializers.DecimalField(max_digits=15, decimal_places=5, required=False, allow_null=True)
+            description = serializers.CharField(max_length=100, required=False)
+
+            def validate(self, data):
+                error = transaction_amount_error(debit_amount=data.get('debit_amount'),
+                                                 credit_amount=data.get('credit_amount'))
+                if error:
+                    raise serializers.ValidationError(error)
+                return data
+
+        verification_number = serializers.CharField(max_length=20)
+        description = serializers.CharField(max_length=100)
+        date = serializers.DateTimeField(required=False)
+        legs = LegSerializer(many=True, min_length=2, max_length=100)
+
+    def post(self, request):
+        serializer = self.InputSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        transactions = journal_entry_create(user_id=request.user.id, **serializer.validated_data)
+
+        return Response(status=status.HTTP_200_OK, data=[transaction.id for transaction in transactions])
+
+
+class TransactionImportAPI(ViewMetricsMixin, APIView):
+    class FilterSerializer(serializers.Serializer):
+        input_format = serializers.ChoiceField(choices=['csv', 'ndjson'], required=False)
+        dry_run = serializers.BooleanField(required=False, default=False)
+        batch_size = serializers.IntegerField(required=False, default=1000, min_value=1, max_value=10000)
+
+    def post(self, request, account_id: int):
+        serializer = self.FilterSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        input_format = serializer.validated_data.get('input_format')
+        if input_format is None:
+            input_format = 'ndjson' if 'json' in (request.content_type or '') else 'csv'
+
+        parse_rows = ndjson_rows if input_format == 'ndjson' else csv_rows
+        result = transaction_import(user_id=request.user.id,
+                                    account_id=account_id,
+                                    rows=parse_rows(request.stream),
+                                    batch_size=serializer.validated_data['batch_size'],
+                                    dry_run=serializer.validated_data['dry_run'])
+
+        return Response(status=status.HTTP_400_BAD_REQUEST if result['errors'] else status.HTTP_200_OK,
+                        data=result)
+
+
+class TransactionUpdateApi(ViewMetricsMixin, APIView):
     class InputSerializer(serializers.ModelSerializer):
         class Meta:
             model = Transaction
@@ -167,15 +635,10 @@ class TransactionUpdateApi(APIView):
                       'description', 'verification_number', 'date']
 
         def validate(self, data):
-            if not data.get('debit_amount') and not data.get('credit_amount'):
-                raise serializers.ValidationError(
-                    "You must provide a debit or credit amount.")
-            if data.get('debit_amount') and data.get('credit_amount'):
-                raise serializers.ValidationError(
-                    "Each transaction must have either a debit or a credit amount, but not both")
-            if data.get('debit_amount', 0) <= 0 and data.get('credit_amount', 0) <= 0:
-                raise serializers.ValidationError(
-                    "The debit or credit amount must be greater than zero.")
+            error = transaction_amount_error(debit_amount=data.get('debit_amount'),
+                                             credit_amount=data.get('credit_amount'))
+            if error:
+                raise serializers.ValidationError(error)
             return data
 
     def post(self, request, account_id: int, transaction_id: int):
@@ -188,9 +651,144 @@ class TransactionUpdateApi(APIView):
         return Response(status=status.HTTP_200_OK)
 
 
-class TransactionDeleteAPI(APIView):
+class TransactionDeleteAPI(ViewMetricsMixin, APIView):
     def post(self, request, account_id: int, transaction_id: int):
         transaction_delete(user_id=request.user.id,
                            transaction_id=transaction_id, account_id=account_id)
 
         return Response(status=status.HTTP_200_OK)
+
+
+class TransactionBulkUpdateAPI(ViewMetricsMixin, APIView):
+    class InputSerializer(serializers.Serializer):
+        class DataSerializer(serializers.ModelSerializer):
+            class Meta:
+                model = Transaction
+                fields = ['description', 'verification_number', 'date']
+                extra_kwargs = {field: dict(required=False) for field in fields}
+
+        ids = serializers.ListField(child=serializers.IntegerField(), required=False,
+                                    allow_empty=False, max_length=10000)
+        date__gte = serializers.DateTimeField(required=False)
+        date__lte = serializers.DateTimeField(required=False)
+        verification_number__startswith = serializers.CharField(required=False)
+        data = DataSerializer()
+
+    def post(self, request, account_id: int):
+        serializer = self.InputSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        filters = serializer.validated_data
+        updated = transaction_bulk_update(user_id=request.user.id,
+                                          account_id=account_id,
+                                          data=filters.pop('data'),
+                                          transaction_ids=filters.pop('ids', None),
+                                          filters=filters)
+
+        return Response(status=status.HTTP_200_OK, data=dict(updated=updated))
+
+
+class TransactionBulkDeleteAPI(ViewMetricsMixin, APIView):
+    class InputSerializer(serializers.Serializer):
+        ids = serializers.ListField(child=serializers.IntegerField(), required=False,
+                                    allow_empty=False, max_length=10000)
+        date__gte = serializers.DateTimeField(required=False)
+        date__lte = serializers.DateTimeField(required=False)
+        verification_number__startswith = serializers.CharField(required=False)
+
+    def post(self, request, account_id: int):
+        serializer = self.InputSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        filters = serializer.validated_data
+        deleted = transaction_bulk_delete(user_id=request.user.id,
+                                          account_id=account_id,
+                                          transaction_ids=filters.pop('ids', None),
+                                          filters=filters)
+
+        return Response(status=status.HTTP_200_OK, data=dict(deleted=deleted))
+
+
+class LedgerJobCreateAPI(ViewMetricsMixin, APIView):
+    class InputSerializer(serializers.Serializer):
+        kind = serializers.ChoiceField(choices=LedgerJob.Kind.choices)
+        params = serializers.DictField(required=False, default=dict)
+
+    class TransactionExportParamsSerializer(serializers.Serializer):
+        account_id = serializers.IntegerField()
+        output_format = serializers.ChoiceField(choices=['csv', 'ndjson'], required=False, default='csv')
+        date__gte = serializers.DateTimeField(required=False)
+        date__lte = serializers.DateTimeField(required=False)
+        running_balance = serializers.BooleanField(required=False, default=False)
+
+    class TrialBalanceParamsSerializer(serializers.Serializer):
+        as_of = serializers.DateTimeField(required=False)
+        date__gte = serializers.DateTimeField(required=False)
+        date__lte = serializers.DateTimeField(required=False)
+
+    class BalanceRebuildParamsSerializer(serializers.Serializer):
+        account_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+
+    params_serializers = {LedgerJob.Kind.TRANSACTION_EXPORT: TransactionExportParamsSerializer,
+                          LedgerJob.Kind.TRIAL_BALANCE: TrialBalanceParamsSerializer,
+                          LedgerJob.Kind.BALANCE_REBUILD: BalanceRebuildParamsSerializer}
+
+    def post(self, request):
+        serializer = self.InputSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        kind = serializer.validated_data['kind']
+        params_serializer = self.params_serializers[kind](data=serializer.validated_data['params'])
+        params_serializer.is_valid(raise_exception=True)
+
+        # Stored as JSON, the handlers in jobs.py parse the dates back
+        job = ledger_job_create(user_id=request.user.id, kind=kind, params=params_serializer.data)
+        db_transaction.on_commit(lambda: ledger_job_enqueue(job.id))
+
+        return Response(status=status.HTTP_200_OK, data=job.id)
+
+
+class LedgerJobDetailAPI(ViewMetricsMixin, APIView):
+    class OutputSerializer(serializers.ModelSerializer):
+        class Meta:
+            model = LedgerJob
+            fields = ['id', 'kind', 'params', 'status', 'progress_done', 'progress_total', 'error',
+                      'created_at', 'started_at', 'finished_at']
+
+    def get(self, request, job_id: int):
+        job = ledger_job_get(user_id=request.user.id, job_id=job_id)
+        # Lets a restarted process pick up the pending jobs its clients wait for
+        ledger_job_workers_start()
+
+        data = self.OutputSerializer(job).data
+        data['result_url'] = None
+        if job.status == LedgerJob.Status.SUCCEEDED and job.result_file:
+            # The result endpoint is jobs/<id>/result next to this one
+            data['result_url'] = request.build_absolute_uri(f'{request.path.rstrip("/")}/result')
+        return Response(status=status.HTTP_200_OK, data=data)
+
+
+class LedgerJobResultAPI(ViewMetricsMixin, APIView):
+    def get(self, request, job_id: int):
+        job = ledger_job_get(user_id=request.user.id, job_id=job_id)
+        if job.status != LedgerJob.Status.SUCCEEDED or not job.result_file:
+            raise serializers.ValidationError(f'The job is {job.status}')
+
+        # Streams the file in chunks rather than reading it into memory
+        return FileResponse(job.result_file.open('rb'), as_attachment=True,
+                            filename=os.path.basename(job.result_file.name),
+                            content_type=job.result_content_type or None)
+
+
+class LedgerCacheStatsAPI(ViewMetricsMixin, APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(status=status.HTTP_200_OK, data=ledger_cache_stats())
+
+
+class LedgerMetricsAPI(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(prometheus_text(), content_type='text/plain; version=0.0.4; charset=utf-8')